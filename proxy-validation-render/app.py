@@ -29,15 +29,21 @@ BENEFITS:
 
 API ENDPOINTS:
 - GET /api/proxy/alive?count=X - Smart proxy serving
+- GET /api/proxy/changes?since=V - Delta feed (added/removed kể từ pool_version V)
+- POST /api/proxy/checkout?count=X&ttl=S&mode=shared|exclusive - Lease proxy
+- POST /api/proxy/release?lease_id=ID - Release lease
 - GET /api/ultra/stats - Multi-tier statistics  
 - GET /api/resurrection/stats - Dead proxy comeback stats
+- GET /api/stream - Dashboard Server-Sent Events (logs + stats, push khi đổi)
+- GET /metrics - Prometheus metrics (latency histograms, pool sizes, sources, resurrection)
 - GET /api/ultra/demo - System capabilities demo
 
 Author: Claude Sonnet 4 (ULTRA SMART Implementation)
 Version: 2.0 (Multi-Tier + Resurrection System)
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
+from werkzeug.serving import make_server
 import requests
 import threading
 import time
@@ -47,8 +53,23 @@ from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import random
 import sys
+import atexit
 import traceback
-from collections import deque
+import heapq
+import bisect
+import itertools
+import math
+import uuid
+import gzip
+import sqlite3
+import hashlib
+import hmac
+from collections import deque, OrderedDict
+from array import array
+try:
+    import fcntl  # Owner election (Unix). Windows dev → process luôn là owner
+except ImportError:
+    fcntl = None
 
 
 # Connection pooling for better efficiency on free plan
@@ -71,7 +92,8 @@ proxy_pools = {
     "STANDBY": [],      # 500 proxy backup (validated, ready promote)  
     "EMERGENCY": [],    # 200 proxy emergency (last resort)
     "FRESH": [],        # Proxy mới fetch, chưa validate
-    "DEAD": []          # Proxy dead để tránh recheck
+    "DEAD": [],         # Proxy dead để tránh recheck
+    "CLUSTER": []       # Cluster mode: proxy do peer nodes validate (serve sau local tiers, không maintain)
 }
 
 # Pool statistics and metadata
@@ -81,6 +103,16 @@ pool_stats = {
     "EMERGENCY": {"last_validation": None, "success_rate": 0, "avg_speed": 0},
     "total_served": 0,
     "last_update": None,
+    "maintenance_stats": {
+        "cycles": 0,
+        "last_rechecked": 0,
+        "last_vouched": 0,
+        "last_alive": 0,
+        "last_removed": 0,
+        "oldest_checked_age_seconds": None,
+        "catching_up": False,
+        "last_cycle": None
+    },
     "resurrection_stats": {
         "total_resurrected": 0,
         "resurrection_attempts": 0,
@@ -95,8 +127,142 @@ pool_locks = {
     "STANDBY": threading.Lock(), 
     "EMERGENCY": threading.Lock(),
     "FRESH": threading.Lock(),
-    "DEAD": threading.Lock()
+    "DEAD": threading.Lock(),
+    "CLUSTER": threading.Lock()
+}
+
+# IMMUTABLE POOL SNAPSHOTS - lock-free read path cho serving
+# Writers mutate proxy_pools dưới pool_locks rồi publish 1 snapshot mới (copy-on-write).
+# Readers chỉ cần 1 atomic reference read (`snapshot = pool_snapshot`), không bao giờ chờ lock.
+SERVING_TIERS = ["PRIMARY", "STANDBY", "EMERGENCY"]        # Local tiers: node này validate + maintain
+READ_TIERS = SERVING_TIERS + ["CLUSTER"]                  # Serving order (CLUSTER rỗng khi không chạy cluster mode)
+SNAPSHOT_POOLS = ["PRIMARY", "STANDBY", "EMERGENCY", "FRESH", "CLUSTER"]
+
+pool_snapshot = {
+    "version": 0,
+    "local_version": 0,    # Chỉ tăng khi local tiers đổi (peers dùng để skip sync khi không đổi)
+    "pools": {pool_name: () for pool_name in SNAPSHOT_POOLS},
+    "indexes": {tier_name: {} for tier_name in READ_TIERS},
+    "summary": {"PRIMARY": 0, "STANDBY": 0, "EMERGENCY": 0, "FRESH": 0, "CLUSTER": 0,
+                "TOTAL_AVAILABLE": 0, "GUARANTEED": False},
+    "published_at": None
+}
+snapshot_publish_lock = threading.Lock()  # Serialize writers, readers không dùng
+# Pool → index names đổi từ lần publish trước (SNAPSHOT_ALL_INDEXES = rebuild). Set dưới pool lock của pool đó;
+# publish chỉ copy pools / indexes có trong map, phần còn lại dùng lại tuples của snapshot trước
+snapshot_dirty = {}
+SNAPSHOT_ALL_INDEXES = "*"
+
+# DELTA CHANGE FEED - pool_* helpers ghi records thêm/bớt của serving tiers (READ_TIERS), snapshot publish
+# gắn version rồi append vào bounded log: (version, "add", key, record) | (version, "remove", key, None).
+# "add" = upsert (re-check ra record mới cũng là add). Chi phí tỉ lệ với số records đổi, không với pool size.
+# Client poll `/api/proxy/changes?since=<version>` chỉ nhận delta.
+CHANGE_LOG_MAX_EVENTS = 100000
+change_log = deque(maxlen=CHANGE_LOG_MAX_EVENTS)
+change_log_lock = threading.Lock()
+pending_pool_changes = {tier_name: [] for tier_name in READ_TIERS}  # (seq, op, tier, record) - append dưới pool lock
+change_seq = itertools.count()    # Thứ tự xảy ra của changes giữa các tiers (transfer = remove + add)
+change_feed = {
+    "epoch": uuid.uuid4().hex[:12],   # Đổi khi process restart / owner takeover → client resync
+    "serving": {},                    # key -> (tier, record) của serving set đã publish gần nhất
+    "truncated_through": 0,           # Version lớn nhất đã rơi khỏi log → since < giá trị này phải resync
+    "events": 0,
+    "requests": 0,
+    "resyncs": 0
+}
+
+# SECONDARY INDEXES - mỗi serving tier giữ các ordered index (2 list song song: keys + records),
+# update incremental (bisect) trên insert/recheck/remove dưới pool lock của tier đó:
+#   "speed"        → (speed, key)        fastest N = đọc đầu list, max_speed = bisect prefix
+#   "type:<proto>" → (speed, key)        protocol filter + speed range
+#   "auth:<bool>"  → (speed, key)        has_auth filter + speed range
+#   "fresh"        → (checked_at, key)   max_age = bisect suffix
+pool_indexes = {tier_name: {} for tier_name in READ_TIERS}
+
+# Fair rotation cursor cho từng serving tier (unfiltered + filtered serving)
+serving_cursor = {tier_name: 0 for tier_name in READ_TIERS}
+filter_cursor = {tier_name: 0 for tier_name in READ_TIERS}
+
+# CROSS-POOL MEMBERSHIP INDEX - proxy_key → (tier, record), authoritative cho PRIMARY/STANDBY/EMERGENCY.
+# Mọi insert/move/evict đi qua pool_* helpers → 1 host:port chỉ có thể nằm ở đúng 1 tier.
+proxy_membership = {}
+membership_lock = threading.Lock()  # Luôn là lock trong cùng (sau pool_locks)
+membership_stats = {"duplicates_rejected": 0, "fresh_skipped": 0, "resurrection_skipped": 0}
+
+# EXIT-IP INDEX - nhiều host:port chỉ là front-end của cùng 1 egress IP (judge trả về)
+# egress_groups[egress] = set(proxy_key) across serving tiers, maintain cùng membership_lock
+egress_groups = {}
+egress_stats = {"distinct_requests": 0, "representatives_checked": 0, "siblings_vouched": 0, "siblings_rechecked": 0}
+EGRESS_MAX_VOUCHES = 1         # Sibling chỉ được vouch liên tiếp tối đa N lần, sau đó phải check trực tiếp
+
+# SCORE-BASED ADMISSION - FRESH/STANDBY memory budget
+FRESH_MAX_SIZE = 3000          # Vượt → evict lowest score
+FRESH_TRIM_SIZE = 2000         # ... về còn 2000 candidates tốt nhất
+SCORE_SOURCE_PRIOR = 0.1       # Yield giả định cho source chưa có data
+SCORE_PRIOR_WEIGHT = 10        # Số "observations" của prior
+SCORE_AGE_HALF_LIFE = 3600     # Score freshness giảm 1/2 sau 1 giờ
+LIVENESS_HISTORY_MAX = 50000   # LRU cap cho per-proxy liveness history
+
+source_stats = {}                   # source_name -> fetched/validated/alive/last_fetch
+fresh_candidate_meta = {}           # FRESH candidate key -> (source_name, fetched_at)
+last_fetch_sources = {}             # Candidate key -> source name của lần fetch gần nhất
+liveness_history = OrderedDict()    # proxy_key -> [alive_count, check_count]
+liveness_lock = threading.Lock()
+eviction_stats = {"FRESH": {}, "STANDBY": {}}  # pool -> reason -> count
+
+# SUBNET REPUTATION - /24 prefix fed bởi validation + resurrection outcomes
+SUBNET_HALF_LIFE = 6 * 3600       # Observations giảm 1/2 sau 6 giờ
+SUBNET_MIN_CHECKS = 8             # Cần ≥ 8 recent checks mới đánh giá prefix
+SUBNET_BAD_ALIVE_RATE = 0.02      # Alive rate ≤ 2% → bulk-dead range
+SUBNET_EXPLORATION_RATE = 0.05    # Vẫn thử 5% batch từ bad prefixes (prefix có thể hồi phục)
+SUBNET_DEFER_DELAY = 1800         # Dead proxy bị skip vì bad prefix → đợi 30 phút, không tính thêm 1 lần fail
+SUBNET_TABLE_MAX = 20000          # LRU cap
+
+subnet_reputation = OrderedDict()  # "a.b.c" -> [decayed_alive, decayed_checks, last_update]
+subnet_lock = threading.Lock()
+subnet_stats = {"skipped_fresh": 0, "skipped_resurrection": 0, "explored": 0}
+
+# PROXY LEASES
+LEASE_DEFAULT_TTL = 300   # 5 phút
+LEASE_MAX_TTL = 3600      # 1 giờ
+LEASE_MODES = ("shared", "exclusive")
+
+active_leases = {}        # lease_id -> {"keys", "mode", "expires_at", "ttl", "created_at"}
+proxy_lease_state = {}    # proxy_key -> {"exclusive": lease_id|None, "shared": count}
+lease_expiry_heap = []    # (expires_at monotonic, lease_id) - lazy expiry
+lease_stats = {"checked_out": 0, "released": 0, "expired": 0, "exclusive_changes": 0}
+lease_lock = threading.Lock()
+
+# RESPONSE CACHE - hot read endpoints giữ bytes đã encode (+ gzip, tạo lazy) theo (endpoint, params, version).
+# Poll lặp lại = 1 dict lookup, hoặc 304 khi client gửi If-None-Match trùng ETag.
+RESPONSE_CACHE_MAX_ENTRIES = 256
+RESPONSE_CACHE_STATS_TTL = 2      # Stats endpoints: counters đổi không qua pool version → cache tối đa 2s
+RESPONSE_GZIP_MIN_BYTES = 1024
+response_cache = OrderedDict()    # cache_key -> {"body", "gzip", "etag", "mimetype", "created", "served"}
+response_cache_lock = threading.Lock()
+response_cache_stats = {"hits": 0, "misses": 0, "not_modified": 0, "gzip_responses": 0, "evictions": 0}
+
+# PROMETHEUS METRICS - /metrics (text exposition 0.0.4). Hot paths chỉ cộng counter / bucket dưới 1 lock rất ngắn;
+# gauges (pool sizes, source yield, resurrection) đọc thẳng từ pool snapshot + stats dicts lúc scrape.
+METRIC_BUCKETS = {
+    "proxy_check_duration_seconds": (0.25, 0.5, 1, 2, 3, 5, 8, 12, 20, 30),
+    "proxy_source_fetch_duration_seconds": (0.5, 1, 2, 5, 10, 20, 30, 60),
+    "http_request_duration_seconds": (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+}
+METRIC_HELP = {
+    "proxy_check_duration_seconds": "Proxy validation check latency by protocol",
+    "proxy_checks_total": "Proxy validation checks by protocol and outcome (alive or failure class)",
+    "proxy_source_fetch_duration_seconds": "Proxy source fetch time",
+    "proxy_source_fetch_errors_total": "Proxy source fetches that raised an error",
+    "proxy_pool_transfers_total": "Records moved between tiers (STANDBY to PRIMARY is a promotion)",
+    "http_request_duration_seconds": "API request latency by route",
+    "http_requests_total": "API requests by route, method and status"
 }
+# Follower ghi HTTP metrics của mình ra shared dir (cùng nhịp follower report), owner gộp lúc scrape.
+# File của pid không còn sống → owner xóa
+metric_values = {}                 # (name, labels) -> counter value | histogram [count / bucket..., +Inf, sum]
+metrics_lock = threading.Lock()
+metrics_share = {"shares": 0, "errors": 0}
 
 # Worker control flags
 worker_control = {
@@ -107,8 +273,42 @@ worker_control = {
     "resurrection_active": True
 }
 
+# Unified job scheduler (thay cho fixed sleep polling của 4 worker threads)
+POOL_LOW_WATERMARK = 0.8       # Pool < 80% target → wake job chịu trách nhiệm
+FETCH_MIN_INTERVAL = 60        # Rate limit fetch sources dù bị wake liên tục
+FETCH_REFRESH_INTERVAL = 300   # Refresh sources định kỳ khi không có event
+SCHEDULER_MAX_WORKERS = 4      # Số jobs chạy đồng thời tối đa
+SCHEDULER_IDLE_INTERVAL = 600  # Safety net: job event-driven tự chạy lại khi không có event
+SCHEDULER_MAX_WAIT = 3600      # Chặn trên cho 1 lần Condition.wait
+
+scheduler_condition = threading.Condition()
+scheduler_job_state = {}       # job_name -> due_at/running/stats (init trong start_scheduler)
+scheduler_control = {"running": False, "thread": None}
+
 # Global log buffer và startup status (keep existing)
 log_buffer = deque(maxlen=500)
+log_sequence = itertools.count(1)   # Mỗi log entry có seq tăng dần (stream / tail chỉ gửi entries mới)
+log_condition = threading.Condition()  # Long-poll /api/logs?after=&wait= chờ entry mới
+LOG_TAIL_MAX_WAIT = 30             # Giây tối đa 1 long-poll giữ request (< OWNER_FORWARD_TIMEOUT)
+LOG_TAIL_MAX_LIMIT = 500
+
+# ASYNC LOGGING - log_to_render chỉ append record vào queue (O(1)) + notify; 1 sink thread (ngủ tới khi có record)
+# format, rate limit theo category, ghi stdout + log_buffer theo batch (mọi record dồn lại trong lúc ghi = 1 batch).
+LOG_QUEUE_MAX = 20000              # Queue đầy → bỏ record cũ nhất (đếm overflow_dropped)
+LOG_DEFAULT_CATEGORY_RATE = 20     # Lines / giây cho 1 category (burst = 1 giây), ERROR không bị giới hạn
+LOG_CATEGORY_RATES = {
+    "serving": 5,                  # smart_proxy_request: vài lines mỗi /api/proxy/alive request
+    "validation_progress": 2
+}
+LOG_SAMPLE_EVERY = 100             # Vượt rate → giữ 1 / 100 lines (sampled), còn lại suppressed
+LOG_SUPPRESS_REPORT_INTERVAL = 30  # Log tổng số lines bị suppress mỗi 30s
+log_queue = deque(maxlen=LOG_QUEUE_MAX)   # (epoch, level, message, category)
+log_queue_condition = threading.Condition()  # log_to_render notify → sink thread thức dậy
+log_flush_listeners = []           # Callbacks sau mỗi batch ghi xong (dashboard broadcaster đăng ký khi có viewer)
+log_flush_lock = threading.Lock()
+log_category_state = {}            # category -> {"tokens", "updated", "over", "suppressed", "sampled"}
+log_sink = {"thread": None, "last_report": time.monotonic()}
+log_stats = {"enqueued": 0, "written": 0, "batches": 0, "suppressed": 0, "sampled": 0, "overflow_dropped": 0}  # Dưới log_queue_condition
 startup_status = {
     "initialized": False,
     "workers_started": False,
@@ -126,6 +326,15 @@ TARGET_POOLS = {
 
 MINIMUM_GUARANTEED = 500  # GUARANTEE: User lúc nào cũng có ít nhất 500 proxy
 
+# ROLLING MAINTENANCE - staleness SLA cho PRIMARY/STANDBY/EMERGENCY
+MAINTENANCE_STALENESS_SLA = 900   # Mỗi proxy được re-check ít nhất 1 lần / 15 phút
+MAINTENANCE_CYCLE_SECONDS = 30    # Worker 2 cycle interval
+MAINTENANCE_MIN_BATCH = 10
+MAINTENANCE_MAX_BATCH = 400       # Cap để 1 cycle không quá dài
+MAINTENANCE_CATCHUP_DELAY = 5     # Stalest proxy vượt SLA (vd. sau warm start) → max batch, cycle liên tục
+
+STANDBY_MAX_SIZE = TARGET_POOLS["STANDBY"] * 2  # Vượt → evict lowest score về target
+
 # ULTRA SMART MULTI-TIER PROXY MANAGEMENT SYSTEM - No duplicates
 
 # Legacy compatibility
@@ -236,1032 +445,2586 @@ PROXY_SOURCE_LINKS = {
     }
 }
 
-def log_to_render(message, level="INFO"):
-    """Enhanced logging cho multi-tier system"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    log_msg = f"[{level}] {timestamp} | {message}"
+def log_to_render(message, level="INFO", category=None, sample=True):
+    """Enhanced logging cho multi-tier system - O(1) enqueue, sink thread format + ghi theo batch.
+
+    category: lines cùng category bị rate limit + sampling (None = không giới hạn, dùng cho logs hiếm).
+    sample=False: line luôn được giữ (alerts), không tốn token của category.
+    """
+    with log_queue_condition:
+        if len(log_queue) >= LOG_QUEUE_MAX:
+            log_stats["overflow_dropped"] += 1  # deque maxlen bỏ record cũ nhất
+        log_queue.append((time.time(), level, message, category if sample else None))
+        log_stats["enqueued"] += 1
+        log_queue_condition.notify()
+    if log_sink["thread"] is None:
+        start_log_sink()
+
+def _log_admitted(category, level, ts):
+    """Token bucket theo category. Vượt rate → chỉ giữ 1 / LOG_SAMPLE_EVERY lines. Chỉ sink thread gọi.
+
+    Trả về "admitted" | "sampled" | "suppressed" (caller cộng log_stats 1 lần / batch dưới queue lock).
+    """
+    if category is None or level == "ERROR":
+        return "admitted"
+    rate = LOG_CATEGORY_RATES.get(category, LOG_DEFAULT_CATEGORY_RATE)
+    state = log_category_state.get(category)
+    if state is None:
+        state = log_category_state[category] = {"tokens": rate, "updated": ts, "over": 0, "suppressed": 0, "sampled": 0}
+    state["tokens"] = min(rate, state["tokens"] + (ts - state["updated"]) * rate)
+    state["updated"] = max(state["updated"], ts)
+    if state["tokens"] >= 1:
+        state["tokens"] -= 1
+        return "admitted"
+    state["over"] += 1
+    if state["over"] % LOG_SAMPLE_EVERY == 0:
+        state["sampled"] += 1
+        return "sampled"
+    state["suppressed"] += 1
+    return "suppressed"
+
+def flush_log_queue():
+    """Drain log_queue: filter + format, 1 stdout write + flush, append vào log_buffer, wake long-polls"""
+    with log_flush_lock:
+        with log_queue_condition:
+            records = list(log_queue)
+            log_queue.clear()
+        
+        now = time.monotonic()
+        if now - log_sink["last_report"] >= LOG_SUPPRESS_REPORT_INTERVAL:
+            log_sink["last_report"] = now
+            for category, state in log_category_state.items():
+                if state["suppressed"]:
+                    records.append((time.time(), "INFO", f"🔇 LOG SAMPLING: {state['suppressed']} '{category}' lines suppressed "
+                                    f"({state['sampled']} sampled) trong {LOG_SUPPRESS_REPORT_INTERVAL}s", None))
+                    state["suppressed"] = 0
+                    state["sampled"] = 0
+        if not records:
+            return 0
+        
+        lines = []
+        entries = []
+        verdicts = {"sampled": 0, "suppressed": 0}
+        for ts, level, message, category in records:
+            verdict = _log_admitted(category, level, ts)
+            if verdict != "admitted":
+                verdicts[verdict] += 1
+            if verdict == "suppressed":
+                continue
+            timestamp = datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+            log_msg = f"[{level}] {timestamp} | {message}"
+            lines.append(log_msg)
+            entries.append({
+                "seq": next(log_sequence),
+                "timestamp": timestamp,
+                "level": level,
+                "message": message,
+                "full_log": log_msg
+            })
+        with log_queue_condition:
+            log_stats["sampled"] += verdicts["sampled"]
+            log_stats["suppressed"] += verdicts["suppressed"]
+        if not entries:
+            return 0
+        
+        try:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+        except (OSError, ValueError):
+            pass  # stdout đóng (shutdown) - vẫn giữ trong log_buffer
+        log_buffer.extend(entries)
+        with log_queue_condition:
+            log_stats["written"] += len(entries)
+            log_stats["batches"] += 1
+        startup_status["last_activity"] = datetime.fromtimestamp(records[-1][0]).isoformat()
     
-    print(log_msg)
-    sys.stdout.flush()
+    with log_condition:
+        log_condition.notify_all()
+    for listener in log_flush_listeners:
+        listener()
+    return len(entries)
+
+def log_report_timeout():
+    """Giây tới lần report suppressed lines kế tiếp, None nếu không category nào đang bị suppress"""
+    if not any(state["suppressed"] for state in list(log_category_state.values())):
+        return None
+    return max(0, log_sink["last_report"] + LOG_SUPPRESS_REPORT_INTERVAL - time.monotonic())
+
+def log_sink_loop():
+    """Sink thread: chờ log_to_render notify (không poll), flush mọi record đã dồn trong queue"""
+    while True:
+        with log_queue_condition:
+            log_queue_condition.wait_for(lambda: log_queue, timeout=log_report_timeout())
+        try:
+            flush_log_queue()
+        except Exception as e:
+            sys.stderr.write(f"LOG SINK ERROR: {str(e)}\n")
+
+def start_log_sink():
+    """Start sink thread lần đầu có log (mỗi process 1 sink) + flush nốt queue lúc exit"""
+    with log_flush_lock:
+        if log_sink["thread"] is not None:
+            return
+        log_sink["thread"] = threading.Thread(target=log_sink_loop, daemon=True)
+        log_sink["thread"].start()
+    atexit.register(flush_log_queue)
+
+def get_log_stats():
+    """Copy nhất quán của log_stats (counters chỉ đổi dưới queue lock)"""
+    with log_queue_condition:
+        return dict(log_stats)
+
+def get_logging_summary():
+    """Async logging stats cho monitoring"""
+    return {
+        "queued": len(log_queue),
+        "buffered": len(log_buffer),
+        "categories": {
+            category: {"rate_per_second": LOG_CATEGORY_RATES.get(category, LOG_DEFAULT_CATEGORY_RATE), "over_limit": state["over"]}
+            for category, state in list(log_category_state.items())
+        },
+        **get_log_stats()
+    }
+
+def get_logs_after(after, levels=None, limit=100):
+    """Log entries có seq > after (lọc theo level). Trả về (entries, next_after, truncated).
+
+    next_after = seq cuối cùng đã scan (kể cả entries bị lọc) → poll tiếp theo không scan lại.
+    truncated = entries ngay sau `after` đã rơi khỏi log_buffer (client tụt quá xa).
+    """
+    recent = list(itertools.takewhile(lambda entry: entry["seq"] > after, reversed(list(log_buffer))))
+    recent.reverse()
+    truncated = bool(recent) and recent[0]["seq"] > after + 1
+    next_after = recent[-1]["seq"] if recent else after
     
-    log_buffer.append({
-        "timestamp": timestamp,
-        "level": level,
-        "message": message,
-        "full_log": log_msg
-    })
+    entries = []
+    for entry in recent:
+        if levels and entry["level"] not in levels:
+            continue
+        entries.append(entry)
+        if len(entries) >= limit:
+            next_after = entry["seq"]
+            break
+    return entries, next_after, truncated
+
+def wait_for_logs(after, levels=None, limit=100, wait=0):
+    """get_logs_after + long-poll: chờ tối đa `wait` giây tới khi có entry khớp filter"""
+    deadline = time.monotonic() + wait
+    entries, next_after, truncated = get_logs_after(after, levels, limit)
+    while not entries:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        with log_condition:
+            log_condition.wait_for(lambda: log_buffer and log_buffer[-1]["seq"] > next_after, timeout=remaining)
+        entries, next_after, more_truncated = get_logs_after(next_after, levels, limit)
+        truncated = truncated or more_truncated
+    return entries, next_after, truncated
+
+def proxy_key_of(proxy):
+    """host:port key của 1 validated proxy record"""
+    return f"{proxy['host']}:{proxy['port']}"
+
+def proxy_speed_of(proxy):
+    """Speed dùng để sort - proxy thiếu speed xếp cuối (999 như trước)"""
+    speed = proxy.get('speed') if isinstance(proxy, dict) else None
+    return speed if isinstance(speed, (int, float)) else 999
+
+def _index_entries(proxy):
+    """(index_name, sort_key) của mọi index mà proxy thuộc về"""
+    if not isinstance(proxy, dict) or 'host' not in proxy or 'port' not in proxy:
+        return []
+    key = proxy_key_of(proxy)
+    speed_key = (proxy_speed_of(proxy), key)
+    return [
+        ("speed", speed_key),
+        (f"type:{proxy.get('type', 'http')}", speed_key),
+        (f"auth:{bool(proxy.get('has_auth'))}", speed_key),
+        ("fresh", (proxy.get('checked_at') or '', key))
+    ]
+
+def _mark_snapshot_dirty(pool_name, index_names=()):
+    """Pool (+ indexes) đổi → publish kế tiếp copy lại - caller giữ pool_locks[pool_name]"""
+    snapshot_dirty.setdefault(pool_name, set()).update(index_names)
+
+def _index_add(pool_name, records):
+    """Insert records vào secondary indexes - caller giữ pool_locks[pool_name]"""
+    indexes = pool_indexes.get(pool_name)
+    if indexes is None:
+        return
+    dirty = snapshot_dirty.setdefault(pool_name, set())
+    for proxy in records:
+        for index_name, sort_key in _index_entries(proxy):
+            dirty.add(index_name)
+            index = indexes.setdefault(index_name, {"keys": [], "records": []})
+            position = bisect.bisect_right(index["keys"], sort_key)
+            index["keys"].insert(position, sort_key)
+            index["records"].insert(position, proxy)
+
+def _index_remove(pool_name, records):
+    """Remove đúng record object khỏi secondary indexes - caller giữ pool_locks[pool_name]"""
+    indexes = pool_indexes.get(pool_name)
+    if indexes is None:
+        return
+    dirty = snapshot_dirty.setdefault(pool_name, set())
+    for proxy in records:
+        for index_name, sort_key in _index_entries(proxy):
+            index = indexes.get(index_name)
+            if index is None:
+                continue
+            dirty.add(index_name)
+            keys, indexed = index["keys"], index["records"]
+            position = bisect.bisect_left(keys, sort_key)
+            while position < len(keys) and keys[position] == sort_key:
+                if indexed[position] is proxy:
+                    del keys[position]
+                    del indexed[position]
+                    break
+                position += 1
+
+def _index_rebuild(pool_name):
+    """Rebuild indexes từ proxy_pools (chỉ dùng khi replace toàn bộ pool)"""
+    if pool_name not in pool_indexes:
+        return
+    grouped = {}
+    for proxy in proxy_pools[pool_name]:
+        for index_name, sort_key in _index_entries(proxy):
+            grouped.setdefault(index_name, []).append((sort_key, proxy))
     
-    startup_status["last_activity"] = datetime.now().isoformat()
+    rebuilt = {}
+    for index_name, entries in grouped.items():
+        entries.sort(key=lambda entry: entry[0])
+        rebuilt[index_name] = {
+            "keys": [sort_key for sort_key, _ in entries],
+            "records": [proxy for _, proxy in entries]
+        }
+    pool_indexes[pool_name] = rebuilt
+    _mark_snapshot_dirty(pool_name, (SNAPSHOT_ALL_INDEXES,))
 
-def get_pool_summary():
-    """Get summary of all pools cho monitoring"""
-    summary = {}
-    total_available = 0
+def get_fastest_proxies(snapshot, count, tiers=None, is_available=None):
+    """Fastest N across tiers: k-way merge các speed index → O(N log T), không sort pool"""
+    tiers = tiers or READ_TIERS
+    merged = heapq.merge(
+        *(snapshot["indexes"][tier_name].get("speed", ((), ()))[1] for tier_name in tiers),
+        key=proxy_speed_of
+    )
+    if is_available is not None:
+        merged = (p for p in merged if is_available(p))
+    return list(itertools.islice(merged, count))
+
+def parse_bool_param(args, name):
+    """true/false/1/0 query (hoặc JSON) param → bool, thiếu → False"""
+    value = args.get(name)
+    if value is None or value == '':
+        return False
+    value = str(value).strip().lower()
+    if value not in ('true', 'false', '1', '0'):
+        raise ValueError(f"{name} must be true or false")
+    return value in ('true', '1')
+
+def parse_proxy_filters(args):
+    """Parse filter query params. Trả về None nếu request không có filter nào.
+
+    type=socks5,socks4 | max_speed=1.5 | max_age=300 (giây) | has_auth=false | exclude=host:port,...
+    """
+    filters = {}
     
-    for pool_name in ["PRIMARY", "STANDBY", "EMERGENCY", "FRESH"]:
-        with pool_locks[pool_name]:
-            count = len(proxy_pools[pool_name])
-            summary[pool_name] = count
-            if pool_name != "FRESH":  # FRESH chưa validate nên không count
-                total_available += count
+    if args.get('type'):
+        filters['types'] = [t.strip().lower() for t in args.get('type').split(',') if t.strip()]
+    if args.get('max_speed'):
+        filters['max_speed'] = float(args.get('max_speed'))
+    if args.get('max_age'):
+        max_age = int(args.get('max_age'))
+        if max_age < 0:
+            raise ValueError("max_age must be >= 0")
+        filters['min_checked_at'] = (datetime.now() - timedelta(seconds=max_age)).isoformat()
+    if args.get('has_auth'):
+        filters['has_auth'] = parse_bool_param(args, 'has_auth')
+    if args.get('exclude'):
+        filters['exclude'] = {p.strip() for p in args.get('exclude').split(',') if p.strip()}
     
-    summary["TOTAL_AVAILABLE"] = total_available
-    summary["GUARANTEED"] = total_available >= MINIMUM_GUARANTEED
-    return summary
+    return filters or None
 
-def smart_proxy_request(count=50):
-    """ULTRA SMART proxy serving với multi-tier fallback"""
-    requested_proxies = []
-    pools_summary = get_pool_summary()
+def _matches_filters(proxy, filters):
+    """Residual predicate - check O(1) trên candidate đã được index thu hẹp"""
+    if 'types' in filters and proxy.get('type', 'http') not in filters['types']:
+        return False
+    if 'max_speed' in filters and proxy_speed_of(proxy) > filters['max_speed']:
+        return False
+    if 'min_checked_at' in filters and (proxy.get('checked_at') or '') < filters['min_checked_at']:
+        return False
+    if 'has_auth' in filters and bool(proxy.get('has_auth')) != filters['has_auth']:
+        return False
+    if 'exclude' in filters and proxy_key_of(proxy) in filters['exclude']:
+        return False
+    return True
+
+def _plan_tier_candidates(tier_indexes, filters):
+    """Chọn index selective nhất cho 1 tier → list (records, lo, hi) ranges.
+
+    - Speed-family (speed | type:<t> | auth:<bool>): bisect theo max_speed → prefix
+    - Freshness (fresh): bisect theo min_checked_at → suffix
+    Trả về (ranges, speed_ordered).
+    """
+    if 'types' in filters:
+        index_names = [f"type:{t}" for t in filters['types']]
+    elif 'has_auth' in filters:
+        index_names = [f"auth:{filters['has_auth']}"]
+    else:
+        index_names = ["speed"]
     
-    log_to_render(f"🎯 SMART REQUEST: Need {count} proxy, available: {pools_summary}")
-    
-    # TIER 1: PRIMARY Pool (fastest response)
-    with pool_locks["PRIMARY"]:
-        primary_available = len(proxy_pools["PRIMARY"])
-        if primary_available >= count:
-            # Best case: PRIMARY có đủ
-            requested_proxies = proxy_pools["PRIMARY"][:count]
-            log_to_render(f"✅ TIER 1 SERVED: {len(requested_proxies)} from PRIMARY pool")
-            pool_stats["total_served"] += len(requested_proxies)
-            return requested_proxies
-        else:
-            # Take all from PRIMARY
-            requested_proxies = proxy_pools["PRIMARY"][:primary_available]
-            remaining_needed = count - len(requested_proxies)
-            log_to_render(f"⚠️ TIER 1 PARTIAL: {len(requested_proxies)} from PRIMARY, need {remaining_needed} more")
-    
-    # TIER 2: STANDBY Pool (backup)
-    if remaining_needed > 0:
-        with pool_locks["STANDBY"]:
-            standby_available = len(proxy_pools["STANDBY"])
-            if standby_available >= remaining_needed:
-                standby_proxies = proxy_pools["STANDBY"][:remaining_needed]
-                requested_proxies.extend(standby_proxies)
-                log_to_render(f"✅ TIER 2 SERVED: {len(standby_proxies)} from STANDBY pool")
-                remaining_needed = 0
-            else:
-                standby_proxies = proxy_pools["STANDBY"][:standby_available]
-                requested_proxies.extend(standby_proxies)
-                remaining_needed -= len(standby_proxies)
-                log_to_render(f"⚠️ TIER 2 PARTIAL: {len(standby_proxies)} from STANDBY, need {remaining_needed} more")
-    
-    # TIER 3: EMERGENCY Pool (last resort)
-    if remaining_needed > 0:
-        with pool_locks["EMERGENCY"]:
-            emergency_available = len(proxy_pools["EMERGENCY"])
-            emergency_proxies = proxy_pools["EMERGENCY"][:min(remaining_needed, emergency_available)]
-            requested_proxies.extend(emergency_proxies)
-            log_to_render(f"🚨 TIER 3 EMERGENCY: {len(emergency_proxies)} from EMERGENCY pool")
-            
-            if len(emergency_proxies) < remaining_needed:
-                log_to_render("🚨 CRITICAL: INSUFFICIENT PROXY ACROSS ALL TIERS!")
-                worker_control["emergency_mode"] = True  # Trigger emergency refill
+    speed_ranges = []
+    for index_name in index_names:
+        keys, records = tier_indexes.get(index_name, ((), ()))
+        hi = len(keys)
+        if 'max_speed' in filters:
+            hi = bisect.bisect_right(keys, (filters['max_speed'], '\uffff'))
+        if hi > 0:
+            speed_ranges.append((records, 0, hi))
+    speed_size = sum(hi - lo for _, lo, hi in speed_ranges)
     
-    pool_stats["total_served"] += len(requested_proxies)
-    pool_stats["last_update"] = datetime.now().isoformat()
+    if 'min_checked_at' in filters:
+        keys, records = tier_indexes.get("fresh", ((), ()))
+        lo = bisect.bisect_left(keys, (filters['min_checked_at'], ''))
+        if len(keys) - lo < speed_size:
+            return ([(records, lo, len(keys))] if lo < len(keys) else []), False
     
-    log_to_render(f"📊 SMART SERVING COMPLETE: {len(requested_proxies)} proxy delivered")
-    return requested_proxies
+    return speed_ranges, True
 
-def worker1_continuous_fetch():
-    """WORKER 1: Liên tục fetch proxy từ sources, không bao giờ dừng"""
-    log_to_render("🏭 WORKER 1: Continuous fetch started")
-    
-    fetch_cycle = 0
+def _iter_range_rotated(records, lo, hi, offset):
+    """Iterate records[lo:hi] bắt đầu từ offset, wrap around"""
+    size = hi - lo
+    for step in range(size):
+        yield records[lo + (offset + step) % size]
+
+def query_proxies(snapshot, count, filters, order="rotate", is_available=None):
+    """Filtered serving từ secondary indexes với PRIMARY → STANDBY → EMERGENCY (→ CLUSTER) fallback"""
+    selected = []
+    served_from = {}
     
-    while worker_control["continuous_fetch_active"]:
-        try:
-            fetch_cycle += 1
-            fresh_needed = TARGET_POOLS["PRIMARY"] + TARGET_POOLS["STANDBY"] - len(proxy_pools["FRESH"])
-            
-            if fresh_needed <= 0 and not worker_control["emergency_mode"]:
-                log_to_render("😴 WORKER 1: FRESH pool sufficient, sleep 5 minutes")
-                time.sleep(300)
+    for tier_name in READ_TIERS:
+        remaining_needed = count - len(selected)
+        if remaining_needed <= 0:
+            break
+        
+        ranges, speed_ordered = _plan_tier_candidates(snapshot["indexes"][tier_name], filters)
+        if not ranges:
+            continue
+        
+        if order == "fastest":
+            if speed_ordered:
+                candidates = heapq.merge(
+                    *(itertools.islice(records, lo, hi) for records, lo, hi in ranges), key=proxy_speed_of
+                )
+            else:
+                # Freshness range nhỏ hơn speed range → sort riêng range đã thu hẹp
+                candidates = iter(sorted((p for records, lo, hi in ranges for p in records[lo:hi]), key=proxy_speed_of))
+        else:
+            offset = filter_cursor[tier_name]
+            candidates = itertools.chain.from_iterable(
+                _iter_range_rotated(records, lo, hi, offset) for records, lo, hi in ranges
+            )
+        
+        picked = []
+        scanned = 0
+        for proxy in candidates:
+            scanned += 1
+            if not _matches_filters(proxy, filters):
                 continue
-            
-            log_to_render(f"📥 WORKER 1 CYCLE {fetch_cycle}: Fetch {fresh_needed} fresh proxy")
-            
-            # Fetch proxy từ sources
-            try:
-                proxy_list, sources_count = fetch_proxies_from_sources()
-                worker_control["emergency_mode"] = False  # Reset emergency sau successful fetch
-            except Exception as e:
-                log_to_render(f"❌ WORKER 1 FETCH ERROR: {str(e)}")
-                time.sleep(600)  # 10 minutes wait on fetch error
+            if is_available is not None and not is_available(proxy):
                 continue
-            
-            if proxy_list and len(proxy_list) > 0:
-                # Add to FRESH pool
-                with pool_locks["FRESH"]:
-                    # Remove duplicates based on host:port
-                    existing_fresh = {f"{p[1] if isinstance(p, tuple) else p}" for p in proxy_pools["FRESH"]}
-                    new_proxies = []
-                    
-                    for proxy_data in proxy_list:
-                        proxy_string = proxy_data[1] if isinstance(proxy_data, tuple) else proxy_data
-                        if proxy_string not in existing_fresh:
-                            new_proxies.append(proxy_data)
-                            existing_fresh.add(proxy_string)
-                    
-                    proxy_pools["FRESH"].extend(new_proxies)
-                    
-                    # Limit FRESH pool size để tránh memory overflow
-                    if len(proxy_pools["FRESH"]) > 3000:
-                        proxy_pools["FRESH"] = proxy_pools["FRESH"][-2000:]  # Keep latest 2000
-                
-                log_to_render(f"✅ WORKER 1: Added {len(new_proxies)} fresh proxy (total FRESH: {len(proxy_pools['FRESH'])})")
-            else:
-                log_to_render("⚠️ WORKER 1: No proxy fetched, retry in 10 minutes")
-            
-            # Sleep dựa trên emergency mode
-            sleep_time = 300 if not worker_control["emergency_mode"] else 60  # 5min normal, 1min emergency
-            time.sleep(sleep_time)
-            
-        except Exception as e:
-            log_to_render(f"❌ WORKER 1 CRITICAL ERROR: {str(e)}")
-            time.sleep(300)
+            picked.append(proxy)
+            if len(picked) >= remaining_needed:
+                break
+        
+        if order != "fastest":
+            filter_cursor[tier_name] += scanned  # Best-effort rotation, không lock
+        
+        selected.extend(picked)
+        served_from[tier_name] = len(picked)
+    
+    return selected, served_from
+
+def publish_pool_snapshot(version=None):
+    """Publish snapshot mới (versioned, immutable) sau pool mutation (batch operations: 1 lần cuối batch).
 
-def worker2_rolling_validation():
-    """WORKER 2: Rolling validation từ FRESH → STANDBY → PRIMARY"""
-    log_to_render("🔧 WORKER 2: Rolling validation started")
+    Chỉ pools / indexes bị đánh dấu dirty được copy; phần còn lại dùng lại tuples của snapshot trước.
+    Writers gọi function này SAU KHI đã release pool lock của mình.
+    Follower truyền `version` của owner để mọi process report cùng 1 pool version.
+    """
+    global pool_snapshot
     
-    validation_cycle = 0
+    with snapshot_publish_lock:
+        previous = pool_snapshot
+        pools = {}
+        indexes = {}
+        changes = []
+        for pool_name in SNAPSHOT_POOLS:
+            with pool_locks[pool_name]:
+                dirty = snapshot_dirty.pop(pool_name, None)
+                if dirty is None:
+                    pools[pool_name] = previous["pools"][pool_name]
+                    if pool_name in pool_indexes:
+                        indexes[pool_name] = previous["indexes"][pool_name]
+                    continue
+                pools[pool_name] = tuple(proxy_pools[pool_name])
+                # Drain cùng lock với lúc đọc pool → events khớp đúng nội dung snapshot này
+                if pending_pool_changes.get(pool_name):
+                    changes.extend(pending_pool_changes[pool_name])
+                    pending_pool_changes[pool_name] = []
+                if pool_name in pool_indexes:
+                    previous_indexes = previous["indexes"][pool_name]
+                    indexes[pool_name] = {
+                        index_name: (tuple(index["keys"]), tuple(index["records"]))
+                        if SNAPSHOT_ALL_INDEXES in dirty or index_name in dirty or index_name not in previous_indexes
+                        else previous_indexes[index_name]
+                        for index_name, index in pool_indexes[pool_name].items()
+                    }
+        
+        summary = {pool_name: len(pools[pool_name]) for pool_name in SNAPSHOT_POOLS}
+        if process_role["role"] == "follower":
+            summary["FRESH"] = shared_state_sync["fresh"]  # Follower không giữ FRESH candidates, chỉ count của owner
+        total_available = sum(summary[pool_name] for pool_name in SERVING_TIERS)
+        summary["TOTAL_AVAILABLE"] = total_available
+        summary["GUARANTEED"] = total_available >= MINIMUM_GUARANTEED
+        # Tier không dirty → cùng tuple object (O(1)); tier dirty → identity check từng record
+        local_changed = any(pools[tier_name] is not previous["pools"][tier_name] and
+                            pools[tier_name] != previous["pools"][tier_name] for tier_name in SERVING_TIERS)
+        new_version = previous["version"] + 1 if version is None else version
+        if changes:
+            changes.sort(key=lambda change: change[0])
+            record_pool_changes(changes, new_version)
+            if process_role["role"] == "owner":
+                queue_shared_state_ops(new_version, changes)
+        
+        # Atomic reference swap - readers thấy snapshot cũ hoặc mới, không bao giờ nửa vời
+        pool_snapshot = {
+            "version": new_version,
+            "local_version": previous["local_version"] + 1 if local_changed else previous["local_version"],
+            "pools": pools,
+            "indexes": indexes,
+            "summary": summary,
+            "published_at": datetime.now().isoformat()
+        }
     
-    while worker_control["rolling_validation_active"]:
-        try:
-            validation_cycle += 1
-            log_to_render(f"⚡ WORKER 2 CYCLE {validation_cycle}: Rolling validation")
-            
-            # STEP 1: Validate FRESH → STANDBY
-            fresh_to_validate = []
-            with pool_locks["FRESH"]:
-                if len(proxy_pools["FRESH"]) > 0:
-                    # Take batch của 200 proxy từ FRESH để validate
-                    batch_size = min(200, len(proxy_pools["FRESH"]))
-                    fresh_to_validate = proxy_pools["FRESH"][:batch_size]
-                    proxy_pools["FRESH"] = proxy_pools["FRESH"][batch_size:]  # Remove processed
-            
-            if fresh_to_validate:
-                log_to_render(f"🔍 WORKER 2: Validating {len(fresh_to_validate)} FRESH proxy...")
-                
-                try:
-                    validated_proxies = validate_proxy_batch_smart(fresh_to_validate, max_workers=15)
-                    
-                    if validated_proxies:
-                        with pool_locks["STANDBY"]:
-                            proxy_pools["STANDBY"].extend(validated_proxies)
-                            # Keep STANDBY pool size reasonable
-                            if len(proxy_pools["STANDBY"]) > TARGET_POOLS["STANDBY"] * 2:
-                                proxy_pools["STANDBY"] = proxy_pools["STANDBY"][-TARGET_POOLS["STANDBY"]:]
-                        
-                        log_to_render(f"✅ WORKER 2: {len(validated_proxies)} proxy added to STANDBY")
-                        pool_stats["STANDBY"]["last_validation"] = datetime.now().isoformat()
-                    
-                except Exception as e:
-                    log_to_render(f"❌ WORKER 2 VALIDATION ERROR: {str(e)}")
-            
-            # STEP 2: Re-validate existing pools (rolling maintenance)
-            pools_to_maintain = ["PRIMARY", "STANDBY", "EMERGENCY"]
-            for pool_name in pools_to_maintain:
-                with pool_locks[pool_name]:
-                    pool_size = len(proxy_pools[pool_name])
-                    if pool_size > 50:  # Only maintain if pool has reasonable size
-                        # Validate 20% của pool mỗi cycle
-                        sample_size = max(10, pool_size // 5)
-                        sample_proxies = proxy_pools[pool_name][:sample_size]
-                        
-                        # Convert to validation format
-                        validation_list = []
-                        for p in sample_proxies:
-                            if isinstance(p, dict) and 'host' in p and 'port' in p:
-                                proxy_string = f"{p['host']}:{p['port']}"
-                                proxy_type = p.get('type', 'http')
-                                validation_list.append(('maintenance', proxy_string, [proxy_type]))
-                        
-                        log_to_render(f"🔧 WORKER 2: Maintaining {len(validation_list)} proxy in {pool_name}")
-                        
-                        try:
-                            still_alive = validate_proxy_batch_smart(validation_list, max_workers=10)
-                            
-                            # SMART DEAD PROXY HANDLING với resurrection system
-                            alive_keys = {f"{p['host']}:{p['port']}" for p in still_alive}
-                            
-                            # Separate alive và dead proxy
-                            original_size = len(proxy_pools[pool_name])
-                            alive_proxies = []
-                            dead_proxies = []
-                            
-                            for p in proxy_pools[pool_name]:
-                                if isinstance(p, dict) and f"{p['host']}:{p['port']}" in alive_keys:
-                                    alive_proxies.append(p)
-                                else:
-                                    dead_proxies.append(p)
-                            
-                            # Update pool với only alive proxy
-                            proxy_pools[pool_name] = alive_proxies
-                            
-                            # Categorize dead proxy cho resurrection
-                            if dead_proxies:
-                                for dead_proxy in dead_proxies:
-                                    categorize_dead_proxy(dead_proxy, failure_count=1)
-                                
-                                log_to_render(f"💀➡️🔄 WORKER 2: {len(dead_proxies)} dead proxy from {pool_name} scheduled for resurrection")
-                            
-                            removed_count = len(dead_proxies)
-                            if removed_count > 0:
-                                log_to_render(f"🗑️ WORKER 2: Removed {removed_count} dead proxy from {pool_name} (sent to resurrection queue)")
-                            
-                            pool_stats[pool_name]["last_validation"] = datetime.now().isoformat()
-                            
-                        except Exception as e:
-                            log_to_render(f"❌ WORKER 2 MAINTENANCE ERROR in {pool_name}: {str(e)}")
-            
-            # Sleep 30 seconds between validation cycles
-            time.sleep(30)
-            
-        except Exception as e:
-            log_to_render(f"❌ WORKER 2 CRITICAL ERROR: {str(e)}")
-            time.sleep(60)
+    check_pool_watermarks(summary)
+    mark_shared_state_dirty()
+    return pool_snapshot
+
+def _queue_pool_changes(pool_name, removed=(), added=()):
+    """Ghi records bớt/thêm của 1 tier cho change feed + đánh dấu pool dirty (caller giữ pool_locks[pool_name])"""
+    _mark_snapshot_dirty(pool_name)
+    pending = pending_pool_changes.get(pool_name)
+    if pending is None:
+        return
+    pending.extend((next(change_seq), "remove", pool_name, proxy) for proxy in removed)
+    pending.extend((next(change_seq), "add", pool_name, proxy) for proxy in added)
 
-def worker3_pool_balancer():
-    """WORKER 3: Auto-balance pools và promote STANDBY → PRIMARY"""
-    log_to_render("🔄 WORKER 3: Pool balancer started")
+def record_pool_changes(changes, version):
+    """Apply changes (theo thứ tự xảy ra) vào serving map → append add/remove events vào change log.
+
+    O(số records đổi). `changes` đã sort theo seq. Caller giữ snapshot_publish_lock (events luôn theo thứ tự version).
+    Move giữa tiers (cùng record) không tạo event: remove chỉ có hiệu lực khi key vẫn ở đúng tier + record đó.
+    """
+    serving = change_feed["serving"]
+    previous = {}
+    for _, op, tier_name, proxy in changes:
+        key = proxy_key_of(proxy)
+        entry = serving.get(key)
+        if key not in previous:
+            previous[key] = entry[1] if entry is not None else None
+        if op == "add":
+            serving[key] = (tier_name, proxy)
+        elif entry is not None and entry[0] == tier_name and entry[1] is proxy:
+            del serving[key]
     
-    balance_cycle = 0
+    events = []
+    for key, old in previous.items():
+        entry = serving.get(key)
+        if entry is None:
+            if old is not None:
+                events.append((version, "remove", key, None))
+        elif old is None or (entry[1] is not old and entry[1] != old):
+            events.append((version, "add", key, entry[1]))  # Follower install: record mới nhưng bằng nhau → không event
+    if not events:
+        return
     
-    while worker_control["pool_balancer_active"]:
-        try:
-            balance_cycle += 1
-            summary = get_pool_summary()
-            
-            log_to_render(f"📊 WORKER 3 CYCLE {balance_cycle}: Pool status - " + 
-                         f"PRIMARY:{summary['PRIMARY']}, STANDBY:{summary['STANDBY']}, " +
-                         f"EMERGENCY:{summary['EMERGENCY']}, GUARANTEED:{summary['GUARANTEED']}")
-            
-            # PROMOTION LOGIC: STANDBY → PRIMARY
-            primary_deficit = TARGET_POOLS["PRIMARY"] - summary["PRIMARY"]
-            if primary_deficit > 0 and summary["STANDBY"] > 0:
-                promote_count = min(primary_deficit, summary["STANDBY"])
-                
-                with pool_locks["STANDBY"], pool_locks["PRIMARY"]:
-                    proxies_to_promote = proxy_pools["STANDBY"][:promote_count]
-                    proxy_pools["PRIMARY"].extend(proxies_to_promote)
-                    proxy_pools["STANDBY"] = proxy_pools["STANDBY"][promote_count:]
-                
-                log_to_render(f"⬆️ WORKER 3: Promoted {promote_count} proxy STANDBY → PRIMARY")
-            
-            # EMERGENCY FILL: STANDBY → EMERGENCY
-            emergency_deficit = TARGET_POOLS["EMERGENCY"] - summary["EMERGENCY"]
-            if emergency_deficit > 0 and summary["STANDBY"] > TARGET_POOLS["STANDBY"]:
-                # Only fill emergency từ excess STANDBY
-                excess_standby = summary["STANDBY"] - TARGET_POOLS["STANDBY"]
-                fill_count = min(emergency_deficit, excess_standby)
-                
-                if fill_count > 0:
-                    with pool_locks["STANDBY"], pool_locks["EMERGENCY"]:
-                        proxies_to_emergency = proxy_pools["STANDBY"][:fill_count]
-                        proxy_pools["EMERGENCY"].extend(proxies_to_emergency)
-                        proxy_pools["STANDBY"] = proxy_pools["STANDBY"][fill_count:]
-                    
-                    log_to_render(f"🚨 WORKER 3: Filled {fill_count} proxy to EMERGENCY pool")
-            
-            # GUARANTEE CHECK
-            if not summary["GUARANTEED"]:
-                log_to_render(f"🚨 GUARANTEE VIOLATION: Only {summary['TOTAL_AVAILABLE']} < {MINIMUM_GUARANTEED} proxy available!")
-                worker_control["emergency_mode"] = True
+    with change_log_lock:
+        overflow = len(change_log) + len(events) - CHANGE_LOG_MAX_EVENTS
+        if overflow > 0:
+            # Events sắp rơi khỏi log → client có since nhỏ hơn version của chúng phải resync
+            if len(events) > CHANGE_LOG_MAX_EVENTS:
+                change_feed["truncated_through"] = version
             else:
-                log_to_render(f"✅ GUARANTEE OK: {summary['TOTAL_AVAILABLE']} ≥ {MINIMUM_GUARANTEED} proxy available")
-            
-            # Sleep 60 seconds between balance cycles
-            time.sleep(60)
-            
-        except Exception as e:
-            log_to_render(f"❌ WORKER 3 CRITICAL ERROR: {str(e)}")
-            time.sleep(120)
+                change_feed["truncated_through"] = change_log[overflow - 1][0]
+        change_log.extend(events)
+        change_feed["events"] += len(events)
 
-def initialize_service():
-    """Initialize service - được gọi khi Flask app start"""
-    if startup_status["initialized"]:
-        return
-        
-    try:
-        log_to_render("🚀 KHỞI ĐỘNG PROXY VALIDATION SERVICE")
-        log_to_render("🔧 Tối ưu cho Render free plan (512MB RAM) - TARGET 1000 PROXY MODE")
-        log_to_render("📋 Cấu hình: Timeout=8s, Workers=20, Chunks=500, Target=1000 proxy live")
-        log_to_render(f"🎯 TARGET: Sẽ tiếp tục fetch cho đến khi đạt {TARGET_LIVE_PROXIES} proxy live")
-        
-        # Start background thread
-        log_to_render("🔄 ĐANG KHỞI ĐỘNG BACKGROUND THREAD...")
-        try:
-            refresh_thread = threading.Thread(target=background_proxy_refresh, daemon=True)
-            refresh_thread.start()
-            log_to_render("✅ Background thread started!")
-            
-            # Verify thread is running
-            if refresh_thread.is_alive():
-                log_to_render("✅ Background thread confirmed ALIVE!")
-                with cache_lock:
-                    startup_status["background_thread_started"] = True
-            else:
-                log_to_render("❌ Background thread not alive!")
-                startup_status["error_count"] += 1
-                
-        except Exception as e:
-            log_to_render(f"❌ LỖI CRITICAL khởi động background thread: {str(e)}")
-            startup_status["error_count"] += 1
-        
-        # Set empty cache initially
-        log_to_render("💾 Setting initial empty cache...")
-        with cache_lock:
-            proxy_cache["http"] = []
-            proxy_cache["last_update"] = datetime.now().isoformat()
-            proxy_cache["total_checked"] = 0
-            proxy_cache["alive_count"] = 0
-            proxy_cache["sources_processed"] = 0
-        
-        with cache_lock:
-            startup_status["initialized"] = True
-        log_to_render("✅ SERVICE INITIALIZATION COMPLETED!")
-        
-    except Exception as e:
-        log_to_render(f"❌ LỖI CRITICAL INITIALIZATION: {str(e)}")
-        startup_status["error_count"] += 1
+def get_pool_changes(since, epoch=None):
+    """Delta của serving set kể từ `since` (net effect theo key). Không trả được delta → full set + resync"""
+    snapshot = pool_snapshot
+    current_version = snapshot["version"]
+    change_feed["requests"] += 1
+    result = {
+        "epoch": change_feed["epoch"],
+        "since": since,
+        "version": current_version
+    }
+    
+    with change_log_lock:
+        resync = (
+            (epoch is not None and epoch != change_feed["epoch"]) or
+            since > current_version or
+            since < change_feed["truncated_through"]
+        )
+        if not resync:
+            # Đi ngược từ cuối log → chi phí tỉ lệ với delta, không với kích thước log
+            pending = list(itertools.takewhile(lambda event: event[0] > since, reversed(change_log)))
+    
+    if resync:
+        change_feed["resyncs"] += 1
+        result["resync"] = True
+        result["proxies"] = [p for tier_name in READ_TIERS for p in snapshot["pools"][tier_name]]
+        return result
+    
+    latest = {}
+    for event_version, op, key, proxy in reversed(pending):
+        if event_version <= current_version:
+            latest[key] = proxy if op == "add" else None
+    result["resync"] = False
+    result["added"] = [proxy for proxy in latest.values() if proxy is not None]
+    result["removed"] = [key for key, proxy in latest.items() if proxy is None]
+    return result
+
+def get_change_feed_summary():
+    """Change feed stats cho monitoring"""
+    return {
+        "epoch": change_feed["epoch"],
+        "log_events": len(change_log),
+        "max_events": CHANGE_LOG_MAX_EVENTS,
+        "oldest_version": change_log[0][0] if change_log else None,
+        "truncated_through": change_feed["truncated_through"],
+        "serving_keys": len(change_feed["serving"]),
+        **{name: change_feed[name] for name in ("events", "requests", "resyncs")}
+    }
 
+def candidate_key_of(proxy_data):
+    """host:port key của FRESH candidate tuple (type, proxy_string, protocols) hoặc string"""
+    proxy_string = proxy_data[1] if isinstance(proxy_data, tuple) else str(proxy_data)
+    return proxy_string.rsplit('@', 1)[-1].strip()
 
-def is_quality_proxy(proxy_string):
-    """Basic quality filter for better output"""
-    try:
-        # Skip obviously bad proxies
-        if not proxy_string or len(proxy_string) < 7:
-            return False
-        
-        # Basic format validation
-        if ':' not in proxy_string:
-            return False
-            
-        parts = proxy_string.split(':')
-        if len(parts) != 2:
-            return False
-            
-        host, port = parts
-        
-        # Skip localhost, private IPs, invalid ports
-        if host.startswith(('127.', '10.', '192.168.', '172.')):
+def get_proxy_tier(proxy_key):
+    """Tier hiện tại của proxy (PRIMARY/STANDBY/EMERGENCY) hoặc None - O(1), không lock"""
+    entry = proxy_membership.get(proxy_key)
+    return entry[0] if entry else None
+
+def egress_of(proxy):
+    """Egress IP của proxy (field `ip` từ judge). Chưa biết → chính host:port (group 1 proxy)"""
+    ip = proxy.get('ip')
+    if isinstance(ip, str):
+        ip = ip.split(',')[0].strip()  # httpbin origin có thể là "a.b.c.d, e.f.g.h"
+        if ip and ip != 'unknown':
+            return ip
+    return proxy_key_of(proxy)
+
+def _egress_add(proxy_key, proxy):
+    """Caller giữ membership_lock"""
+    egress_groups.setdefault(egress_of(proxy), set()).add(proxy_key)
+
+def _egress_remove(proxy_key, proxy):
+    """Caller giữ membership_lock"""
+    egress = egress_of(proxy)
+    group = egress_groups.get(egress)
+    if group is not None:
+        group.discard(proxy_key)
+        if not group:
+            del egress_groups[egress]
+
+def make_distinct_egress_filter(is_available=None):
+    """Stateful predicate: mỗi egress IP chỉ được pick 1 lần trong 1 request.
+
+    Dùng được cho mọi serving path (rotate_pick/query_proxies/get_fastest_proxies)
+    vì predicate chỉ được gọi cho candidate sắp được pick.
+    """
+    seen = set()
+    
+    def predicate(proxy):
+        if is_available is not None and not is_available(proxy):
             return False
-            
-        if not port.isdigit() or int(port) < 1 or int(port) > 65535:
+        egress = egress_of(proxy)
+        if egress in seen:
             return False
-            
+        seen.add(egress)
         return True
-    except:
-        return False
+    
+    return predicate
 
-def check_single_proxy(proxy_string, timeout=8, protocols=['http']):
-    """Kiểm tra 1 proxy với các protocols khác nhau - tối ưu cho Render"""
-    try:
-        if ':' not in proxy_string:
-            return None
-            
-        # Parse proxy format: host:port hoặc username:password@host:port
-        if '@' in proxy_string:
-            auth_part, host_port = proxy_string.split('@')
-            if ':' in auth_part:
-                username, password = auth_part.split(':', 1)
-            else:
-                username, password = auth_part, ""
-        else:
-            username, password = None, None
-            host_port = proxy_string
+def get_egress_groups(keys):
+    """Group proxy keys theo egress hiện tại trong index → {egress: [keys]}"""
+    groups = {}
+    with membership_lock:
+        for proxy_key in keys:
+            entry = proxy_membership.get(proxy_key)
+            if entry is not None:
+                groups.setdefault(egress_of(entry[1]), []).append(proxy_key)
+    return groups
 
-        if ':' not in host_port:
-            return None
-            
-        host, port = host_port.strip().split(':', 1)
-        
-        # Test URLs 
-        test_urls = [
-            'http://httpbin.org/ip',
-            'http://ip-api.com/json',
-            'https://api.ipify.org',
-        ]
-        
-        # Test với từng protocol
-        for protocol in protocols:
-            try:
-                # Setup proxy theo protocol
-                if username and password:
-                    if protocol in ['socks4', 'socks5']:
-                        proxy_url = f"{protocol}://{username}:{password}@{host}:{port}"
-                    else:
-                        proxy_url = f"http://{username}:{password}@{host}:{port}"
-                else:
-                    if protocol in ['socks4', 'socks5']:
-                        proxy_url = f"{protocol}://{host}:{port}"
-                    else:
-                        proxy_url = f"http://{host}:{port}"
-                
-                proxies = {
-                    'http': proxy_url,
-                    'https': proxy_url
-                }
-                
-                start_time = time.time()
-                
-                # Test proxy với multiple URLs
-                for test_url in test_urls:
-                    try:
-                        response = requests.get(
-                            test_url,
-                            proxies=proxies,
-                            timeout=timeout,
-                            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                        )
-                        
-                        if response.status_code == 200:
-                            speed = round(time.time() - start_time, 2)
-                            
-                            # Get proxy IP
-                            try:
-                                ip_data = response.json()
-                                proxy_ip = ip_data.get('origin', ip_data.get('query', ip_data.get('ip', 'unknown')))
-                                # Clean IP (remove port if present)
-                                if ',' in proxy_ip:
-                                    proxy_ip = proxy_ip.split(',')[0]
-                            except Exception:
-                                proxy_ip = 'unknown'
-                            
-                            return {
-                                'host': host,
-                                'port': int(port),
-                                'type': protocol,
-                                'speed': speed,
-                                'status': 'alive',
-                                'ip': proxy_ip,
-                                'checked_at': datetime.now().isoformat(),
-                                'proxy_string': f"{host}:{port}",
-                                'full_proxy': proxy_string,
-                                'has_auth': bool(username and password)
-                            }
-                    except Exception:
-                        # REMOVED: Bỏ error logs để giảm noise
-                        continue
-                        
-            except Exception:
-                # REMOVED: Bỏ error logs để giảm noise
-                continue
-                
-    except Exception:
-        # REMOVED: Bỏ error logs để giảm noise
-        pass
-    
-    return None
+def get_egress_summary(top=10):
+    """Exit-IP index stats: bao nhiêu identity thực sự đằng sau serving tiers"""
+    with membership_lock:
+        sizes = [(len(keys), egress) for egress, keys in egress_groups.items()]
+        tracked = len(proxy_membership)
+    shared = [entry for entry in sizes if entry[0] > 1]
+    return {
+        "distinct_egress": len(sizes),
+        "tracked_proxies": tracked,
+        "shared_egress_groups": len(shared),
+        "proxies_behind_shared_egress": sum(size for size, _ in shared),
+        "largest_groups": [{"egress": egress, "proxies": size} for size, egress in heapq.nlargest(top, shared)],
+        **egress_stats
+    }
 
-def fetch_proxies_from_sources():
-    """Lấy proxy từ tất cả nguồn với logic thông minh - tối ưu cho Render"""
-    categorized_proxies = []
-    mixed_proxies = []
-    sources_processed = 0
-    
-    log_to_render("🔍 BẮT ĐẦU FETCH PROXY TỪ CÁC NGUỒN...")
-    log_to_render(f"📋 Tổng {len(PROXY_SOURCE_LINKS['categorized'])} categorized + {len(PROXY_SOURCE_LINKS['mixed'])} mixed sources")
+def _claim_membership(tier_name, records):
+    """Claim key cho tier → trả về records được admit (key chưa thuộc tier nào).
+
+    Caller giữ pool_locks[tier_name]. Duplicate across tiers bị reject tại đây.
+    """
+    if tier_name not in pool_indexes:
+        return list(records)
     
-    # Xử lý các categorized sources
-    log_to_render("📥 Xử lý CATEGORIZED sources...")
-    for source_name, source_config in PROXY_SOURCE_LINKS["categorized"].items():
-        try:
-            # Check if source has multiple protocols or single protocol
-            if "url" in source_config and "protocol" in source_config:
-                # Single protocol format
-                source_url = source_config["url"]
-                source_protocol = source_config["protocol"]
-                protocols_to_fetch = [(source_protocol, source_url)]
-            else:
-                # Multiple protocols format (like dpangestuw)
-                protocols_to_fetch = [(protocol, url) for protocol, url in source_config.items()]
-            
-            source_total_proxies = []
-            
-            for source_protocol, source_url in protocols_to_fetch:
-                # REMOVED: Bỏ log individual protocol
-                
-                response = get_with_session(source_url, timeout=45)
-                
-                if response.status_code == 200:
-                    content = response.text
-                    lines = content.strip().split('\n')
-                    source_proxies = []
-                    
-                    for line in lines:
-                        line = line.strip()
-                        if not line or line.startswith('#'):
-                            continue
-                        
-                        # Xử lý đặc biệt cho server dpangestuw - loại bỏ protocol prefix
-                        if source_name == "Server dpangestuw":
-                            if line.startswith('socks4://'):
-                                line = line.replace('socks4://', '')
-                            elif line.startswith('socks5://'):
-                                line = line.replace('socks5://', '')
-                            
-                        # Validate proxy format
-                        if ':' in line and is_quality_proxy(line.strip()):
-                            try:
-                                # Check if it's valid proxy format
-                                if '@' in line:
-                                    auth_part, host_port = line.split('@')
-                                    host, port = host_port.split(':')
-                                else:
-                                    host, port = line.split(':')
-                                
-                                # Basic validation
-                                if len(host.split('.')) == 4 and port.isdigit():
-                                    source_proxies.append(('categorized', line, source_protocol))
-                                    
-                            except Exception:
-                                continue
-                    
-                    source_total_proxies.extend(source_proxies)
-                    # REDUCED: Chỉ log nếu có proxy
-                    if len(source_proxies) > 0:
-                        log_to_render(f"✅ {source_name} - {source_protocol}: {len(source_proxies)} proxy")
-                else:
-                    log_to_render(f"❌ {source_name} - {source_protocol}: HTTP {response.status_code}")
-            
-            categorized_proxies.extend(source_total_proxies)
-            sources_processed += 1
-            log_to_render(f"🎯 {source_name} TOTAL: {len(source_total_proxies)} proxy")
+    admitted = []
+    with membership_lock:
+        for proxy in records:
+            if not isinstance(proxy, dict) or 'host' not in proxy or 'port' not in proxy:
+                continue
+            proxy_key = proxy_key_of(proxy)
+            if proxy_key in proxy_membership:
+                membership_stats["duplicates_rejected"] += 1
+                continue
+            proxy_membership[proxy_key] = (tier_name, proxy)
+            _egress_add(proxy_key, proxy)
+            admitted.append(proxy)
+    return admitted
+
+def _release_membership(records):
+    """Evict keys khỏi membership (chỉ khi entry trỏ đúng record này) - O(1) per proxy"""
+    with membership_lock:
+        for proxy in records:
+            if not isinstance(proxy, dict) or 'host' not in proxy or 'port' not in proxy:
+                continue
+            proxy_key = proxy_key_of(proxy)
+            entry = proxy_membership.get(proxy_key)
+            if entry is not None and entry[1] is proxy:
+                del proxy_membership[proxy_key]
+                _egress_remove(proxy_key, proxy)
+
+def _move_membership(target_tier, records, replacements=None):
+    """Update tier (và optional record mới) của keys đã claim - O(1) per proxy"""
+    with membership_lock:
+        for proxy in records:
+            proxy_key = proxy_key_of(proxy)
+            entry = proxy_membership.get(proxy_key)
+            if entry is not None and entry[1] is proxy:
+                new_record = replacements.get(proxy_key, proxy) if replacements else proxy
+                proxy_membership[proxy_key] = (target_tier, new_record)
+                if new_record is not proxy:
+                    # Re-check có thể ra egress khác → chuyển group
+                    _egress_remove(proxy_key, proxy)
+                    _egress_add(proxy_key, new_record)
+
+def pool_extend(pool_name, records, publish=True):
+    """Append records vào pool rồi publish snapshot. Trả về số records thực sự được add.
+
+    Serving tiers đi qua membership index → proxy đã có ở tier khác bị reject (không duplicate).
+    publish=False: caller đang làm batch, tự publish 1 lần cuối batch (áp dụng cho mọi pool_* helpers).
+    """
+    if not records:
+        return 0
+    with pool_locks[pool_name]:
+        admitted = _claim_membership(pool_name, records)
+        proxy_pools[pool_name].extend(admitted)
+        _index_add(pool_name, admitted)
+        _queue_pool_changes(pool_name, added=admitted)
+    if admitted and publish:
+        publish_pool_snapshot()
+    return len(admitted)
+
+def pool_take_front(pool_name, count, publish=True):
+    """Lấy (và remove) tối đa `count` records đầu pool"""
+    with pool_locks[pool_name]:
+        taken = proxy_pools[pool_name][:count]
+        proxy_pools[pool_name] = proxy_pools[pool_name][len(taken):]
+        _index_remove(pool_name, taken)
+        _queue_pool_changes(pool_name, removed=taken)
+        if pool_name in pool_indexes:
+            _release_membership(taken)
+    if taken and publish:
+        publish_pool_snapshot()
+    return taken
+
+def pool_replace(pool_name, records, publish=True):
+    """Thay toàn bộ nội dung pool (copy-on-write: list mới, không mutate list cũ)"""
+    with pool_locks[pool_name]:
+        previous = proxy_pools[pool_name]
+        if pool_name in pool_indexes:
+            _release_membership(previous)
+        proxy_pools[pool_name] = _claim_membership(pool_name, records)
+        _index_rebuild(pool_name)
+        _queue_pool_changes(pool_name, removed=previous, added=proxy_pools[pool_name])
+    if publish:
+        publish_pool_snapshot()
+
+def pool_transfer(source_pool, target_pool, count, publish=True):
+    """Move tối đa `count` records từ đầu source_pool sang cuối target_pool"""
+    with pool_locks[source_pool], pool_locks[target_pool]:
+        moved = proxy_pools[source_pool][:count]
+        proxy_pools[target_pool].extend(moved)
+        proxy_pools[source_pool] = proxy_pools[source_pool][len(moved):]
+        _index_remove(source_pool, moved)
+        _index_add(target_pool, moved)
+        _move_membership(target_pool, moved)
+        _queue_pool_changes(source_pool, removed=moved)
+        _queue_pool_changes(target_pool, added=moved)
+    if moved:
+        if publish:
+            publish_pool_snapshot()
+        inc_metric("proxy_pool_transfers_total", (("from_tier", source_pool), ("to_tier", target_pool)), len(moved))
+    return len(moved)
+
+def get_membership_summary():
+    """Membership index stats cho monitoring"""
+    tier_counts = {tier_name: 0 for tier_name in READ_TIERS}
+    for tier_name, _ in list(proxy_membership.values()):
+        tier_counts[tier_name] = tier_counts.get(tier_name, 0) + 1
+    return {
+        "tracked_proxies": len(proxy_membership),
+        "per_tier": tier_counts,
+        **membership_stats
+    }
+
+# SCORE-BASED ADMISSION / EVICTION cho FRESH và STANDBY
+# Memory budget cố định → giữ candidates có giá trị nhất thay vì cắt mù theo vị trí.
+
+def count_eviction(pool_name, reason, count=1):
+    """Eviction counters theo pool + reason"""
+    if count <= 0:
+        return
+    reasons = eviction_stats.setdefault(pool_name, {})
+    reasons[reason] = reasons.get(reason, 0) + count
+
+def record_source_fetch(source_name, proxies, fetch_seconds, fetch_sources):
+    """Update source stats sau khi fetch 1 source, ghi nhớ source của từng candidate"""
+    stats = source_stats.setdefault(source_name, {
+        "fetched": 0, "validated": 0, "alive": 0, "last_fetch": None, "last_fetch_count": 0, "fetch_seconds": None
+    })
+    stats["fetched"] += len(proxies)
+    stats["last_fetch_count"] = len(proxies)
+    stats["last_fetch"] = datetime.now().isoformat()
+    stats["fetch_seconds"] = round(fetch_seconds, 2)
+    observe_metric("proxy_source_fetch_duration_seconds", (("source", source_name),), fetch_seconds)
+    for proxy_data in proxies:
+        fetch_sources.setdefault(candidate_key_of(proxy_data), source_name)
+
+def record_source_validation(source_name, validated, alive):
+    """Update yield của source sau khi validate FRESH candidates"""
+    stats = source_stats.get(source_name)
+    if stats is None:
+        return
+    stats["validated"] += validated
+    stats["alive"] += alive
+
+def get_source_yield(source_name):
+    """Alive / validated với prior SCORE_SOURCE_PRIOR (source mới chưa có data)"""
+    stats = source_stats.get(source_name)
+    if not stats:
+        return SCORE_SOURCE_PRIOR
+    weight = SCORE_PRIOR_WEIGHT
+    return (stats["alive"] + SCORE_SOURCE_PRIOR * weight) / (stats["validated"] + weight)
+
+def record_liveness(proxy_key, alive):
+    """Lưu kết quả check vào liveness history (LRU bounded)"""
+    with liveness_lock:
+        entry = liveness_history.pop(proxy_key, None) or [0, 0]
+        entry[0] += 1 if alive else 0
+        entry[1] += 1
+        liveness_history[proxy_key] = entry
+        if len(liveness_history) > LIVENESS_HISTORY_MAX:
+            liveness_history.popitem(last=False)
+
+def get_liveness_rate(proxy_key, default):
+    """Alive ratio của proxy qua các lần check trước (default nếu chưa từng check).
+
+    Uptime dài hạn từ history store (survive restart / LRU eviction) làm prior thay cho default.
+    """
+    history = history_uptime.get(proxy_key)
+    if history:
+        default = (history[0] + default * SCORE_PRIOR_WEIGHT) / (history[1] + SCORE_PRIOR_WEIGHT)
+    entry = liveness_history.get(proxy_key)
+    if not entry:
+        return default
+    alive, checks = entry
+    return (alive + default * SCORE_PRIOR_WEIGHT) / (checks + SCORE_PRIOR_WEIGHT)
+
+def subnet_of(proxy_key):
+    """/24 prefix 'a.b.c' của IPv4 proxy key (None nếu host không phải IPv4)"""
+    host = proxy_key.rsplit(':', 1)[0]
+    parts = host.split('.')
+    if len(parts) != 4 or not all(part.isdigit() for part in parts):
+        return None
+    return host.rsplit('.', 1)[0]
+
+def record_subnet_outcome(proxy_key, alive, now=None):
+    """Feed kết quả validation/resurrection vào reputation của /24 (decayed counters)"""
+    prefix = subnet_of(proxy_key)
+    if prefix is None:
+        return
+    now = now if now is not None else time.time()
+    with subnet_lock:
+        entry = subnet_reputation.pop(prefix, None)
+        if entry is None:
+            entry = [0.0, 0.0, now]
+        else:
+            # Decay theo half-life → reputation phản ánh kết quả gần đây
+            decay = 0.5 ** ((now - entry[2]) / SUBNET_HALF_LIFE)
+            entry[0] *= decay
+            entry[1] *= decay
+            entry[2] = now
+        entry[0] += 1 if alive else 0
+        entry[1] += 1
+        subnet_reputation[prefix] = entry
+        if len(subnet_reputation) > SUBNET_TABLE_MAX:
+            subnet_reputation.popitem(last=False)
+
+def get_subnet_alive_rate(proxy_key):
+    """Alive rate gần đây của /24 (None nếu chưa đủ SUBNET_MIN_CHECKS observations)"""
+    prefix = subnet_of(proxy_key)
+    entry = subnet_reputation.get(prefix) if prefix else None
+    if not entry or entry[1] < SUBNET_MIN_CHECKS:
+        return None
+    return entry[0] / entry[1]
+
+def is_bad_subnet(proxy_key):
+    """/24 gần như chết toàn bộ (alive rate ≤ SUBNET_BAD_ALIVE_RATE)"""
+    alive_rate = get_subnet_alive_rate(proxy_key)
+    return alive_rate is not None and alive_rate <= SUBNET_BAD_ALIVE_RATE
+
+def sample_bad_subnets(items, key_of, batch_size):
+    """Tách items thuộc bad /24: giữ tối đa exploration budget, phần còn lại trả về riêng.
+
+    Trả về (kept, skipped).
+    """
+    exploration_left = max(1, int(batch_size * SUBNET_EXPLORATION_RATE))
+    kept = []
+    skipped = []
+    for item in items:
+        if not is_bad_subnet(key_of(item)):
+            kept.append(item)
+        elif exploration_left > 0:
+            exploration_left -= 1
+            subnet_stats["explored"] += 1
+            kept.append(item)
+        else:
+            skipped.append(item)
+    return kept, skipped
+
+def get_subnet_summary(limit=10):
+    """Reputation table stats + các /24 tệ nhất"""
+    entries = [(prefix, entry) for prefix, entry in list(subnet_reputation.items()) if entry[1] >= SUBNET_MIN_CHECKS]
+    bad = [(prefix, entry) for prefix, entry in entries if entry[0] / entry[1] <= SUBNET_BAD_ALIVE_RATE]
+    worst = heapq.nsmallest(limit, entries, key=lambda item: (item[1][0] / item[1][1], -item[1][1]))
+    return {
+        "tracked_prefixes": len(subnet_reputation),
+        "rated_prefixes": len(entries),
+        "bad_prefixes": len(bad),
+        "bad_alive_rate": SUBNET_BAD_ALIVE_RATE,
+        "exploration_rate": SUBNET_EXPLORATION_RATE,
+        **subnet_stats,
+        "worst": [
+            {"prefix": f"{prefix}.0/24", "alive_rate": round(entry[0] / entry[1], 3), "recent_checks": round(entry[1], 1)}
+            for prefix, entry in worst
+        ]
+    }
+
+def score_fresh_candidate(proxy_data, now):
+    """Score FRESH candidate: source yield + past liveness + age (fetch càng lâu càng giảm)"""
+    meta = fresh_candidate_meta.get(candidate_key_of(proxy_data))
+    source_name, fetched_at = meta if meta else (None, now)
+    source_yield = get_source_yield(source_name)
+    # Proxy chưa từng check → dùng reputation của /24 làm prior (fallback source yield)
+    subnet_rate = get_subnet_alive_rate(candidate_key_of(proxy_data))
+    liveness = get_liveness_rate(candidate_key_of(proxy_data), subnet_rate if subnet_rate is not None else source_yield)
+    freshness = 1 / (1 + max(0, now - fetched_at) / SCORE_AGE_HALF_LIFE)
+    return 0.5 * source_yield + 0.3 * liveness + 0.2 * freshness
+
+def score_validated_proxy(proxy, now):
+    """Score validated proxy (STANDBY): source yield + past liveness + speed + age của checked_at"""
+    source_yield = get_source_yield(proxy.get('source'))
+    liveness = get_liveness_rate(proxy_key_of(proxy), 1.0)
+    speed_factor = 1 / (1 + proxy_speed_of(proxy))
+    try:
+        checked_age = now - datetime.fromisoformat(proxy.get('checked_at')).timestamp()
+    except (TypeError, ValueError):
+        checked_age = SCORE_AGE_HALF_LIFE
+    freshness = 1 / (1 + max(0, checked_age) / SCORE_AGE_HALF_LIFE)
+    return 0.15 * source_yield + 0.35 * liveness + 0.3 * speed_factor + 0.2 * freshness
+
+def fresh_admit(candidates, fetch_sources):
+    """Admit candidates vào FRESH. Khi vượt FRESH_MAX_SIZE → evict lowest score về FRESH_TRIM_SIZE.
+
+    Trả về số candidates mới còn nằm trong FRESH sau admission.
+    """
+    now = time.time()
+    with pool_locks["FRESH"]:
+        existing_fresh = {candidate_key_of(p) for p in proxy_pools["FRESH"]}
+        new_candidates = []
         
-        except Exception as e:
-            log_to_render(f"❌ {source_name}: {str(e)}")
-            continue
-    
-    # Xử lý mixed sources sau
-    log_to_render("📥 Xử lý MIXED sources...")
-    for source_name, source_config in PROXY_SOURCE_LINKS["mixed"].items():
-        try:
-            source_url = source_config["url"]
-            source_protocols = source_config["protocols"]
-            # REMOVED: Bỏ log chi tiết protocols
+        for proxy_data in candidates:
+            proxy_key = candidate_key_of(proxy_data)
+            if proxy_key in existing_fresh:
+                count_eviction("FRESH", "duplicate")
+                continue
+            if is_blacklisted(proxy_key, now):
+                # Permanent dead → không queue lại để validate
+                permanent_blacklist["rejected"] += 1
+                count_eviction("FRESH", "blacklisted")
+                continue
+            if proxy_key in proxy_membership:
+                # Đã nằm trong serving tier → không validate lại
+                membership_stats["fresh_skipped"] += 1
+                count_eviction("FRESH", "already_serving")
+                continue
+            new_candidates.append(proxy_data)
+            existing_fresh.add(proxy_key)
+            fresh_candidate_meta[proxy_key] = (fetch_sources.get(proxy_key), now)
+        
+        proxy_pools["FRESH"].extend(new_candidates)
+        _mark_snapshot_dirty("FRESH")
+        admitted = len(new_candidates)
+        
+        # Limit FRESH pool size để tránh memory overflow - giữ highest score
+        if len(proxy_pools["FRESH"]) > FRESH_MAX_SIZE:
+            scored = [(score_fresh_candidate(p, now), position, p) for position, p in enumerate(proxy_pools["FRESH"])]
+            keep = heapq.nlargest(FRESH_TRIM_SIZE, scored, key=lambda entry: entry[0])
+            keep_positions = {position for _, position, _ in keep}
+            new_start = len(proxy_pools["FRESH"]) - len(new_candidates)
             
-            response = get_with_session(source_url, timeout=45)
+            evicted = [p for position, p in enumerate(proxy_pools["FRESH"]) if position not in keep_positions]
+            admitted -= sum(1 for position in range(new_start, len(proxy_pools["FRESH"])) if position not in keep_positions)
+            proxy_pools["FRESH"] = [p for position, p in enumerate(proxy_pools["FRESH"]) if position in keep_positions]
             
-            if response.status_code == 200:
-                content = response.text
-                lines = content.strip().split('\n')
-                source_proxies = []
-                
-                for line in lines:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                        
-                    # Validate proxy format
-                    if ':' in line and is_quality_proxy(line.strip()):
-                        try:
-                            # Check if it's valid proxy format
-                            if '@' in line:
-                                auth_part, host_port = line.split('@')
-                                host, port = host_port.split(':')
-                            else:
-                                host, port = line.split(':')
-                            
-                            # Basic validation  
-                            if len(host.split('.')) == 4 and port.isdigit():
-                                source_proxies.append(('mixed', line, source_protocols))
-                                
-                        except Exception:
-                            continue
-                
-                mixed_proxies.extend(source_proxies)
-                sources_processed += 1
-                log_to_render(f"✅ {source_name}: {len(source_proxies)} proxy")
-            else:
-                log_to_render(f"❌ {source_name}: HTTP {response.status_code}")
-        
-        except Exception as e:
-            log_to_render(f"❌ {source_name}: {str(e)}")
-            continue
+            for p in evicted:
+                fresh_candidate_meta.pop(candidate_key_of(p), None)
+            count_eviction("FRESH", "low_score", len(evicted))
     
-    # Combine tất cả proxy (categorized + mixed) - KHÔNG GIỚI HẠN
-    all_proxies = categorized_proxies + mixed_proxies
-    original_count = len(all_proxies)
-    
-    # Remove duplicates dựa trên proxy string (host:port)
-    seen = set()
-    unique_proxies = []
-    for proxy_data in all_proxies:
-        if isinstance(proxy_data, tuple) and len(proxy_data) >= 2:
-            proxy_string = proxy_data[1]  # proxy_string ở position 1
+    publish_pool_snapshot()
+    if admitted:
+        wake_job("validate_fresh", "fresh_arrival")
+    return admitted
+
+def fresh_take_best(count):
+    """Lấy `count` FRESH candidates có score cao nhất để validate. Trả về [(proxy_data, source_name)]"""
+    now = time.time()
+    with pool_locks["FRESH"]:
+        fresh = proxy_pools["FRESH"]
+        if not fresh:
+            return []
+        if len(fresh) <= count:
+            taken_positions = set(range(len(fresh)))
         else:
-            proxy_string = str(proxy_data)
+            scored = ((score_fresh_candidate(p, now), position) for position, p in enumerate(fresh))
+            taken_positions = {position for _, position in heapq.nlargest(count, scored)}
         
-        if proxy_string not in seen:
-            seen.add(proxy_string)
-            unique_proxies.append(proxy_data)
-    
-    duplicates_removed = original_count - len(unique_proxies)
-    random.shuffle(unique_proxies)
+        taken = [p for position, p in enumerate(fresh) if position in taken_positions]
+        proxy_pools["FRESH"] = [p for position, p in enumerate(fresh) if position not in taken_positions]
+        _mark_snapshot_dirty("FRESH")
+        
+        # Bulk-dead /24: chỉ validate exploration sample, phần còn lại bỏ luôn
+        taken, skipped = sample_bad_subnets(taken, candidate_key_of, count)
+        for p in skipped:
+            fresh_candidate_meta.pop(candidate_key_of(p), None)
+        subnet_stats["skipped_fresh"] += len(skipped)
+        count_eviction("FRESH", "bad_subnet", len(skipped))
+        
+        result = []
+        for p in taken:
+            meta = fresh_candidate_meta.pop(candidate_key_of(p), None)
+            result.append((p, meta[0] if meta else None))
     
-    log_to_render(f"🎯 HOÀN THÀNH FETCH: {len(unique_proxies)} unique proxy ({duplicates_removed} duplicates removed)")
-    log_to_render(f"📊 Đã xử lý {sources_processed} nguồn thành công")
-    log_to_render(f"📋 Original: {original_count} → Unique: {len(unique_proxies)} ({round(len(unique_proxies)/original_count*100, 1)}% unique)")
-    log_to_render(f"📋 Categorized: {len(categorized_proxies)}, Mixed: {len(mixed_proxies)}")
+    publish_pool_snapshot()
+    return result
+
+def _pool_remove(pool_name, records):
+    """Remove đúng các record objects khỏi pool + index + membership - caller giữ pool_locks[pool_name]"""
+    evict_ids = {id(p) for p in records}
+    kept = []
+    removed = []
+    for p in proxy_pools[pool_name]:
+        (removed if id(p) in evict_ids else kept).append(p)
+    proxy_pools[pool_name] = kept
+    _index_remove(pool_name, removed)
+    _queue_pool_changes(pool_name, removed=removed)
+    if pool_name in pool_indexes:
+        _release_membership(removed)
+    return removed
+
+def pool_evict(pool_name, records, publish=True):
+    """Remove đúng các record objects khỏi pool (index + membership cũng được update)"""
+    if not records:
+        return []
+    with pool_locks[pool_name]:
+        removed = _pool_remove(pool_name, records)
+    if removed and publish:
+        publish_pool_snapshot()
+    return removed
+
+def standby_enforce_budget(publish=True):
+    """STANDBY vượt STANDBY_MAX_SIZE → evict lowest score về TARGET_POOLS["STANDBY"]"""
+    with pool_locks["STANDBY"]:
+        standby = tuple(proxy_pools["STANDBY"])  # Caller có thể chưa publish batch hiện tại
+    if len(standby) <= STANDBY_MAX_SIZE:
+        return 0
     
-    return unique_proxies, sources_processed
+    now = time.time()
+    evict_count = len(standby) - TARGET_POOLS["STANDBY"]
+    lowest = heapq.nsmallest(evict_count, standby, key=lambda p: score_validated_proxy(p, now))
+    removed = pool_evict("STANDBY", lowest, publish=publish)
+    count_eviction("STANDBY", "low_score", len(removed))
+    return len(removed)
 
-def validate_proxy_batch_smart(proxy_list, max_workers=15):
-    """Validate proxies KHÔNG chunking - chỉ validate toàn bộ list được pass vào"""
-    if not proxy_list:
-        log_to_render("⚠️ Không có proxy để validate")
+def get_admission_summary():
+    """Admission/eviction stats cho monitoring"""
+    sources = {
+        source_name: {**stats, "yield": round(get_source_yield(source_name), 3)}
+        for source_name, stats in list(source_stats.items())
+    }
+    return {
+        "fresh_max_size": FRESH_MAX_SIZE,
+        "fresh_trim_size": FRESH_TRIM_SIZE,
+        "standby_max_size": STANDBY_MAX_SIZE,
+        "evictions": {pool_name: dict(reasons) for pool_name, reasons in list(eviction_stats.items())},
+        "liveness_tracked": len(liveness_history),
+        "sources": sources
+    }
+
+def get_pool_summary():
+    """Get summary of all pools cho monitoring - đọc từ snapshot, không lock"""
+    return dict(pool_snapshot["summary"])
+
+def rotate_pick(tier_name, records, limit, is_available):
+    """Fair rotation: pick tối đa `limit` records bắt đầu từ cursor của tier.
+
+    Cursor advance best-effort không cần lock - race chỉ gây overlap nhỏ giữa 2 request.
+    """
+    size = len(records)
+    if size == 0 or limit <= 0:
         return []
     
-    # Sử dụng global cache để update real-time
-    global proxy_cache
-    alive_proxies = []
-    total_proxies = len(proxy_list)
+    start = serving_cursor[tier_name] % size
+    picked = []
+    scanned = 0
+    while scanned < size and len(picked) < limit:
+        proxy = records[(start + scanned) % size]
+        scanned += 1
+        if is_available(proxy):
+            picked.append(proxy)
     
-    log_to_render(f"⚡ BẮT ĐẦU VALIDATE {total_proxies} PROXY")
-    log_to_render(f"🔧 Cấu hình: {max_workers} workers (KHÔNG sub-chunking)")
+    serving_cursor[tier_name] = start + scanned
+    return picked
+
+def select_from_tiers(snapshot, count, is_available):
+    """PRIMARY → STANDBY → EMERGENCY (→ CLUSTER) fallback với fair rotation trong từng tier"""
+    selected = []
+    served_from = {}
+    for tier_name in READ_TIERS:
+        remaining_needed = count - len(selected)
+        if remaining_needed <= 0:
+            break
+        picked = rotate_pick(tier_name, snapshot["pools"][tier_name], remaining_needed, is_available)
+        selected.extend(picked)
+        served_from[tier_name] = len(picked)
+    return selected, served_from
+
+def record_served(count):
+    """Cộng total_served. Follower gom lại, follower_report_loop gửi về owner (owner giữ stats chung)"""
+    now_iso = datetime.now().isoformat()
+    pool_stats["total_served"] += count
+    pool_stats["last_update"] = now_iso
+    if process_role["role"] == "follower":
+        with follower_report_lock:
+            follower_report["served"] += count
+            follower_report["last_served"] = now_iso
+        follower_report_wakeup.set()
+
+def smart_proxy_request(count=50, snapshot=None, is_available=None):
+    """ULTRA SMART proxy serving với multi-tier fallback"""
+    if is_available is None:
+        is_available = is_proxy_servable
+    if snapshot is None:
+        snapshot = pool_snapshot  # 1 atomic read - tất cả tiers cùng 1 version
+    pools_summary = snapshot["summary"]
     
-    # KHÔNG reset cache cũ, chỉ track validation hiện tại
-    current_validation_checked = 0
-    current_validation_alive = 0
+    log_to_render(f"🎯 SMART REQUEST: Need {count} proxy, available: {pools_summary}", category="serving")
     
-    # Giữ lại proxy cũ và tích lũy thêm proxy mới
-    existing_proxies = proxy_cache.get("http", [])
-    log_to_render(f"🔄 Bắt đầu validation mới - Giữ lại {len(existing_proxies)} proxy cũ")
+    expire_leases()
+    # Rotation thay vì luôn [:count] → mọi proxy trong pool đều được dùng đều nhau.
+    # Proxy đang bị exclusive lease thì không serve cho người khác.
+    requested_proxies, served_from = select_from_tiers(snapshot, count, is_available)
     
-    # Count proxy types
-    categorized_count = sum(1 for item in proxy_list if isinstance(item, tuple) and item[0] == 'categorized')
-    mixed_count = sum(1 for item in proxy_list if isinstance(item, tuple) and item[0] == 'mixed')
+    primary_served = served_from.get("PRIMARY", 0)
+    if primary_served >= count:
+        log_to_render(f"✅ TIER 1 SERVED: {primary_served} from PRIMARY pool", category="serving")
+    else:
+        log_to_render(f"⚠️ TIER 1 PARTIAL: {primary_served} from PRIMARY, need {count - primary_served} more", category="serving")
+        if "STANDBY" in served_from:
+            log_to_render(f"🔄 TIER 2 STANDBY: {served_from['STANDBY']} from STANDBY pool", category="serving")
+        if "EMERGENCY" in served_from:
+            log_to_render(f"🚨 TIER 3 EMERGENCY: {served_from['EMERGENCY']} from EMERGENCY pool", category="serving")
+        
+        if len(requested_proxies) < count:
+            log_to_render("🚨 CRITICAL: INSUFFICIENT PROXY ACROSS ALL TIERS!", level="WARNING", category="serving", sample=False)
+            trigger_emergency_mode("insufficient_proxy")  # Trigger emergency refill ngay
     
-    log_to_render(f"🔧 Proxy types: {categorized_count} categorized(specific) + {mixed_count} mixed(all)")
+    record_served(len(requested_proxies))
     
-    checked_count = 0
+    log_to_render(f"📊 SMART SERVING COMPLETE: {len(requested_proxies)} proxy delivered", category="serving")
+    return requested_proxies
+
+# PROXY LEASES - checkout với TTL, release hoặc auto-expire
+# Bookkeeping O(1) per proxy: proxy_lease_state[key] = {"exclusive": lease_id|None, "shared": n}
+
+def is_proxy_servable(proxy):
+    """Proxy có thể serve cho request không lease (không bị exclusive lease)"""
+    proxy_key = proxy_key_of(proxy)
+    state = proxy_lease_state.get(proxy_key)
+    if state is not None and state["exclusive"] is not None:
+        return False
+    # Follower: exclusive leases do owner cấp (qua shared state)
+    exclusive_until = shared_exclusive_until.get(proxy_key)
+    return exclusive_until is None or exclusive_until <= time.time()
+
+def next_shared_exclusive_expiry(now=None):
+    """Follower: epoch exclusive lease (owner cấp) kế tiếp hết hạn, None nếu không có. O(1) trừ khi leases đổi / đã qua"""
+    now = now if now is not None else time.time()
+    at = shared_exclusive_next["at"]
+    if shared_exclusive_next["stale"] or (at is not None and at <= now):
+        shared_exclusive_next["stale"] = False
+        at = shared_exclusive_next["at"] = min((until for until in list(shared_exclusive_until.values()) if until > now),
+                                               default=None)
+    return at
+
+def expire_leases(now=None):
+    """Release các lease đã hết TTL (lazy, pop từ min-heap theo expires_at)"""
+    now = now if now is not None else time.monotonic()
+    if not lease_expiry_heap or lease_expiry_heap[0][0] > now:
+        return 0  # Fast path không lock
     
-    # Validate TẤT CẢ proxy cùng lúc với ThreadPoolExecutor - KHÔNG sub-chunking
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit tất cả proxy
-        future_to_proxy = {}
-        for proxy_data in proxy_list:
-            # Unpack proxy data với structure mới
-            if isinstance(proxy_data, tuple) and len(proxy_data) == 3:
-                proxy_type, proxy_string, protocols_info = proxy_data
+    expired = 0
+    with lease_lock:
+        while lease_expiry_heap and lease_expiry_heap[0][0] <= now:
+            expires_at, lease_id = heapq.heappop(lease_expiry_heap)
+            lease = active_leases.get(lease_id)
+            if lease is None or lease["expires_at"] != expires_at:
+                continue  # Đã release trước đó
+            _drop_lease(lease_id)
+            expired += 1
+    
+    lease_stats["expired"] += expired
+    if expired:
+        lease_stats["exclusive_changes"] += 1
+        mark_shared_state_dirty()
+    return expired
+
+def _drop_lease(lease_id):
+    """Remove lease và trả proxy về rotation - caller giữ lease_lock"""
+    lease = active_leases.pop(lease_id)
+    for key in lease["keys"]:
+        state = proxy_lease_state.get(key)
+        if state is None:
+            continue
+        if lease["mode"] == "exclusive":
+            state["exclusive"] = None
+        else:
+            state["shared"] -= 1
+        if state["exclusive"] is None and state["shared"] <= 0:
+            del proxy_lease_state[key]
+    if lease["mode"] == "exclusive":
+        queue_shared_lease_changes(lease["keys"], None)
+    return lease
+
+def checkout_proxies(count, ttl=LEASE_DEFAULT_TTL, mode="shared", distinct_egress=False):
+    """Checkout `count` proxy với lease TTL.
+
+    - exclusive: proxy chưa có lease nào, không serve cho ai khác đến khi release/expire
+    - shared: proxy chưa bị exclusive lease, nhiều client dùng chung được
+    - distinct_egress: mỗi proxy trong lease có exit IP khác nhau
+    """
+    if mode not in LEASE_MODES:
+        raise ValueError(f"Invalid lease mode '{mode}', expected one of {LEASE_MODES}")
+    ttl = max(1, min(int(ttl), LEASE_MAX_TTL))
+    
+    expire_leases()
+    snapshot = pool_snapshot
+    
+    if mode == "exclusive":
+        def is_available(proxy):
+            return proxy_key_of(proxy) not in proxy_lease_state
+    else:
+        is_available = is_proxy_servable
+    if distinct_egress:
+        is_available = make_distinct_egress_filter(is_available)
+        egress_stats["distinct_requests"] += 1
+    
+    with lease_lock:
+        selected, served_from = select_from_tiers(snapshot, count, is_available)
+        
+        lease_id = uuid.uuid4().hex
+        expires_at = time.monotonic() + ttl
+        keys = [proxy_key_of(p) for p in selected]
+        for key in keys:
+            state = proxy_lease_state.setdefault(key, {"exclusive": None, "shared": 0})
+            if mode == "exclusive":
+                state["exclusive"] = lease_id
             else:
-                # Fallback for old format
-                proxy_type, proxy_string, protocols_info = 'categorized', proxy_data, 'http'
+                state["shared"] += 1
+        
+        active_leases[lease_id] = {
+            "keys": keys,
+            "mode": mode,
+            "expires_at": expires_at,
+            "ttl": ttl,
+            "created_at": datetime.now().isoformat()
+        }
+        heapq.heappush(lease_expiry_heap, (expires_at, lease_id))
+        if mode == "exclusive":
+            queue_shared_lease_changes(keys, time.time() + ttl)
+    
+    lease_stats["checked_out"] += 1
+    record_served(len(selected))
+    if mode == "exclusive":
+        lease_stats["exclusive_changes"] += 1
+        if process_role["role"] == "owner":
+            # Ghi delta ngay (không debounce) trước khi trả response → followers không serve proxy này nữa
+            try:
+                publish_shared_state()
+            except (OSError, TypeError, ValueError) as e:
+                log_to_render(f"❌ SHARED STATE PUBLISH ERROR: {str(e)}")
+    
+    return {
+        "lease_id": lease_id,
+        "mode": mode,
+        "ttl": ttl,
+        "expires_at": (datetime.now() + timedelta(seconds=ttl)).isoformat(),
+        "proxies": selected,
+        "served_from": served_from,
+        "pool_version": snapshot["version"]
+    }
+
+def release_lease(lease_id):
+    """Release lease sớm. Trả về False nếu lease không tồn tại (đã expire/release)"""
+    with lease_lock:
+        if lease_id not in active_leases:
+            return False
+        _drop_lease(lease_id)
+    lease_stats["released"] += 1
+    lease_stats["exclusive_changes"] += 1
+    mark_shared_state_dirty()
+    return True
+
+def get_lease_summary():
+    """Lease statistics cho monitoring"""
+    expire_leases()
+    exclusive_count = sum(1 for state in list(proxy_lease_state.values()) if state["exclusive"])
+    return {
+        "active_leases": len(active_leases),
+        "leased_proxies": len(proxy_lease_state),
+        "exclusive_proxies": exclusive_count,
+        "default_ttl": LEASE_DEFAULT_TTL,
+        "max_ttl": LEASE_MAX_TTL,
+        **lease_stats
+    }
+
+def cached_response(cache_key, build, max_age=None, on_hit=None):
+    """Serve response từ cache (build() chỉ chạy khi miss). build() trả về dict (JSON) hoặc str (text/plain).
+
+    - cache_key phải chứa pool version (và mọi state khác mà response phụ thuộc)
+    - max_age: entry hết hạn sau N giây dù key không đổi (stats counters)
+    - on_hit(served): chạy lại side effects của build() khi hit (served = số proxy trong response)
+    """
+    now = time.monotonic()
+    with response_cache_lock:
+        entry = response_cache.get(cache_key)
+        if entry is not None and max_age is not None and now - entry["created"] > max_age:
+            entry = None
+        if entry is not None:
+            response_cache.move_to_end(cache_key)
+    
+    if entry is None:
+        response_cache_stats["misses"] += 1
+        payload = build()
+        if isinstance(payload, str):
+            body, mimetype, served = payload.encode("utf-8"), "text/plain", 0
+        else:
+            body, mimetype, served = jsonify(payload).get_data(), "application/json", len(payload.get("proxies") or ())
+        entry = {
+            "body": body,
+            "gzip": None,
+            "etag": hashlib.md5(body).hexdigest()[:20],
+            "mimetype": mimetype,
+            "created": now,
+            "served": served
+        }
+        with response_cache_lock:
+            response_cache[cache_key] = entry
+            while len(response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+                response_cache.popitem(last=False)
+                response_cache_stats["evictions"] += 1
+    else:
+        response_cache_stats["hits"] += 1
+        if on_hit is not None:
+            on_hit(entry["served"])
+    
+    if request.if_none_match.contains(entry["etag"]):
+        response_cache_stats["not_modified"] += 1
+        response = Response(status=304)
+    elif len(entry["body"]) >= RESPONSE_GZIP_MIN_BYTES and "gzip" in request.accept_encodings:
+        if entry["gzip"] is None:
+            entry["gzip"] = gzip.compress(entry["body"], compresslevel=5)  # 1 lần / entry
+        response_cache_stats["gzip_responses"] += 1
+        response = Response(entry["gzip"], mimetype=entry["mimetype"])
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(entry["body"], mimetype=entry["mimetype"])
+    
+    response.set_etag(entry["etag"])
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"  # Client luôn revalidate bằng ETag
+    return response
+
+def get_response_cache_summary():
+    """Response cache stats cho monitoring"""
+    lookups = response_cache_stats["hits"] + response_cache_stats["misses"]
+    return {
+        "entries": len(response_cache),
+        "max_entries": RESPONSE_CACHE_MAX_ENTRIES,
+        "hit_rate": round(response_cache_stats["hits"] / lookups, 3) if lookups else None,
+        **response_cache_stats
+    }
+
+# PROMETHEUS METRICS
+# Counters / histograms: labels là tuple các cặp (label, value), bucket counts lưu không cộng dồn (cộng lúc render).
+
+def inc_metric(name, labels=(), amount=1):
+    """Cộng counter"""
+    key = (name, labels)
+    with metrics_lock:
+        metric_values[key] = metric_values.get(key, 0) + amount
+
+def observe_metric(name, labels, value):
+    """Ghi 1 observation vào histogram (buckets cố định theo METRIC_BUCKETS)"""
+    buckets = METRIC_BUCKETS[name]
+    index = bisect.bisect_left(buckets, value)  # Bucket đầu tiên có le ≥ value, len(buckets) = +Inf
+    key = (name, labels)
+    with metrics_lock:
+        histogram = metric_values.get(key)
+        if histogram is None:
+            histogram = metric_values[key] = [0] * (len(buckets) + 2)
+        histogram[index] += 1
+        histogram[-1] += value
+
+def format_metric_labels(labels):
+    """{label="value",...} với escaping theo exposition format"""
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def render_metric_family(lines, name, metric_type, help_text, samples):
+    """Append HELP/TYPE + samples của 1 metric family (histogram → _bucket/_sum/_count)"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in sorted(samples, key=lambda sample: sample[0]):
+        if metric_type != "histogram":
+            lines.append(f"{name}{format_metric_labels(labels)} {value}")
+            continue
+        cumulative = 0
+        for bound, count in zip(METRIC_BUCKETS[name] + ("+Inf",), value):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_metric_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{format_metric_labels(labels)} {round(value[-1], 6)}")
+        lines.append(f"{name}_count{format_metric_labels(labels)} {cumulative}")
+
+def metrics_share_path(pid):
+    """File HTTP metrics của 1 follower process trong shared dir"""
+    return os.path.join(SHARED_STATE_DIR, f"proxy_service_metrics_{pid}.json")
+
+def share_process_metrics():
+    """Follower: ghi HTTP metrics của process ra shared dir (follower_report_loop gọi sau mỗi đợt requests)"""
+    pid = os.getpid()
+    with metrics_lock:
+        samples = [
+            [name, [["pid", str(pid)]] + [list(pair) for pair in labels], list(value) if isinstance(value, list) else value]
+            for (name, labels), value in metric_values.items() if name.startswith("http_")
+        ]
+    path = metrics_share_path(pid)
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(samples, f)
+        os.replace(path + ".tmp", path)
+        metrics_share["shares"] += 1
+    except OSError:
+        metrics_share["errors"] += 1
+
+def load_shared_metrics():
+    """Owner: HTTP metrics followers đã share. File của follower đã dừng (pid không còn) → xóa"""
+    samples = []
+    if process_role["role"] != "owner":
+        return samples
+    try:
+        file_names = os.listdir(SHARED_STATE_DIR)
+    except OSError:
+        return samples
+    own_file = os.path.basename(metrics_share_path(os.getpid()))
+    for file_name in file_names:
+        if not file_name.startswith("proxy_service_metrics_") or not file_name.endswith(".json") or file_name == own_file:
+            continue
+        path = os.path.join(SHARED_STATE_DIR, file_name)
+        try:
+            # Follower idle không ghi lại file → liveness theo pid thay vì mtime
+            os.kill(int(file_name[len("proxy_service_metrics_"):-len(".json")]), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        except (OSError, ValueError):
+            pass  # PermissionError = pid còn sống (process khác user)
+        try:
+            with open(path, encoding="utf-8") as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in shared:
+            if name in METRIC_HELP:
+                samples.append((name, tuple(tuple(pair) for pair in labels), value))
+    return samples
+
+def build_metrics_text():
+    """Prometheus text exposition: counters/histograms đã ghi + gauges đọc từ snapshot / stats (không lấy pool locks)"""
+    with metrics_lock:
+        values = [(name, labels, list(value) if isinstance(value, list) else value)
+                  for (name, labels), value in metric_values.items()]
+    pid = str(os.getpid())
+    families = {name: [] for name in METRIC_HELP}
+    for name, labels, value in values:
+        families[name].append(((("pid", pid),) + labels if name.startswith("http_") else labels, value))
+    for name, labels, value in load_shared_metrics():
+        families[name].append((labels, value))
+
+    lines = []
+    for name, samples in families.items():
+        if samples:
+            metric_type = "histogram" if name in METRIC_BUCKETS else "counter"
+            render_metric_family(lines, name, metric_type, METRIC_HELP[name], samples)
+
+    snapshot = pool_snapshot
+    resurrection_stats = pool_stats["resurrection_stats"]
+    sources = list(source_stats.items())
+    render_metric_family(lines, "proxy_pool_size", "gauge", "Proxies per tier",
+                         [((("tier", pool_name),), len(snapshot["pools"][pool_name])) for pool_name in SNAPSHOT_POOLS] +
+                         [((("tier", "DEAD"),), len(dead_proxy_management["entries"]))])
+    render_metric_family(lines, "proxy_pool_target", "gauge", "Target size per serving tier",
+                         [((("tier", tier_name),), target) for tier_name, target in TARGET_POOLS.items()])
+    render_metric_family(lines, "proxy_pool_guaranteed", "gauge", "1 when serving tiers hold at least the guaranteed minimum",
+                         [((), int(snapshot["summary"]["GUARANTEED"]))])
+    render_metric_family(lines, "proxy_pool_snapshot_version", "gauge", "Pool snapshot version",
+                         [((), snapshot["version"])])
+    render_metric_family(lines, "proxy_dead_size", "gauge", "Dead proxies per resurrection category",
+                         [((("category", category),), count) for category, count in list(dead_proxy_management["counts"].items())])
+    render_metric_family(lines, "proxy_resurrection_attempts_total", "counter", "Dead proxies re-checked for resurrection",
+                         [((), resurrection_stats["resurrection_attempts"])])
+    render_metric_family(lines, "proxy_resurrected_total", "counter", "Dead proxies that came back alive",
+                         [((), resurrection_stats["total_resurrected"])])
+    render_metric_family(lines, "proxy_resurrection_attempts_by_class_total", "counter",
+                         "Resurrection attempts by failure class of the previous death",
+                         [((("failure_class", failure_class),), stats["resurrection_attempts"])
+                          for failure_class, stats in failure_class_stats.items()])
+    render_metric_family(lines, "proxy_source_candidates_total", "counter", "Candidates fetched per source",
+                         [((("source", source_name),), stats["fetched"]) for source_name, stats in sources])
+    render_metric_family(lines, "proxy_source_validated_total", "counter", "Candidates validated per source",
+                         [((("source", source_name),), stats["validated"]) for source_name, stats in sources])
+    render_metric_family(lines, "proxy_source_alive_total", "counter", "Validated candidates found alive per source",
+                         [((("source", source_name),), stats["alive"]) for source_name, stats in sources])
+    render_metric_family(lines, "proxy_source_yield_ratio", "gauge", "Smoothed alive yield per source",
+                         [((("source", source_name),), round(get_source_yield(source_name), 4)) for source_name, _ in sources])
+    render_metric_family(lines, "proxy_served_total", "counter", "Proxies handed out by serving endpoints",
+                         [((), pool_stats["total_served"])])
+    render_metric_family(lines, "proxy_log_queue_size", "gauge", "Log records waiting for the sink thread",
+                         [((), len(log_queue))])
+    return "\n".join(lines) + "\n"
+
+@app.before_request
+def start_request_timer():
+    """Mốc thời gian cho API latency metrics"""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """API latency + request count theo route template (cardinality cố định)"""
+    started = g.get("request_started")
+    if started is None:
+        return response
+    if process_role["role"] == "follower" and request.endpoint not in FOLLOWER_LOCAL_ENDPOINTS:
+        return response  # Request forward sang owner → owner đã đếm
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    observe_metric("http_request_duration_seconds", (("route", route), ("method", request.method)),
+                   time.perf_counter() - started)
+    inc_metric("http_requests_total", (("route", route), ("method", request.method), ("status", str(response.status_code))))
+    if process_role["role"] == "follower":
+        follower_report_wakeup.set()
+    return response
+
+# UNIFIED JOB SCHEDULER
+# 1 dispatcher thread + bounded executor thay cho 4 free-running worker threads.
+# Job khai báo trong SCHEDULER_JOBS (priority, deadline, concurrency, interval); event
+# (watermark, emergency, FRESH arrival, resurrection deadline) đánh dấu job due ngay.
+
+def wake_job(job_name, reason):
+    """Đánh dấu job due ngay với reason (no-op nếu job đã due hoặc scheduler chưa chạy)"""
+    state = scheduler_job_state.get(job_name)
+    if state is None:
+        return
+    if state["due_at"] is not None and state["due_at"] <= time.monotonic() and reason in state["reasons"]:
+        return  # Fast path không lock - hot path (publish/serving) gọi thường xuyên
+    with scheduler_condition:
+        state["due_at"] = time.monotonic() if state["due_at"] is None else min(state["due_at"], time.monotonic())
+        state["reasons"].add(reason)
+        scheduler_condition.notify()
+
+def schedule_job_wakeup(job_name, delay_seconds, reason="deadline"):
+    """Đặt job due sau delay_seconds (chỉ giữ thời điểm sớm nhất)"""
+    state = scheduler_job_state.get(job_name)
+    if state is None:
+        return
+    due_at = time.monotonic() + max(0, delay_seconds)
+    with scheduler_condition:
+        if state["due_at"] is None or due_at < state["due_at"]:
+            state["due_at"] = due_at
+            state["reasons"].add(reason)
+            scheduler_condition.notify()
+
+def _job_ready_at(job_name, state):
+    """Thời điểm job được phép start (due_at + min_interval), None nếu chưa due"""
+    job = SCHEDULER_JOBS[job_name]
+    if state["due_at"] is None or state["running"] >= job["max_concurrency"]:
+        return None
+    if not worker_control.get(job.get("enabled_flag"), True):
+        return None
+    if state["last_started"] is not None:
+        return max(state["due_at"], state["last_started"] + job.get("min_interval", 0))
+    return state["due_at"]
+
+def _run_job(job_name, lag):
+    """Chạy 1 lần job trong executor, record stats và schedule lần kế tiếp"""
+    job = SCHEDULER_JOBS[job_name]
+    state = scheduler_job_state[job_name]
+    started = time.monotonic()
+    next_delay = job["interval"]
+    error = None
+    
+    try:
+        result = job["func"]()
+        if result is not None:
+            next_delay = result
+    except Exception as e:
+        error = str(e)
+        next_delay = job.get("error_backoff", job["interval"])
+        log_to_render(f"❌ JOB {job_name.upper()} ERROR: {error}")
+    
+    run_seconds = time.monotonic() - started
+    with scheduler_condition:
+        state["running"] -= 1
+        state["runs"] += 1
+        state["total_run_seconds"] += run_seconds
+        state["last_run_seconds"] = round(run_seconds, 3)
+        state["max_run_seconds"] = max(state["max_run_seconds"], round(run_seconds, 3))
+        state["last_finished"] = datetime.now().isoformat()
+        if error is not None:
+            state["failures"] += 1
+            state["last_error"] = error
+        if next_delay is not None:
+            due_at = time.monotonic() + next_delay
+            if state["due_at"] is None or due_at < state["due_at"]:
+                state["due_at"] = due_at
+        scheduler_condition.notify()
+
+def scheduler_loop():
+    """Dispatcher: chọn job due theo (priority, ready_at), respect concurrency limits"""
+    log_to_render(f"🗓️ SCHEDULER: Started với {len(SCHEDULER_JOBS)} jobs, {SCHEDULER_MAX_WORKERS} slots")
+    executor = ThreadPoolExecutor(max_workers=SCHEDULER_MAX_WORKERS, thread_name_prefix="job")
+    
+    with scheduler_condition:
+        while scheduler_control["running"]:
+            now = time.monotonic()
+            ready = []
+            next_ready_at = None
+            for job_name, state in scheduler_job_state.items():
+                ready_at = _job_ready_at(job_name, state)
+                if ready_at is None:
+                    continue
+                if ready_at <= now:
+                    ready.append((SCHEDULER_JOBS[job_name]["priority"], ready_at, job_name))
+                elif next_ready_at is None or ready_at < next_ready_at:
+                    next_ready_at = ready_at
             
-            # Xác định protocols để test dựa trên source type
-            if proxy_type == 'mixed':
-                protocols = protocols_info  # Mixed sources sử dụng protocols từ config
-            else:
-                protocols = [protocols_info]  # Categorized sources sử dụng protocol cụ thể
+            free_slots = SCHEDULER_MAX_WORKERS - sum(state["running"] for state in scheduler_job_state.values())
+            ready.sort()
+            for priority, ready_at, job_name in ready[:max(0, free_slots)]:
+                state = scheduler_job_state[job_name]
+                lag = now - ready_at
+                state["running"] += 1
+                state["due_at"] = None
+                state["last_started"] = now
+                state["last_lag"] = round(lag, 3)
+                state["max_lag"] = max(state["max_lag"], round(lag, 3))
+                if lag > SCHEDULER_JOBS[job_name]["deadline"]:
+                    state["deadline_missed"] += 1
+                state["last_reasons"] = sorted(state["reasons"])
+                state["reasons"] = set()
+                executor.submit(_run_job, job_name, lag)
             
-            future = executor.submit(check_single_proxy, proxy_string, 8, protocols)
-            future_to_proxy[future] = (proxy_type, proxy_string, protocols_info)
+            # Job ready nhưng hết slot → chờ job khác xong (notify từ _run_job)
+            timeout = None if next_ready_at is None else max(0, next_ready_at - now)
+            if len(ready) > max(0, free_slots):
+                timeout = None
+            scheduler_condition.wait(min(timeout, SCHEDULER_MAX_WAIT) if timeout is not None else SCHEDULER_MAX_WAIT)
+    
+    executor.shutdown(wait=False)
+
+def start_scheduler():
+    """Init job state và start dispatcher thread (tất cả jobs due ngay lần đầu)"""
+    with scheduler_condition:
+        if scheduler_control["thread"] is not None:
+            return scheduler_control["thread"]
+        now = time.monotonic()
+        for job_name in SCHEDULER_JOBS:
+            scheduler_job_state[job_name] = {
+                "due_at": now, "reasons": {"startup"}, "last_reasons": [], "running": 0,
+                "runs": 0, "failures": 0, "last_error": None, "deadline_missed": 0,
+                "total_run_seconds": 0.0, "last_run_seconds": None, "max_run_seconds": 0.0,
+                "last_lag": None, "max_lag": 0.0, "last_started": None, "last_finished": None
+            }
+        scheduler_control["running"] = True
+        scheduler_control["thread"] = threading.Thread(target=scheduler_loop, daemon=True)
+        scheduler_control["thread"].start()
+    return scheduler_control["thread"]
+
+def check_pool_watermarks(summary):
+    """Pool xuống dưới watermark → wake job chịu trách nhiệm (gọi sau mỗi snapshot publish)"""
+    if summary["STANDBY"] > 0:
+        if summary["PRIMARY"] < TARGET_POOLS["PRIMARY"] * POOL_LOW_WATERMARK:
+            wake_job("balance", "primary_low")
+        elif summary["EMERGENCY"] < TARGET_POOLS["EMERGENCY"] * POOL_LOW_WATERMARK and summary["STANDBY"] > TARGET_POOLS["STANDBY"]:
+            wake_job("balance", "emergency_low")
+    
+    if summary["STANDBY"] < TARGET_POOLS["STANDBY"] * POOL_LOW_WATERMARK:
+        if summary["FRESH"] > 0:
+            wake_job("validate_fresh", "standby_low")
+        elif not summary["GUARANTEED"]:
+            wake_job("fetch", "fresh_empty")
+            wake_job("resurrect", "pool_deficit")
+
+def trigger_emergency_mode(reason):
+    """Bật emergency mode và wake fetch + balance ngay (follower không có scheduler → chuyển trigger cho owner)"""
+    if process_role["role"] == "follower":
+        with follower_report_lock:
+            follower_report["emergency"] = reason
+        follower_report_wakeup.set()
+        return
+    worker_control["emergency_mode"] = True
+    wake_job("fetch", reason)
+    wake_job("balance", reason)
+
+def get_job_backlog(job_name, snapshot):
+    """Số đơn vị công việc đang chờ job xử lý"""
+    summary = snapshot["summary"]
+    if job_name == "fetch":
+        return max(0, TARGET_POOLS["PRIMARY"] + TARGET_POOLS["STANDBY"] - summary["FRESH"])
+    if job_name == "validate_fresh":
+        return summary["FRESH"]
+    if job_name == "maintain":
+        stale_before = (datetime.now() - timedelta(seconds=MAINTENANCE_STALENESS_SLA)).isoformat()
+        return sum(
+            1 for tier_name in SERVING_TIERS for p in snapshot["pools"][tier_name]
+            if isinstance(p, dict) and (p.get('checked_at') or '') < stale_before
+        )
+    if job_name == "balance":
+        return max(0, TARGET_POOLS["PRIMARY"] - summary["PRIMARY"]) + max(0, TARGET_POOLS["EMERGENCY"] - summary["EMERGENCY"])
+    if job_name == "resurrect":
+        return count_due_resurrections()
+    return 0
+
+def get_scheduler_summary():
+    """Per-job run time, lag, backlog cho monitoring"""
+    snapshot = pool_snapshot
+    now = time.monotonic()
+    jobs = {}
+    for job_name, job in SCHEDULER_JOBS.items():
+        state = scheduler_job_state.get(job_name)
+        if state is None:
+            continue
+        due_in = None if state["due_at"] is None else round(state["due_at"] - now, 1)
+        jobs[job_name] = {
+            "description": job["description"],
+            "priority": job["priority"],
+            "max_concurrency": job["max_concurrency"],
+            "deadline_seconds": job["deadline"],
+            "interval_seconds": job["interval"],
+            "running": state["running"],
+            "due_in": due_in,
+            "pending_reasons": sorted(state["reasons"]),
+            "last_reasons": state["last_reasons"],
+            "runs": state["runs"],
+            "failures": state["failures"],
+            "last_error": state["last_error"],
+            "avg_run_seconds": round(state["total_run_seconds"] / state["runs"], 3) if state["runs"] else None,
+            "last_run_seconds": state["last_run_seconds"],
+            "max_run_seconds": state["max_run_seconds"],
+            "last_lag_seconds": state["last_lag"],
+            "max_lag_seconds": state["max_lag"],
+            "deadline_missed": state["deadline_missed"],
+            "last_finished": state["last_finished"],
+            "backlog": get_job_backlog(job_name, snapshot)
+        }
+    return {
+        "running": scheduler_control["running"],
+        "max_workers": SCHEDULER_MAX_WORKERS,
+        "busy_slots": sum(job["running"] for job in jobs.values()),
+        "jobs": jobs
+    }
+
+def job_fetch():
+    """JOB fetch: fetch proxy từ sources vào FRESH (score-based admission)"""
+    if not is_cluster_leader():
+        log_to_render(f"😴 FETCH JOB: Cluster leader {cluster_state['leader']} fetch sources, skip")
+        return None
+    
+    fresh_needed = TARGET_POOLS["PRIMARY"] + TARGET_POOLS["STANDBY"] - len(proxy_pools["FRESH"])
+    
+    if fresh_needed <= 0 and not worker_control["emergency_mode"]:
+        log_to_render("😴 FETCH JOB: FRESH pool sufficient, skip")
+        return None
+    
+    log_to_render(f"📥 FETCH JOB: Fetch {fresh_needed} fresh proxy")
+    
+    # Fetch proxy từ sources (exception → scheduler áp dụng error_backoff)
+    proxy_list, sources_count = fetch_proxies_from_sources()
+    worker_control["emergency_mode"] = False  # Reset emergency sau successful fetch
+    
+    if proxy_list and len(proxy_list) > 0:
+        if CLUSTER_ENABLED:
+            # Mỗi node chỉ validate shard của mình
+            cluster_state["fetches"] += 1
+            proxy_list = distribute_candidates(proxy_list, last_fetch_sources)
         
-        # Collect results với progress tracking
-        for future in as_completed(future_to_proxy):
-            checked_count += 1
-            current_validation_checked += 1
-            proxy_type, proxy_string, protocols_info = future_to_proxy[future]
-            
-            try:
-                result = future.result()
-                if result:
-                    alive_proxies.append(result)
-                    
-                    # Tích lũy proxy mới với proxy cũ (tránh duplicate) - lấy real-time
-                    with cache_lock:
-                        current_proxies = proxy_cache.get("http", []).copy()
-                    
-                    # Thêm proxy mới nếu chưa có
-                    proxy_key = f"{result['host']}:{result['port']}"
-                    existing_keys = [f"{p['host']}:{p['port']}" for p in current_proxies]
-                    
-                    if proxy_key not in existing_keys:
-                        current_proxies.append(result)
-                    
-                    # Update cache với danh sách tích lũy
-                    with cache_lock:
-                        proxy_cache["http"] = current_proxies.copy()
-                        proxy_cache["alive_count"] = len(current_proxies)
-                        proxy_cache["total_checked"] = proxy_cache.get("total_checked", 0) + 1
-                        proxy_cache["last_update"] = datetime.now().isoformat()
-                    
-                    current_validation_alive += 1
-                    
-                else:
-                    # Update total checked even for failed (tích lũy)
-                    with cache_lock:
-                        proxy_cache["total_checked"] = proxy_cache.get("total_checked", 0) + 1
-                    
-                    # REDUCED: Chỉ log progress ít hơn
-                    if checked_count % 100 == 0:  # Log mỗi 100 proxy
-                        progress_pct = round(checked_count/total_proxies*100, 1)
-                        log_to_render(f"⏳ Progress: {checked_count}/{total_proxies} checked ({progress_pct}%), {len(alive_proxies)} alive")
-                        
-            except Exception as e:
-                # Update total checked even for exceptions (tích lũy)
-                with cache_lock:
-                    proxy_cache["total_checked"] = proxy_cache.get("total_checked", 0) + 1
+        # Add to FRESH pool (dedupe + score-based admission)
+        new_count = fresh_admit(proxy_list, last_fetch_sources)
+        log_to_render(f"✅ FETCH JOB: Added {new_count} fresh proxy (total FRESH: {len(proxy_pools['FRESH'])})")
+    else:
+        log_to_render("⚠️ FETCH JOB: No proxy fetched, retry in 10 minutes")
+        return 600
     
-    # Final validation summary (KHÔNG override cache đã tích lũy)
-    final_alive_count = proxy_cache.get("alive_count", 0)
-    final_total_checked = proxy_cache.get("total_checked", 0)
+    return None
+
+def job_validate_fresh():
+    """JOB validate_fresh: validate batch FRESH → STANDBY"""
+    # Take batch 200 candidates score cao nhất từ FRESH để validate (remove processed)
+    fresh_batch = fresh_take_best(200)
     
-    # Chỉ update timestamp
-    with cache_lock:
-        proxy_cache["last_update"] = datetime.now().isoformat()
+    # Bỏ candidate đã vào serving tier (qua resurrection/batch trước) → không tốn validation
+    already_serving = sum(1 for p, _ in fresh_batch if candidate_key_of(p) in proxy_membership)
+    if already_serving:
+        membership_stats["fresh_skipped"] += already_serving
+        fresh_batch = [(p, source_name) for p, source_name in fresh_batch if candidate_key_of(p) not in proxy_membership]
+    fresh_to_validate = [p for p, _ in fresh_batch]
     
-    # SIMPLIFIED: Logs ngắn gọn hơn
-    current_cycle_success = round(len(alive_proxies)/total_proxies*100, 1) if total_proxies > 0 else 0
-    overall_success = round(final_alive_count/final_total_checked*100, 1) if final_total_checked > 0 else 0
-    log_to_render(f"🎯 VALIDATION HOÀN THÀNH!")
-    log_to_render(f"📊 Batch này: {len(alive_proxies)} alive / {total_proxies} total ({current_cycle_success}%)")
-    log_to_render(f"📈 Tổng cộng: {final_alive_count} alive / {final_total_checked} total ({overall_success}%)")
+    if fresh_to_validate:
+        log_to_render(f"🔍 VALIDATE JOB: Validating {len(fresh_to_validate)} FRESH proxy...")
+        
+        validated_proxies = validate_proxy_batch_smart(fresh_to_validate, max_workers=15)
+        
+        # Source yield tracking → feed admission score
+        candidate_sources = {candidate_key_of(p): source_name for p, source_name in fresh_batch}
+        alive_per_source = {}
+        for proxy in validated_proxies:
+            source_name = candidate_sources.get(proxy_key_of(proxy))
+            proxy['source'] = source_name
+            alive_per_source[source_name] = alive_per_source.get(source_name, 0) + 1
+        validated_per_source = {}
+        for source_name in candidate_sources.values():
+            validated_per_source[source_name] = validated_per_source.get(source_name, 0) + 1
+        for source_name, validated_count in validated_per_source.items():
+            record_source_validation(source_name, validated_count, alive_per_source.get(source_name, 0))
+        
+        if validated_proxies:
+            added_count = pool_extend("STANDBY", validated_proxies, publish=False)
+            count_eviction("STANDBY", "duplicate", len(validated_proxies) - added_count)
+            # Keep STANDBY pool size reasonable (evict lowest score) - cùng 1 snapshot publish với batch add
+            standby_enforce_budget(publish=False)
+            publish_pool_snapshot()
+            
+            log_to_render(f"✅ VALIDATE JOB: {added_count} proxy added to STANDBY")
+            pool_stats["STANDBY"]["last_validation"] = datetime.now().isoformat()
     
-    return alive_proxies
+    summary = pool_snapshot["summary"]
+    if summary["FRESH"] > 0 and summary["STANDBY"] < TARGET_POOLS["STANDBY"]:
+        return 0  # STANDBY còn thiếu và còn candidates → validate batch tiếp ngay
+    return None
 
-def check_initial_fetch_timeout(start_time, max_hours=2):
-    """Kiểm tra timeout cho initial fetch để tránh chạy vô tận"""
-    elapsed_hours = (time.time() - start_time) / 3600
-    if elapsed_hours > max_hours:
-        log_to_render(f"⚠️ INITIAL FETCH TIMEOUT: {elapsed_hours:.1f}h > {max_hours}h")
-        log_to_render("🔄 Force chuyển sang MAINTENANCE MODE với proxy hiện có")
-        return True
-    return False
+def job_maintain():
+    """JOB maintain: rolling re-check stalest proxy trong serving tiers"""
+    maintenance_stats = pool_stats["maintenance_stats"]
+    maintenance_stats["catching_up"] = run_staleness_maintenance(catch_up=maintenance_stats["catching_up"])
+    return MAINTENANCE_CATCHUP_DELAY if maintenance_stats["catching_up"] else None
 
-def validate_existing_proxies_only():
-    """Maintenance mode - re-check các proxy đã có và UPDATE cache với list live mới"""
-    global proxy_cache
+def get_stalest_proxies(snapshot, limit):
+    """Maintenance queue: `limit` proxy có checked_at cũ nhất across serving tiers.
+
+    ISO timestamps sort đúng theo lexicographic order nên không cần parse.
+    heapq.nsmallest → O(P log limit), chạy trên snapshot nên không cần lock.
+    """
+    entries = (
+        (p.get('checked_at') or '', tier_name, p)
+        for tier_name in SERVING_TIERS
+        for p in snapshot["pools"][tier_name]
+        if isinstance(p, dict) and 'host' in p and 'port' in p
+    )
+    return heapq.nsmallest(limit, entries, key=lambda entry: entry[0])
+
+def get_maintenance_batch_size(total_available):
+    """Batch size để toàn bộ serving tiers được re-check trong MAINTENANCE_STALENESS_SLA"""
+    cycles_per_sla = max(1, MAINTENANCE_STALENESS_SLA // MAINTENANCE_CYCLE_SECONDS)
+    batch_size = math.ceil(total_available / cycles_per_sla)
+    return min(MAINTENANCE_MAX_BATCH, max(MAINTENANCE_MIN_BATCH, batch_size))
+
+def reconcile_maintenance_results(rechecked_keys, refreshed):
+    """Apply kết quả re-check: chỉ touch những proxy thực sự được re-check.
+
+    - Alive: thay record bằng kết quả mới (speed + checked_at mới), giữ metadata lúc admit (source, ...)
+      mà check result không có
+    - Dead: remove khỏi tier hiện tại (proxy có thể đã bị promote trong lúc check)
+    Trả về list dead records đã remove.
+    """
+    removed = []
+    for tier_name in SERVING_TIERS:
+        with pool_locks[tier_name]:
+            current = proxy_pools[tier_name]
+            if not current:
+                continue
+            
+            updated = []
+            changed = False
+            for p in current:
+                key = proxy_key_of(p) if isinstance(p, dict) and 'host' in p and 'port' in p else None
+                if key is None or key not in rechecked_keys:
+                    updated.append(p)
+                elif key in refreshed:
+                    # Check result không có 'vouched' → direct check reset vouch count, vouched record tự mang count mới
+                    record = {**{field: value for field, value in p.items() if field != 'vouched'}, **refreshed[key]}
+                    updated.append(record)
+                    _index_remove(tier_name, [p])
+                    _index_add(tier_name, [record])
+                    _move_membership(tier_name, [p], replacements={key: record})
+                    _queue_pool_changes(tier_name, removed=[p], added=[record])
+                    changed = True
+                else:
+                    removed.append(p)
+                    _index_remove(tier_name, [p])
+                    _release_membership([p])
+                    _queue_pool_changes(tier_name, removed=[p])
+                    changed = True
+            
+            if changed:
+                proxy_pools[tier_name] = updated
+    
+    return removed
+
+def run_staleness_maintenance(catch_up=False):
+    """Rolling maintenance 1 cycle: re-check stalest proxy NGOÀI pool locks.
+
+    Trả về True nếu stalest proxy vẫn quá SLA (cần catch-up với max batch).
+    """
+    snapshot = pool_snapshot
+    total_available = snapshot["summary"]["TOTAL_AVAILABLE"]
+    maintenance_stats = pool_stats["maintenance_stats"]
     
-    # Lấy các proxy hiện có từ cache
-    existing_proxies = proxy_cache.get('http', [])
+    if total_available == 0:
+        return False
     
-    if not existing_proxies:
-        log_to_render("⚠️ MAINTENANCE MODE: Không có proxy trong cache để re-check")
-        return []
+    batch_size = MAINTENANCE_MAX_BATCH if catch_up else get_maintenance_batch_size(total_available)
+    stalest = get_stalest_proxies(snapshot, batch_size)
+    if not stalest:
+        return False
     
-    log_to_render(f"🔄 MAINTENANCE MODE: Re-checking {len(existing_proxies)} proxy có sẵn...")
+    oldest_checked_at = stalest[0][0]
+    try:
+        oldest_age = int((datetime.now() - datetime.fromisoformat(oldest_checked_at)).total_seconds())
+    except ValueError:
+        oldest_age = None
     
-    # Chuyển đổi format để validate
-    proxy_list = []
-    for p in existing_proxies:
-        proxy_string = f"{p['host']}:{p['port']}"
-        proxy_type = p.get('type', 'http')
-        protocols_info = [proxy_type]
-        proxy_list.append(('maintenance', proxy_string, protocols_info))
+    # Group theo egress: stalest proxy của mỗi group là representative
+    rechecked_keys = set()
+    tier_counts = {}
+    groups = {}
+    for checked_at, tier_name, p in stalest:
+        rechecked_keys.add(proxy_key_of(p))
+        groups.setdefault(egress_of(p), []).append(p)
+        tier_counts[tier_name] = tier_counts.get(tier_name, 0) + 1
     
-    log_to_render(f"⚡ Bắt đầu re-validation {len(proxy_list)} proxy...")
+    log_to_render(f"🔧 WORKER 2: Maintaining {len(rechecked_keys)} stalest proxy {tier_counts} "
+                  f"in {len(groups)} egress groups (oldest check {oldest_age}s ago, SLA {MAINTENANCE_STALENESS_SLA}s)")
     
-    # Validate với max_workers cao hơn cho maintenance (vì ít proxy hơn)
-    alive_proxies = validate_proxy_batch_smart(proxy_list, max_workers=25)
+    def to_validation_list(records):
+        return [('maintenance', proxy_key_of(p), [p.get('type', 'http')]) for p in records]
     
-    # UPDATE CACHE với proxy live vừa check được (QUAN TRỌNG!)
-    with cache_lock:
-        proxy_cache["http"] = alive_proxies.copy()  # Update với list mới
-        proxy_cache["alive_count"] = len(alive_proxies)
-        proxy_cache["last_update"] = datetime.now().isoformat()
+    try:
+        # Network validation KHÔNG giữ pool lock - serving & balancing vẫn chạy bình thường
+        # Phase 1: 1 representative per egress group
+        failure_classes = {}
+        representatives = [members[0] for members in groups.values()]
+        still_alive = validate_proxy_batch_smart(to_validation_list(representatives), max_workers=10,
+                                                 failure_classes=failure_classes)
+        refreshed = {proxy_key_of(p): p for p in still_alive}
+        
+        # Phase 2: siblings - exit IP vẫn sống qua representative → vouch (checked_at mới, giữ speed),
+        # representative chết / đổi egress / sibling đã vouch quá nhiều lần → check trực tiếp
+        now_iso = datetime.now().isoformat()
+        vouched = {}
+        siblings_to_check = []
+        for egress, members in groups.items():
+            representative = refreshed.get(proxy_key_of(members[0]))
+            egress_alive = representative is not None and egress_of(representative) == egress
+            for sibling in members[1:]:
+                if egress_alive and sibling.get('vouched', 0) < EGRESS_MAX_VOUCHES:
+                    vouched[proxy_key_of(sibling)] = {**sibling, 'checked_at': now_iso,
+                                                      'vouched': sibling.get('vouched', 0) + 1}
+                else:
+                    siblings_to_check.append(sibling)
+        
+        if siblings_to_check:
+            still_alive = validate_proxy_batch_smart(to_validation_list(siblings_to_check), max_workers=10,
+                                                     failure_classes=failure_classes)
+            refreshed.update((proxy_key_of(p), p) for p in still_alive)
+        refreshed.update(vouched)
+    except Exception as e:
+        log_to_render(f"❌ WORKER 2 MAINTENANCE ERROR: {str(e)}")
+        return False
     
-    log_to_render(f"✅ MAINTENANCE HOÀN THÀNH: {len(alive_proxies)}/{len(proxy_list)} proxy còn sống")
-    log_to_render(f"💾 CACHE UPDATED: {len(alive_proxies)} proxy live trong cache")
+    egress_stats["representatives_checked"] += len(representatives)
+    egress_stats["siblings_vouched"] += len(vouched)
+    egress_stats["siblings_rechecked"] += len(siblings_to_check)
+    dead_proxies = reconcile_maintenance_results(rechecked_keys, refreshed)
+    publish_pool_snapshot()
     
-    return alive_proxies
+    # SMART DEAD PROXY HANDLING với resurrection system
+    for dead_proxy in dead_proxies:
+        categorize_dead_proxy(dead_proxy, failure_count=1, failure_class=failure_classes.get(proxy_key_of(dead_proxy)))
+    
+    if dead_proxies:
+        log_to_render(f"🗑️ WORKER 2: Removed {len(dead_proxies)} dead proxy (sent to resurrection queue)")
+    
+    now_iso = datetime.now().isoformat()
+    for tier_name in tier_counts:
+        pool_stats[tier_name]["last_validation"] = now_iso
+    
+    maintenance_stats["cycles"] += 1
+    maintenance_stats["last_rechecked"] = len(representatives) + len(siblings_to_check)
+    maintenance_stats["last_vouched"] = len(vouched)
+    maintenance_stats["last_alive"] = len(refreshed)
+    maintenance_stats["last_removed"] = len(dead_proxies)
+    maintenance_stats["oldest_checked_age_seconds"] = oldest_age
+    maintenance_stats["last_cycle"] = now_iso
+    return oldest_age is not None and oldest_age > MAINTENANCE_STALENESS_SLA
 
-def background_proxy_refresh_optimized():
-    """OPTIMIZED Background thread với strategy thông minh theo yêu cầu user"""
-    global proxy_cache, startup_status
+def job_balance():
+    """JOB balance: auto-balance pools và promote STANDBY → PRIMARY"""
+    summary = get_pool_summary()
     
-    log_to_render("🚀 OPTIMIZED BACKGROUND THREAD KHỞI ĐỘNG")
-    log_to_render("📋 STRATEGY: Fetch → Batch validate → Accumulate → Maintenance → Replace")
+    log_to_render(f"📊 BALANCE JOB: Pool status - " + 
+                 f"PRIMARY:{summary['PRIMARY']}, STANDBY:{summary['STANDBY']}, " +
+                 f"EMERGENCY:{summary['EMERGENCY']}, GUARANTEED:{summary['GUARANTEED']}")
     
-    time.sleep(10)  # Stabilization wait
+    moved = 0  # Promote + emergency fill publish chung 1 snapshot
     
-    mode = "INITIAL"  # INITIAL or MAINTENANCE
-    cycle_count = 0
-    consecutive_failures = 0
-    last_fresh_fetch_time = time.time()
+    # PROMOTION LOGIC: STANDBY → PRIMARY
+    primary_deficit = TARGET_POOLS["PRIMARY"] - summary["PRIMARY"]
+    if primary_deficit > 0 and summary["STANDBY"] > 0:
+        promote_count = min(primary_deficit, summary["STANDBY"])
+        
+        promote_count = pool_transfer("STANDBY", "PRIMARY", promote_count, publish=False)
+        moved += promote_count
+        
+        log_to_render(f"⬆️ BALANCE JOB: Promoted {promote_count} proxy STANDBY → PRIMARY")
     
-    while True:
-        try:
-            cycle_count += 1
-            current_proxy_count = len(proxy_cache.get('http', []))
-            
-            log_to_render("=" * 70)
-            log_to_render(f"🔄 CYCLE {cycle_count}: {mode} MODE")
-            log_to_render(f"📊 Current proxy count: {current_proxy_count}")
-            log_to_render("=" * 70)
+    # EMERGENCY FILL: STANDBY → EMERGENCY
+    emergency_deficit = TARGET_POOLS["EMERGENCY"] - summary["EMERGENCY"]
+    if emergency_deficit > 0 and summary["STANDBY"] > TARGET_POOLS["STANDBY"]:
+        # Only fill emergency từ excess STANDBY
+        excess_standby = summary["STANDBY"] - TARGET_POOLS["STANDBY"]
+        fill_count = min(emergency_deficit, excess_standby)
+        
+        if fill_count > 0:
+            fill_count = pool_transfer("STANDBY", "EMERGENCY", fill_count, publish=False)
+            moved += fill_count
             
-            if mode == "INITIAL":
-                # ============= INITIAL MODE: Tìm đến 1000 proxy =============
-                
-                # STEP 1: Fetch proxy từ sources
-                log_to_render("📥 STEP 1: Fetch proxy từ ALL sources...")
-                try:
-                    all_proxies, sources_count = fetch_proxies_from_sources()
-                    consecutive_failures = 0  # Reset failure counter
-                except Exception as e:
-                    log_to_render(f"❌ FETCH ERROR: {str(e)}")
-                    consecutive_failures += 1
-                    
-                    if consecutive_failures >= 3:
-                        log_to_render("🚨 TOO MANY FETCH FAILURES - Wait 2 hours")
-                        time.sleep(7200)  # 2 hours
-                        consecutive_failures = 0
+            log_to_render(f"🚨 BALANCE JOB: Filled {fill_count} proxy to EMERGENCY pool")
+    
+    if moved:
+        publish_pool_snapshot()
+    
+    # GUARANTEE CHECK
+    if not summary["GUARANTEED"]:
+        log_to_render(f"🚨 GUARANTEE VIOLATION: Only {summary['TOTAL_AVAILABLE']} < {MINIMUM_GUARANTEED} proxy available!")
+        if not worker_control["emergency_mode"]:
+            trigger_emergency_mode("guarantee_violation")
+    else:
+        log_to_render(f"✅ GUARANTEE OK: {summary['TOTAL_AVAILABLE']} ≥ {MINIMUM_GUARANTEED} proxy available")
+    
+    return None
+
+def is_quality_proxy(proxy_string):
+    """Basic quality filter for better output"""
+    try:
+        # Skip obviously bad proxies
+        if not proxy_string or len(proxy_string) < 7:
+            return False
+        
+        # Basic format validation
+        if ':' not in proxy_string:
+            return False
+            
+        parts = proxy_string.split(':')
+        if len(parts) != 2:
+            return False
+            
+        host, port = parts
+        
+        # Skip localhost, private, link-local (cloud metadata) IPs, invalid ports
+        if host.startswith(('127.', '10.', '192.168.', '172.', '169.254.', '0.')):
+            return False
+            
+        if not port.isdigit() or int(port) < 1 or int(port) > 65535:
+            return False
+            
+        return True
+    except:
+        return False
+
+def classify_proxy_failure(error=None, status_code=None):
+    """Phân loại lỗi check proxy → failure class (quyết định resurrection backoff)"""
+    if status_code is not None:
+        return "auth_required" if status_code == 407 else "bad_response"
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    message = str(error).lower()
+    if "407" in message or "proxy authentication required" in message:
+        return "auth_required"
+    if "refused" in message or "errno 111" in message:
+        return "refused"
+    if "timed out" in message or "timeout" in message:
+        return "timeout"
+    if isinstance(error, (requests.exceptions.ContentDecodingError, requests.exceptions.ChunkedEncodingError,
+                          requests.exceptions.TooManyRedirects, requests.exceptions.InvalidHeader)):
+        return "bad_response"
+    return "connection_error"
+
+def pick_failure_class(failure_classes):
+    """Nhiều attempts fail → class có precedence cao nhất (auth > phản hồi sai > timeout > ...)"""
+    for failure_class in FAILURE_CLASS_PRECEDENCE:
+        if failure_class in failure_classes:
+            return failure_class
+    return "connection_error"
+
+def check_single_proxy(proxy_string, timeout=8, protocols=['http']):
+    """Kiểm tra 1 proxy với các protocols khác nhau - tối ưu cho Render"""
+    return check_single_proxy_classified(proxy_string, timeout, protocols)[0]
+
+def check_single_proxy_classified(proxy_string, timeout=8, protocols=['http']):
+    """Như check_single_proxy nhưng trả về (result, failure_class) - failure_class None khi alive"""
+    failure_classes = set()
+    try:
+        if ':' not in proxy_string:
+            return None, "invalid"
+            
+        # Parse proxy format: host:port hoặc username:password@host:port
+        if '@' in proxy_string:
+            auth_part, host_port = proxy_string.split('@')
+            if ':' in auth_part:
+                username, password = auth_part.split(':', 1)
+            else:
+                username, password = auth_part, ""
+        else:
+            username, password = None, None
+            host_port = proxy_string
+
+        if ':' not in host_port:
+            return None, "invalid"
+            
+        host, port = host_port.strip().split(':', 1)
+        
+        # Test URLs 
+        test_urls = [
+            'http://httpbin.org/ip',
+            'http://ip-api.com/json',
+            'https://api.ipify.org',
+        ]
+        
+        # Test với từng protocol
+        for protocol in protocols:
+            try:
+                # Setup proxy theo protocol
+                if username and password:
+                    if protocol in ['socks4', 'socks5']:
+                        proxy_url = f"{protocol}://{username}:{password}@{host}:{port}"
                     else:
-                        time.sleep(1800)  # 30 minutes
-                    continue
-                
-                if not all_proxies or len(all_proxies) < 500:
-                    log_to_render(f"⚠️ INSUFFICIENT PROXY: Only {len(all_proxies) if all_proxies else 0} < 500")
-                    log_to_render("⏳ Wait 30 minutes and retry...")
-                    time.sleep(1800)
-                    continue
-                
-                log_to_render(f"✅ FETCHED {len(all_proxies)} proxy from {sources_count} sources")
-                
-                # STEP 2: Batch validate để accumulate results
-                log_to_render("⚡ STEP 2: Batch validate để tích lũy results...")
-                
-                # Get existing valid proxies to accumulate
-                existing_valid = []
-                with cache_lock:
-                    existing_proxies = proxy_cache.get('http', [])
-                    for p in existing_proxies:
-                        if isinstance(p, dict) and 'host' in p and 'port' in p:
-                            existing_valid.append(p)
+                        proxy_url = f"http://{username}:{password}@{host}:{port}"
+                else:
+                    if protocol in ['socks4', 'socks5']:
+                        proxy_url = f"{protocol}://{host}:{port}"
+                    else:
+                        proxy_url = f"http://{host}:{port}"
                 
-                log_to_render(f"📚 ACCUMULATE MODE: {len(existing_valid)} existing + new validation")
+                proxies = {
+                    'http': proxy_url,
+                    'https': proxy_url
+                }
                 
-                # Validate in chunks of 500
-                chunk_size = 500
-                total_accumulated = existing_valid.copy()
+                start_time = time.time()
                 
-                for i in range(0, len(all_proxies), chunk_size):
-                    chunk = all_proxies[i:i + chunk_size]
-                    chunk_num = (i // chunk_size) + 1
-                    total_chunks = (len(all_proxies) + chunk_size - 1) // chunk_size
-                    
-                    log_to_render(f"🔄 Processing chunk {chunk_num}/{total_chunks} ({len(chunk)} proxy)")
-                    
+                # Test proxy với multiple URLs
+                for test_url in test_urls:
                     try:
-                        chunk_results = validate_proxy_batch_smart(chunk, max_workers=25)
-                        total_accumulated.extend(chunk_results)
-                        
-                        # Update cache REAL-TIME với accumulated results
-                        with cache_lock:
-                            proxy_cache["http"] = total_accumulated.copy()
-                            proxy_cache["alive_count"] = len(total_accumulated)
-                            proxy_cache["last_update"] = datetime.now().isoformat()
-                        
-                        current_count = len(total_accumulated)
-                        log_to_render(f"📈 ACCUMULATED: {current_count} total proxy")
+                        response = requests.get(
+                            test_url,
+                            proxies=proxies,
+                            timeout=timeout,
+                            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+                        )
                         
-                        # CHECK: Đạt target 1000?
-                        if current_count >= TARGET_LIVE_PROXIES:
-                            log_to_render(f"🎉 TARGET ACHIEVED: {current_count} ≥ {TARGET_LIVE_PROXIES}")
-                            log_to_render("✅ SWITCH TO MAINTENANCE MODE")
-                            mode = "MAINTENANCE"
-                            startup_status["first_fetch_completed"] = True
-                            break
+                        if response.status_code == 200:
+                            speed = round(time.time() - start_time, 2)
+                            
+                            # Get proxy IP
+                            try:
+                                ip_data = response.json()
+                                proxy_ip = ip_data.get('origin', ip_data.get('query', ip_data.get('ip', 'unknown')))
+                                # Clean IP (remove port if present)
+                                if ',' in proxy_ip:
+                                    proxy_ip = proxy_ip.split(',')[0]
+                            except Exception:
+                                proxy_ip = 'unknown'
                             
+                            return {
+                                'host': host,
+                                'port': int(port),
+                                'type': protocol,
+                                'speed': speed,
+                                'status': 'alive',
+                                'ip': proxy_ip,
+                                'checked_at': datetime.now().isoformat(),
+                                'proxy_string': f"{host}:{port}",
+                                'full_proxy': proxy_string,
+                                'has_auth': bool(username and password)
+                            }, None
+                        
+                        failure_class = classify_proxy_failure(status_code=response.status_code)
                     except Exception as e:
-                        log_to_render(f"❌ Chunk {chunk_num} validation error: {str(e)}")
-                        continue
+                        # REMOVED: Bỏ error logs để giảm noise
+                        failure_class = classify_proxy_failure(error=e)
+                    
+                    failure_classes.add(failure_class)
+                    if failure_class in ("refused", "auth_required"):
+                        break  # Proxy từ chối / đòi auth → test URL khác cũng vô ích
                 
-                # Nếu vẫn chưa đủ sau khi validate hết
-                final_count = len(total_accumulated)
-                if final_count < TARGET_LIVE_PROXIES and mode == "INITIAL":
-                    log_to_render(f"⚠️ STILL INSUFFICIENT: {final_count} < {TARGET_LIVE_PROXIES}")
-                    log_to_render("🔄 Will retry with FRESH fetch in next cycle")
-                    time.sleep(600)  # 10 minutes before retry
+                if "refused" in failure_classes:
+                    break  # TCP refused không phụ thuộc protocol → không dial thêm
+                        
+            except Exception as e:
+                # REMOVED: Bỏ error logs để giảm noise
+                failure_classes.add(classify_proxy_failure(error=e))
+                continue
                 
+    except Exception:
+        # REMOVED: Bỏ error logs để giảm noise
+        failure_classes.add("invalid")
+    
+    return None, pick_failure_class(failure_classes)
+
+def check_single_proxy_metered(proxy_string, timeout=8, protocols=['http']):
+    """check_single_proxy_classified + latency / outcome metrics (protocol alive, hoặc protocol đã thử)"""
+    started = time.perf_counter()
+    result, failure_class = check_single_proxy_classified(proxy_string, timeout, protocols)
+    if result:
+        protocol = result['type']
+    else:
+        protocol = protocols[0] if len(protocols) == 1 else "mixed"
+    observe_metric("proxy_check_duration_seconds", (("protocol", protocol),), time.perf_counter() - started)
+    inc_metric("proxy_checks_total", (("protocol", protocol), ("outcome", failure_class or "alive")))
+    return result, failure_class
+
+def fetch_proxies_from_sources():
+    """Lấy proxy từ tất cả nguồn với logic thông minh - tối ưu cho Render"""
+    global last_fetch_sources
+    
+    categorized_proxies = []
+    mixed_proxies = []
+    sources_processed = 0
+    fetch_sources = {}  # candidate key -> source name (feed source yield score)
+    
+    log_to_render("🔍 BẮT ĐẦU FETCH PROXY TỪ CÁC NGUỒN...")
+    log_to_render(f"📋 Tổng {len(PROXY_SOURCE_LINKS['categorized'])} categorized + {len(PROXY_SOURCE_LINKS['mixed'])} mixed sources")
+    
+    # Xử lý các categorized sources
+    log_to_render("📥 Xử lý CATEGORIZED sources...")
+    for source_name, source_config in PROXY_SOURCE_LINKS["categorized"].items():
+        try:
+            # Check if source has multiple protocols or single protocol
+            if "url" in source_config and "protocol" in source_config:
+                # Single protocol format
+                source_url = source_config["url"]
+                source_protocol = source_config["protocol"]
+                protocols_to_fetch = [(source_protocol, source_url)]
             else:
-                # ============= MAINTENANCE MODE: Check 1000 proxy hiện có =============
-                
-                log_to_render("🔧 MAINTENANCE: Validate existing proxy pool...")
-                
-                # Get current proxy list
-                with cache_lock:
-                    current_proxies = proxy_cache.get('http', []).copy()
-                
-                if not current_proxies:
-                    log_to_render("⚠️ NO PROXY IN CACHE - Switch back to INITIAL")
-                    mode = "INITIAL"
-                    continue
-                
-                log_to_render(f"🔍 Validating {len(current_proxies)} existing proxy...")
+                # Multiple protocols format (like dpangestuw)
+                protocols_to_fetch = [(protocol, url) for protocol, url in source_config.items()]
+            
+            source_total_proxies = []
+            source_started = time.time()
+            
+            for source_protocol, source_url in protocols_to_fetch:
+                # REMOVED: Bỏ log individual protocol
                 
-                # Convert to validation format
-                proxy_list = []
-                for p in current_proxies:
-                    if isinstance(p, dict) and 'host' in p and 'port' in p:
-                        proxy_string = f"{p['host']}:{p['port']}"
-                        proxy_type = p.get('type', 'http')
-                        proxy_list.append(('maintenance', proxy_string, [proxy_type]))
+                response = get_with_session(source_url, timeout=45)
                 
-                # Validate existing proxy
-                try:
-                    new_valid_proxies = validate_proxy_batch_smart(proxy_list, max_workers=30)
-                    
-                    # REPLACE old cache với new results
-                    with cache_lock:
-                        proxy_cache["http"] = new_valid_proxies.copy()
-                        proxy_cache["alive_count"] = len(new_valid_proxies)
-                        proxy_cache["last_update"] = datetime.now().isoformat()
-                    
-                    log_to_render(f"🔄 CACHE REPLACED: {len(new_valid_proxies)} valid proxy")
+                if response.status_code == 200:
+                    content = response.text
+                    lines = content.strip().split('\n')
+                    source_proxies = []
                     
-                    # CHECK: Còn đủ proxy không?
-                    if len(new_valid_proxies) < 800:  # Threshold để switch back
-                        log_to_render(f"⚠️ PROXY DEPLETED: {len(new_valid_proxies)} < 800")
-                        log_to_render("🔄 Switch back to INITIAL mode để fetch fresh proxy")
-                        mode = "INITIAL"
-                        last_fresh_fetch_time = time.time()
-                    else:
-                        log_to_render(f"✅ MAINTENANCE OK: {len(new_valid_proxies)} proxy healthy")
-                        log_to_render("😴 Sleep 10 minutes until next maintenance cycle")
-                        time.sleep(600)  # 10 minutes normal maintenance
+                    for line in lines:
+                        line = line.strip()
+                        if not line or line.startswith('#'):
+                            continue
                         
-                except Exception as e:
-                    log_to_render(f"❌ MAINTENANCE ERROR: {str(e)}")
-                    log_to_render("🔄 Force switch to INITIAL mode")
-                    mode = "INITIAL"
-                    continue
+                        # Xử lý đặc biệt cho server dpangestuw - loại bỏ protocol prefix
+                        if source_name == "Server dpangestuw":
+                            if line.startswith('socks4://'):
+                                line = line.replace('socks4://', '')
+                            elif line.startswith('socks5://'):
+                                line = line.replace('socks5://', '')
+                            
+                        # Validate proxy format
+                        if ':' in line and is_quality_proxy(line.strip()):
+                            try:
+                                # Check if it's valid proxy format
+                                if '@' in line:
+                                    auth_part, host_port = line.split('@')
+                                    host, port = host_port.split(':')
+                                else:
+                                    host, port = line.split(':')
+                                
+                                # Basic validation
+                                if len(host.split('.')) == 4 and port.isdigit():
+                                    source_proxies.append(('categorized', line, source_protocol))
+                                    
+                            except Exception:
+                                continue
+                    
+                    source_total_proxies.extend(source_proxies)
+                    # REDUCED: Chỉ log nếu có proxy
+                    if len(source_proxies) > 0:
+                        log_to_render(f"✅ {source_name} - {source_protocol}: {len(source_proxies)} proxy")
+                else:
+                    log_to_render(f"❌ {source_name} - {source_protocol}: HTTP {response.status_code}")
             
+            categorized_proxies.extend(source_total_proxies)
+            record_source_fetch(source_name, source_total_proxies, time.time() - source_started, fetch_sources)
+            sources_processed += 1
+            log_to_render(f"🎯 {source_name} TOTAL: {len(source_total_proxies)} proxy")
+        
         except Exception as e:
-            log_to_render(f"❌ CRITICAL ERROR in cycle {cycle_count}: {str(e)}")
-            log_to_render(f"📍 Traceback: {traceback.format_exc()}")
+            log_to_render(f"❌ {source_name}: {str(e)}")
+            inc_metric("proxy_source_fetch_errors_total", (("source", source_name),))
+            continue
+    
+    # Xử lý mixed sources sau
+    log_to_render("📥 Xử lý MIXED sources...")
+    for source_name, source_config in PROXY_SOURCE_LINKS["mixed"].items():
+        try:
+            source_url = source_config["url"]
+            source_protocols = source_config["protocols"]
+            source_started = time.time()
+            # REMOVED: Bỏ log chi tiết protocols
             
-            # Smart recovery
-            time.sleep(300)  # 5 minutes recovery
-            if cycle_count % 10 == 0:  # Every 10 cycles, force fresh start
-                log_to_render("🔄 FORCE FRESH START after multiple errors")
-                mode = "INITIAL"
-                consecutive_failures = 0
-
-# STRATEGY SUMMARY cho user:
-def get_strategy_summary():
-    """Trả về strategy summary cho user hiểu logic"""
-    return {
-        "INITIAL_MODE": {
-            "description": "Tìm kiếm đến 1000 proxy",
-            "steps": [
-                "1. Fetch ALL proxy từ sources",
-                "2. Validate theo batch 500 proxy/lần", 
-                "3. Accumulate results real-time",
-                "4. Đạt 1000 → switch MAINTENANCE"
-            ],
-            "fallback": "Nếu không đủ proxy → wait 30min retry"
-        },
-        "MAINTENANCE_MODE": {
-            "description": "Maintain 1000 proxy pool",
-            "steps": [
-                "1. Validate 1000 proxy hiện có",
-                "2. REPLACE cache với results mới",
-                "3. Check số lượng còn lại",
-                "4. <800 → switch INITIAL"
-            ],
-            "cycle": "10 minutes between maintenance"
-        },
-        "RECOVERY_STRATEGY": {
-            "fetch_failure": "3 lần fail → wait 2h retry ALL",
-            "insufficient_proxy": "Wait 30min và retry fresh fetch",
-            "cache_depleted": "Auto switch INITIAL mode",
-            "critical_error": "5min recovery + force fresh every 10 cycles"
-        }
-    }
-
-@app.route('/api/strategy', methods=['GET'])
-def get_strategy():
-    """API để hiểu strategy và logic flow của service"""
-    try:
-        strategy = get_strategy_summary()
-        current_mode = "INITIAL" if not startup_status.get("first_fetch_completed", False) else "MAINTENANCE"
-        current_proxy_count = len(proxy_cache.get('http', []))
-        
-        return jsonify({
-            'success': True,
-            'current_mode': current_mode,
-            'current_proxy_count': current_proxy_count,
-            'target_proxy_count': TARGET_LIVE_PROXIES,
-            'strategy': strategy,
-            'flow_diagram': {
-                'description': 'Service flow theo strategy optimized',
-                'stages': [
-                    'INITIAL: Fetch → Batch validate → Accumulate → Target check',
-                    'MAINTENANCE: Validate existing → Replace cache → Count check',
-                    'RECOVERY: Smart fallback với wait times và retry logic'
-                ]
-            },
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'success': False,
+            response = get_with_session(source_url, timeout=45)
+            
+            if response.status_code == 200:
+                content = response.text
+                lines = content.strip().split('\n')
+                source_proxies = []
+                
+                for line in lines:
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                        
+                    # Validate proxy format
+                    if ':' in line and is_quality_proxy(line.strip()):
+                        try:
+                            # Check if it's valid proxy format
+                            if '@' in line:
+                                auth_part, host_port = line.split('@')
+                                host, port = host_port.split(':')
+                            else:
+                                host, port = line.split(':')
+                            
+                            # Basic validation  
+                            if len(host.split('.')) == 4 and port.isdigit():
+                                source_proxies.append(('mixed', line, source_protocols))
+                                
+                        except Exception:
+                            continue
+                
+                mixed_proxies.extend(source_proxies)
+                record_source_fetch(source_name, source_proxies, time.time() - source_started, fetch_sources)
+                sources_processed += 1
+                log_to_render(f"✅ {source_name}: {len(source_proxies)} proxy")
+            else:
+                log_to_render(f"❌ {source_name}: HTTP {response.status_code}")
+        
+        except Exception as e:
+            log_to_render(f"❌ {source_name}: {str(e)}")
+            inc_metric("proxy_source_fetch_errors_total", (("source", source_name),))
+            continue
+    
+    # Combine tất cả proxy (categorized + mixed) - KHÔNG GIỚI HẠN
+    all_proxies = categorized_proxies + mixed_proxies
+    original_count = len(all_proxies)
+    
+    # Remove duplicates dựa trên proxy string (host:port)
+    seen = set()
+    unique_proxies = []
+    for proxy_data in all_proxies:
+        if isinstance(proxy_data, tuple) and len(proxy_data) >= 2:
+            proxy_string = proxy_data[1]  # proxy_string ở position 1
+        else:
+            proxy_string = str(proxy_data)
+        
+        if proxy_string not in seen:
+            seen.add(proxy_string)
+            unique_proxies.append(proxy_data)
+    
+    duplicates_removed = original_count - len(unique_proxies)
+    random.shuffle(unique_proxies)
+    last_fetch_sources = fetch_sources
+    
+    log_to_render(f"🎯 HOÀN THÀNH FETCH: {len(unique_proxies)} unique proxy ({duplicates_removed} duplicates removed)")
+    log_to_render(f"📊 Đã xử lý {sources_processed} nguồn thành công")
+    log_to_render(f"📋 Original: {original_count} → Unique: {len(unique_proxies)} ({round(len(unique_proxies)/original_count*100, 1)}% unique)")
+    log_to_render(f"📋 Categorized: {len(categorized_proxies)}, Mixed: {len(mixed_proxies)}")
+    
+    return unique_proxies, sources_processed
+
+def validate_proxy_batch_smart(proxy_list, max_workers=15, failure_classes=None):
+    """Validate proxies KHÔNG chunking - chỉ validate toàn bộ list được pass vào
+
+    failure_classes (dict, optional): được fill proxy_key → failure class cho proxy dead.
+    """
+    if not proxy_list:
+        log_to_render("⚠️ Không có proxy để validate")
+        return []
+    
+    # Sử dụng global cache để update real-time
+    global proxy_cache
+    alive_proxies = []
+    total_proxies = len(proxy_list)
+    
+    log_to_render(f"⚡ BẮT ĐẦU VALIDATE {total_proxies} PROXY")
+    log_to_render(f"🔧 Cấu hình: {max_workers} workers (KHÔNG sub-chunking)")
+    
+    # KHÔNG reset cache cũ, chỉ track validation hiện tại
+    current_validation_checked = 0
+    current_validation_alive = 0
+    
+    # Giữ lại proxy cũ và tích lũy thêm proxy mới
+    existing_proxies = proxy_cache.get("http", [])
+    log_to_render(f"🔄 Bắt đầu validation mới - Giữ lại {len(existing_proxies)} proxy cũ")
+    
+    # Count proxy types
+    categorized_count = sum(1 for item in proxy_list if isinstance(item, tuple) and item[0] == 'categorized')
+    mixed_count = sum(1 for item in proxy_list if isinstance(item, tuple) and item[0] == 'mixed')
+    
+    log_to_render(f"🔧 Proxy types: {categorized_count} categorized(specific) + {mixed_count} mixed(all)")
+    
+    checked_count = 0
+    
+    # Validate TẤT CẢ proxy cùng lúc với ThreadPoolExecutor - KHÔNG sub-chunking
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Submit tất cả proxy
+        future_to_proxy = {}
+        for proxy_data in proxy_list:
+            # Unpack proxy data với structure mới
+            if isinstance(proxy_data, tuple) and len(proxy_data) == 3:
+                proxy_type, proxy_string, protocols_info = proxy_data
+            else:
+                # Fallback for old format
+                proxy_type, proxy_string, protocols_info = 'categorized', proxy_data, 'http'
+            
+            # Xác định protocols để test dựa trên source type
+            if proxy_type == 'mixed' or isinstance(protocols_info, list):
+                protocols = protocols_info  # Mixed/maintenance/resurrection đã là list protocols
+            else:
+                protocols = [protocols_info]  # Categorized sources sử dụng protocol cụ thể
+            
+            future = executor.submit(check_single_proxy_metered, proxy_string, 8, protocols)
+            future_to_proxy[future] = (proxy_type, proxy_string, protocols_info)
+        
+        # Collect results với progress tracking
+        for future in as_completed(future_to_proxy):
+            checked_count += 1
+            current_validation_checked += 1
+            proxy_type, proxy_string, protocols_info = future_to_proxy[future]
+            
+            try:
+                result, failure_class = future.result()
+                record_observation(candidate_key_of(proxy_string), bool(result),
+                                   result['speed'] if result else None, failure_class)
+                record_liveness(candidate_key_of(proxy_string), bool(result))
+                record_subnet_outcome(candidate_key_of(proxy_string), bool(result))
+                if failure_class is not None:
+                    failure_class_stats[failure_class]["observed"] += 1
+                    if failure_classes is not None:
+                        failure_classes[candidate_key_of(proxy_string)] = failure_class
+                if result:
+                    alive_proxies.append(result)
+                    
+                    # Tích lũy proxy mới với proxy cũ (tránh duplicate) - lấy real-time
+                    with cache_lock:
+                        current_proxies = proxy_cache.get("http", []).copy()
+                    
+                    # Thêm proxy mới nếu chưa có
+                    proxy_key = f"{result['host']}:{result['port']}"
+                    existing_keys = [f"{p['host']}:{p['port']}" for p in current_proxies]
+                    
+                    if proxy_key not in existing_keys:
+                        current_proxies.append(result)
+                    
+                    # Update cache với danh sách tích lũy
+                    with cache_lock:
+                        proxy_cache["http"] = current_proxies.copy()
+                        proxy_cache["alive_count"] = len(current_proxies)
+                        proxy_cache["total_checked"] = proxy_cache.get("total_checked", 0) + 1
+                        proxy_cache["last_update"] = datetime.now().isoformat()
+                    
+                    current_validation_alive += 1
+                    
+                else:
+                    # Update total checked even for failed (tích lũy)
+                    with cache_lock:
+                        proxy_cache["total_checked"] = proxy_cache.get("total_checked", 0) + 1
+                    
+                    # REDUCED: Chỉ log progress ít hơn
+                    if checked_count % 100 == 0:  # Log mỗi 100 proxy
+                        progress_pct = round(checked_count/total_proxies*100, 1)
+                        log_to_render(f"⏳ Progress: {checked_count}/{total_proxies} checked ({progress_pct}%), {len(alive_proxies)} alive",
+                                      category="validation_progress")
+                        
+            except Exception as e:
+                record_observation(candidate_key_of(proxy_string), False)
+                record_liveness(candidate_key_of(proxy_string), False)
+                record_subnet_outcome(candidate_key_of(proxy_string), False)
+                # Update total checked even for exceptions (tích lũy)
+                with cache_lock:
+                    proxy_cache["total_checked"] = proxy_cache.get("total_checked", 0) + 1
+    
+    # Final validation summary (KHÔNG override cache đã tích lũy)
+    final_alive_count = proxy_cache.get("alive_count", 0)
+    final_total_checked = proxy_cache.get("total_checked", 0)
+    
+    # Chỉ update timestamp
+    with cache_lock:
+        proxy_cache["last_update"] = datetime.now().isoformat()
+    
+    # SIMPLIFIED: Logs ngắn gọn hơn
+    current_cycle_success = round(len(alive_proxies)/total_proxies*100, 1) if total_proxies > 0 else 0
+    overall_success = round(final_alive_count/final_total_checked*100, 1) if final_total_checked > 0 else 0
+    log_to_render(f"🎯 VALIDATION HOÀN THÀNH!")
+    log_to_render(f"📊 Batch này: {len(alive_proxies)} alive / {total_proxies} total ({current_cycle_success}%)")
+    log_to_render(f"📈 Tổng cộng: {final_alive_count} alive / {final_total_checked} total ({overall_success}%)")
+    
+    return alive_proxies
+
+# STRATEGY SUMMARY cho user:
+def get_strategy_summary():
+    """Trả về strategy summary cho user hiểu logic (từ SCHEDULER_JOBS)"""
+    return {
+        "SCHEDULER": {
+            "description": f"1 dispatcher, tối đa {SCHEDULER_MAX_WORKERS} jobs đồng thời, priority thấp chạy trước",
+            "jobs": {
+                job_name: {
+                    "description": job["description"],
+                    "priority": job["priority"],
+                    "deadline_seconds": job["deadline"],
+                    "interval_seconds": job["interval"],
+                    "triggers": job["triggers"]
+                }
+                for job_name, job in SCHEDULER_JOBS.items()
+            }
+        },
+        "RECOVERY_STRATEGY": {
+            "fetch_failure": "Retry sau 10 phút (error backoff của fetch job)",
+            "insufficient_proxy": "Emergency mode → wake fetch + balance ngay",
+            "pool_low": f"Pool < {int(POOL_LOW_WATERMARK * 100)}% target → wake job tương ứng",
+            "job_error": "Log + error backoff, scheduler tiếp tục chạy các jobs khác"
+        }
+    }
+
+def build_strategy():
+    """Payload của /api/strategy (cũng push qua dashboard stream)"""
+    strategy = get_strategy_summary()
+    current_proxy_count = pool_snapshot["summary"]["TOTAL_AVAILABLE"]
+    
+    return {
+        'success': True,
+        'current_mode': 'SCHEDULER',
+        'current_proxy_count': current_proxy_count,
+        'target_proxy_count': sum(TARGET_POOLS.values()),
+        'strategy': strategy,
+        'flow_diagram': {
+            'description': 'Service flow theo strategy optimized',
+            'stages': [
+                'FETCH: Sources → FRESH (score-based admission)',
+                'VALIDATE_FRESH: FRESH → STANDBY (best-scored batch first)',
+                'BALANCE: STANDBY → PRIMARY / EMERGENCY',
+                'MAINTAIN: Re-check stalest serving proxy → dead to resurrection queue',
+                'RESURRECT: Retry dead proxy at their deadline → STANDBY'
+            ]
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+@app.route('/api/strategy', methods=['GET'])
+def get_strategy():
+    """API để hiểu strategy và logic flow của service"""
+    try:
+        return jsonify(build_strategy())
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
             'error': str(e)
         }), 500
 
@@ -1280,40 +3043,24 @@ def initialize_ultra_smart_service():
         # Initialize all pools as empty
         log_to_render("💾 Initializing multi-tier pools...")
         for pool_name in proxy_pools:
-            with pool_locks[pool_name]:
-                proxy_pools[pool_name] = []
+            pool_replace(pool_name, [], publish=False)
+        publish_pool_snapshot()
         
         log_to_render("✅ Multi-tier pools initialized")
         
-        # Start 3 background workers
-        log_to_render("🔄 STARTING 3 ULTRA SMART WORKERS...")
+        if CLUSTER_ENABLED:
+            update_cluster_membership()  # Optimistic: mọi configured node coi như sống tới khi timeout
+        elif CLUSTER_NODES and not CLUSTER_SECRET:
+            log_to_render("⚠️ CLUSTER DISABLED: thiếu PROXY_CLUSTER_SECRET")
+        elif CLUSTER_NODES:
+            log_to_render(f"⚠️ CLUSTER DISABLED: PROXY_CLUSTER_SELF '{CLUSTER_SELF}' không nằm trong PROXY_CLUSTER_NODES")
         
-        try:
-            # Worker 1: Continuous Fetch
-            worker1_thread = threading.Thread(target=worker1_continuous_fetch, daemon=True)
-            worker1_thread.start()
-            log_to_render("✅ WORKER 1: Continuous fetch started!")
-            
-            # Worker 2: Rolling Validation  
-            worker2_thread = threading.Thread(target=worker2_rolling_validation, daemon=True)
-            worker2_thread.start()
-            log_to_render("✅ WORKER 2: Rolling validation started!")
-            
-            # Worker 3: Pool Balancer
-            worker3_thread = threading.Thread(target=worker3_pool_balancer, daemon=True)
-            worker3_thread.start()
-            log_to_render("✅ WORKER 3: Pool balancer started!")
-            
-            # Worker 4: Resurrection Manager (NEW!)
-            worker4_thread = threading.Thread(target=worker4_resurrection_manager, daemon=True)
-            worker4_thread.start()
-            log_to_render("✅ WORKER 4: Dead proxy resurrection manager started!")
-            
-            startup_status["workers_started"] = True
-            
-        except Exception as e:
-            log_to_render(f"❌ LỖI khởi động workers: {str(e)}")
-            startup_status["error_count"] += 1
+        # 1 owner process chạy background jobs, các gunicorn workers khác serve reads từ shared state
+        if try_acquire_owner_lock():
+            log_to_render(f"👑 OWNER: process {os.getpid()} chạy background jobs")
+            start_owner_services()
+        else:
+            start_follower()
         
         # Initialize pool stats
         pool_stats["last_update"] = datetime.now().isoformat()
@@ -1324,7 +3071,7 @@ def initialize_ultra_smart_service():
         
         log_to_render("🎉 ULTRA SMART SERVICE INITIALIZATION COMPLETED!")
         log_to_render("📊 System will guarantee >500 proxy ready trong vài phút")
-        log_to_render("🔄 4 workers running continuously in background")
+        log_to_render(f"🔄 {len(SCHEDULER_JOBS)} jobs running on event-driven scheduler")
         log_to_render("💀➡️🔄 Dead proxy resurrection system ENABLED!")
         
     except Exception as e:
@@ -1332,8 +3079,6 @@ def initialize_ultra_smart_service():
         log_to_render(f"📍 Traceback: {traceback.format_exc()}")
         startup_status["error_count"] += 1
 
-initialize_ultra_smart_service()
-
 @app.route('/')
 def home():
     """UI chính với real-time logs"""
@@ -1520,7 +3265,7 @@ def home():
             </div>
             
             <div class="update-time">
-                <p>⏱️ Tự động cập nhật mỗi 5 giây | 🔄 Logs real-time</p>
+                <p><span id="stream-status">📡 Đang kết nối stream...</span> | 🔄 Logs real-time, stats push khi thay đổi</p>
                 <p>📊 Service monitoring với chi tiết từng bước</p>
             </div>
         </div>
@@ -1528,42 +3273,37 @@ def home():
         <script>
             let lastLogCount = 0;
             let repeatLogCount = 0;
+            let recentLogs = [];
+            let lastLogSeq = 0;
             
-            function updateStats() {{
-                fetch('/api/proxy/stats')
-                    .then(response => response.json())
-                    .then(data => {{
-                        // Update stats
-                        document.getElementById('stats').innerHTML = 
-                            '<p><strong>Proxy sống:</strong> ' + data.alive_count + '</p>' +
-                            '<p><strong>🎯 Target:</strong> ' + data.alive_count + '/' + data.target_live_proxies + ' (' + data.target_progress + '%)</p>' +
-                            '<p><strong>Target đạt:</strong> ' + (data.target_achieved ? '✅' : '❌') + '</p>' +
-                            '<p><strong>Tổng đã check:</strong> ' + data.total_checked + '</p>' +
-                            '<p><strong>Tỷ lệ thành công:</strong> ' + data.success_rate + '%</p>' +
-                            '<p><strong>Nguồn đã xử lý:</strong> ' + data.sources_processed + '/' + data.sources_count + '</p>' +
-                            '<p><strong>Lần check cuối:</strong> ' + (data.last_update ? new Date(data.last_update).toLocaleString() : 'Chưa check') + '</p>';
-                        
-                        // Update status
-                        const statusEl = document.getElementById('current-status');
-                        const statusContainer = document.getElementById('system-status');
-                        
-                        if (data.target_achieved) {{
-                            statusEl.textContent = '🎉 TARGET ACHIEVED - ' + data.alive_count + ' proxy sống (≥1000)';
-                            statusContainer.className = 'status status-success';
-                        }} else if (data.alive_count >= 500) {{
-                            statusEl.textContent = '⚡ Đang đạt target - ' + data.alive_count + '/' + data.target_live_proxies + ' proxy (' + data.target_progress + '%)';
-                            statusContainer.className = 'status status-info';
-                        }} else if (data.alive_count > 0) {{
-                            statusEl.textContent = '🔍 Đang tìm proxy - ' + data.alive_count + '/' + data.target_live_proxies + ' (' + data.target_progress + '%)';
-                            statusContainer.className = 'status status-info';
-                        }} else {{
-                            statusEl.textContent = 'Đang khởi động và tìm proxy sống...';
-                            statusContainer.className = 'status status-error';
-                        }}
-                    }})
-                    .catch(e => {{
-                        document.getElementById('stats').innerHTML = '<p style="color: red;">Service đang khởi động...</p>';
-                    }});
+            function renderStats(data) {{
+                // Update stats
+                document.getElementById('stats').innerHTML = 
+                    '<p><strong>Proxy sống:</strong> ' + data.alive_count + '</p>' +
+                    '<p><strong>🎯 Target:</strong> ' + data.alive_count + '/' + data.target_live_proxies + ' (' + data.target_progress + '%)</p>' +
+                    '<p><strong>Target đạt:</strong> ' + (data.target_achieved ? '✅' : '❌') + '</p>' +
+                    '<p><strong>Tổng đã check:</strong> ' + data.total_checked + '</p>' +
+                    '<p><strong>Tỷ lệ thành công:</strong> ' + data.success_rate + '%</p>' +
+                    '<p><strong>Nguồn đã xử lý:</strong> ' + data.sources_processed + '/' + data.sources_count + '</p>' +
+                    '<p><strong>Lần check cuối:</strong> ' + (data.last_update ? new Date(data.last_update).toLocaleString() : 'Chưa check') + '</p>';
+                
+                // Update status
+                const statusEl = document.getElementById('current-status');
+                const statusContainer = document.getElementById('system-status');
+                
+                if (data.target_achieved) {{
+                    statusEl.textContent = '🎉 TARGET ACHIEVED - ' + data.alive_count + ' proxy sống (≥1000)';
+                    statusContainer.className = 'status status-success';
+                }} else if (data.alive_count >= 500) {{
+                    statusEl.textContent = '⚡ Đang đạt target - ' + data.alive_count + '/' + data.target_live_proxies + ' proxy (' + data.target_progress + '%)';
+                    statusContainer.className = 'status status-info';
+                }} else if (data.alive_count > 0) {{
+                    statusEl.textContent = '🔍 Đang tìm proxy - ' + data.alive_count + '/' + data.target_live_proxies + ' (' + data.target_progress + '%)';
+                    statusContainer.className = 'status status-info';
+                }} else {{
+                    statusEl.textContent = 'Đang khởi động và tìm proxy sống...';
+                    statusContainer.className = 'status status-error';
+                }}
             }}
             
             function detectInfiniteLoop(logs) {{
@@ -1618,757 +3358,2959 @@ def home():
                 }}
             }}
             
-            function updateLogs() {{
-                fetch('/api/logs')
-                    .then(response => response.json())
-                    .then(data => {{
-                        const logsContainer = document.getElementById('logs');
-                        
-                        if (data.logs && data.logs.length > 0) {{
-                            logsContainer.innerHTML = data.logs.map(log => 
-                                '<div class="log-entry log-' + log.level + '">' + log.full_log + '</div>'
-                            ).join('');
-                            logsContainer.scrollTop = logsContainer.scrollHeight;
-                            
-                            // Detect infinite loop patterns
-                            detectInfiniteLoop(data.logs);
-                        }}
-                        
-                        // Update system info
-                        document.getElementById('system-info').innerHTML = 
-                            '<p><strong>Khởi tạo:</strong> ' + (data.startup.initialized ? '✅' : '❌') + '</p>' +
-                            '<p><strong>Background Thread:</strong> ' + (data.startup.background_thread_started ? '✅' : '❌') + '</p>' +
-                            '<p><strong>First Fetch:</strong> ' + (data.startup.first_fetch_completed ? '✅' : '❌') + '</p>' +
-                            '<p><strong>Errors:</strong> ' + data.startup.error_count + '</p>' +
-                            '<p><strong>Hoạt động cuối:</strong> ' + (data.startup.last_activity ? new Date(data.startup.last_activity).toLocaleTimeString() : 'N/A') + '</p>';
-                    }})
-                    .catch(e => {{
-                        console.log('Error fetching logs:', e);
-                    }});
+            function renderLogs(logs) {{
+                // Stream có thể gửi lại entries đã có (initial + push) → dedupe theo seq
+                const fresh = logs.filter(log => log.seq > lastLogSeq);
+                if (fresh.length === 0) {{
+                    return;
+                }}
+                lastLogSeq = fresh[fresh.length - 1].seq;
+                recentLogs = recentLogs.concat(fresh).slice(-100);
+                
+                const logsContainer = document.getElementById('logs');
+                logsContainer.innerHTML = recentLogs.map(log => 
+                    '<div class="log-entry log-' + log.level + '">' + log.full_log + '</div>'
+                ).join('');
+                logsContainer.scrollTop = logsContainer.scrollHeight;
+                
+                // Detect infinite loop patterns
+                detectInfiniteLoop(recentLogs);
             }}
             
-            function updateStrategy() {{
-                fetch('/api/strategy')
-                    .then(response => response.json())
-                    .then(data => {{
-                        if (data.success) {{
-                            const currentMode = data.current_mode;
-                            const currentCount = data.current_proxy_count;
-                            const targetCount = data.target_proxy_count;
-                            const strategy = data.strategy;
-                            
-                            let modeColor = currentMode === 'INITIAL' ? '#ff9800' : '#4caf50';
-                            let modeIcon = currentMode === 'INITIAL' ? '🔍' : '🔧';
-                            
-                            document.getElementById('strategy-info').innerHTML = 
-                                '<p><strong>Current Mode:</strong> <span style="color: ' + modeColor + '">' + modeIcon + ' ' + currentMode + '</span></p>' +
-                                '<p><strong>Progress:</strong> ' + currentCount + '/' + targetCount + ' proxy (' + Math.round(currentCount/targetCount*100) + '%)</p>' +
-                                '<hr>' +
-                                '<p><strong>' + currentMode + ' Strategy:</strong></p>' +
-                                '<p style="font-size: 0.9em; opacity: 0.9">' + strategy[currentMode + '_MODE'].description + '</p>' +
-                                '<ul style="font-size: 0.8em; margin: 5px 0;">' +
-                                strategy[currentMode + '_MODE'].steps.map(step => '<li>' + step + '</li>').join('') +
-                                '</ul>' +
-                                '<p style="font-size: 0.8em; color: #888;"><strong>Fallback:</strong> ' + 
-                                (currentMode === 'INITIAL' ? strategy.INITIAL_MODE.fallback : strategy.MAINTENANCE_MODE.cycle) + '</p>';
-                        }} else {{
-                            document.getElementById('strategy-info').innerHTML = '<p style="color: red;">Error loading strategy</p>';
-                        }}
-                    }})
-                    .catch(e => {{
-                        document.getElementById('strategy-info').innerHTML = '<p style="color: red;">Strategy unavailable</p>';
-                    }});
+            function renderSystem(startup) {{
+                document.getElementById('system-info').innerHTML = 
+                    '<p><strong>Khởi tạo:</strong> ' + (startup.initialized ? '✅' : '❌') + '</p>' +
+                    '<p><strong>Background Thread:</strong> ' + (startup.background_thread_started ? '✅' : '❌') + '</p>' +
+                    '<p><strong>First Fetch:</strong> ' + (startup.first_fetch_completed ? '✅' : '❌') + '</p>' +
+                    '<p><strong>Errors:</strong> ' + startup.error_count + '</p>' +
+                    '<p><strong>Hoạt động cuối:</strong> ' + (startup.last_activity ? new Date(startup.last_activity).toLocaleTimeString() : 'N/A') + '</p>';
             }}
             
-            function updateResurrection() {{
-                fetch('/api/resurrection/stats')
-                    .then(response => response.json())
-                    .then(data => {{
-                        if (data.success) {{
-                            const summary = data.summary;
-                            const deadCategories = data.dead_categories;
-                            
-                            let resurrectStatus = '⚰️ No Activity';
-                            let resurrectColor = '#888';
-                            
-                            if (summary.total_successfully_resurrected > 0) {{
-                                resurrectStatus = '🎉 ' + summary.total_successfully_resurrected + ' Resurrected (' + summary.resurrection_success_rate + '%)';
-                                resurrectColor = '#4caf50';
-                            }} else if (summary.total_resurrection_attempts > 0) {{
-                                resurrectStatus = '⏳ ' + summary.total_resurrection_attempts + ' Attempts';
-                                resurrectColor = '#ff9800';
-                            }}
-                            
-                            document.getElementById('resurrection-info').innerHTML = 
-                                '<p><strong>Status:</strong> <span style="color: ' + resurrectColor + '">' + resurrectStatus + '</span></p>' +
-                                '<p><strong>Dead Tracked:</strong> ' + summary.total_dead_tracked + ' proxy</p>' +
-                                '<hr>' +
-                                '<p><strong>Dead Categories:</strong></p>' +
-                                '<ul style="font-size: 0.8em; margin: 5px 0;">' +
-                                '<li>🔄 Immediate: ' + deadCategories.immediate_retry.count + '</li>' +
-                                '<li>⏳ Short (5min): ' + deadCategories.short_delay.count + '</li>' +
-                                '<li>⏰ Medium (30min): ' + deadCategories.medium_delay.count + '</li>' +
-                                '<li>🕐 Long (2h): ' + deadCategories.long_delay.count + '</li>' +
-                                '<li>⚰️ Permanent: ' + deadCategories.permanent_dead.count + '</li>' +
-                                '</ul>' +
-                                '<p style="font-size: 0.8em; color: #888;">Dead proxy có cơ hội comeback với exponential backoff</p>';
-                        }} else {{
-                            document.getElementById('resurrection-info').innerHTML = '<p style="color: red;">Resurrection system error</p>';
-                        }}
-                    }})
-                    .catch(e => {{
-                        document.getElementById('resurrection-info').innerHTML = '<p style="color: red;">Resurrection unavailable</p>';
-                    }});
+            function renderStrategy(data) {{
+                if (data.success) {{
+                    const currentMode = data.current_mode;
+                    const currentCount = data.current_proxy_count;
+                    const targetCount = data.target_proxy_count;
+                    const strategy = data.strategy;
+                    
+                    let modeColor = currentMode === 'INITIAL' ? '#ff9800' : '#4caf50';
+                    let modeIcon = currentMode === 'INITIAL' ? '🔍' : '🔧';
+                    
+                    document.getElementById('strategy-info').innerHTML = 
+                        '<p><strong>Current Mode:</strong> <span style="color: ' + modeColor + '">' + modeIcon + ' ' + currentMode + '</span></p>' +
+                        '<p><strong>Progress:</strong> ' + currentCount + '/' + targetCount + ' proxy (' + Math.round(currentCount/targetCount*100) + '%)</p>' +
+                        '<hr>' +
+                        '<p><strong>' + currentMode + ' Strategy:</strong></p>' +
+                        '<p style="font-size: 0.9em; opacity: 0.9">' + strategy[currentMode + '_MODE'].description + '</p>' +
+                        '<ul style="font-size: 0.8em; margin: 5px 0;">' +
+                        strategy[currentMode + '_MODE'].steps.map(step => '<li>' + step + '</li>').join('') +
+                        '</ul>' +
+                        '<p style="font-size: 0.8em; color: #888;"><strong>Fallback:</strong> ' + 
+                        (currentMode === 'INITIAL' ? strategy.INITIAL_MODE.fallback : strategy.MAINTENANCE_MODE.cycle) + '</p>';
+                }} else {{
+                    document.getElementById('strategy-info').innerHTML = '<p style="color: red;">Error loading strategy</p>';
+                }}
+            }}
+            
+            function renderResurrection(data) {{
+                if (data.success) {{
+                    const summary = data.summary;
+                    const deadCategories = data.dead_categories;
+                    
+                    let resurrectStatus = '⚰️ No Activity';
+                    let resurrectColor = '#888';
+                    
+                    if (summary.total_successfully_resurrected > 0) {{
+                        resurrectStatus = '🎉 ' + summary.total_successfully_resurrected + ' Resurrected (' + summary.resurrection_success_rate + '%)';
+                        resurrectColor = '#4caf50';
+                    }} else if (summary.total_resurrection_attempts > 0) {{
+                        resurrectStatus = '⏳ ' + summary.total_resurrection_attempts + ' Attempts';
+                        resurrectColor = '#ff9800';
+                    }}
+                    
+                    document.getElementById('resurrection-info').innerHTML = 
+                        '<p><strong>Status:</strong> <span style="color: ' + resurrectColor + '">' + resurrectStatus + '</span></p>' +
+                        '<p><strong>Dead Tracked:</strong> ' + summary.total_dead_tracked + ' proxy</p>' +
+                        '<hr>' +
+                        '<p><strong>Dead Categories:</strong></p>' +
+                        '<ul style="font-size: 0.8em; margin: 5px 0;">' +
+                        '<li>🔄 Immediate: ' + deadCategories.immediate_retry.count + '</li>' +
+                        '<li>⏳ Short (5min): ' + deadCategories.short_delay.count + '</li>' +
+                        '<li>⏰ Medium (30min): ' + deadCategories.medium_delay.count + '</li>' +
+                        '<li>🕐 Long (2h): ' + deadCategories.long_delay.count + '</li>' +
+                        '<li>⚰️ Permanent: ' + deadCategories.permanent_dead.count + '</li>' +
+                        '</ul>' +
+                        '<p style="font-size: 0.8em; color: #888;">Dead proxy có cơ hội comeback với exponential backoff</p>';
+                }} else {{
+                    document.getElementById('resurrection-info').innerHTML = '<p style="color: red;">Resurrection system error</p>';
+                }}
+            }}
+            
+            const streamHandlers = {{
+                logs: renderLogs,
+                stats: renderStats,
+                system: renderSystem,
+                strategy: renderStrategy,
+                resurrection: renderResurrection
+            }};
+            
+            function startPolling() {{
+                // Fallback (stream đầy / không có EventSource): 1 request coalesced thay cho 4 polling loops,
+                // đọc cùng event log của broadcaster theo cursor (server cache response theo cursor)
+                const streamStatus = document.getElementById('stream-status');
+                let cursor = null;
+                function poll() {{
+                    fetch('/api/stream/poll' + (cursor === null ? '' : '?after=' + cursor))
+                        .then(response => response.json())
+                        .then(data => {{
+                            data.events.forEach(event => streamHandlers[event.channel](event.data));
+                            cursor = data.seq;
+                            streamStatus.textContent = '🔄 Polling (1 request / {DASHBOARD_POLL_INTERVAL}s)';
+                        }})
+                        .catch(e => {{ streamStatus.textContent = '⚠️ Mất kết nối - đang thử lại...'; }})
+                        .finally(() => setTimeout(poll, {DASHBOARD_POLL_INTERVAL * 1000}));
+                }}
+                poll();
+            }}
+            
+            function startStream() {{
+                // 1 SSE connection thay cho 4 polling loops - server push khi data đổi, EventSource tự reconnect
+                const streamStatus = document.getElementById('stream-status');
+                const source = new EventSource('/api/stream');
+                Object.keys(streamHandlers).forEach(channel => {{
+                    source.addEventListener(channel, event => streamHandlers[channel](JSON.parse(event.data)));
+                }});
+                source.onopen = () => {{ streamStatus.textContent = '📡 Live (Server-Sent Events)'; }};
+                source.onerror = () => {{
+                    if (source.readyState === EventSource.CLOSED) {{
+                        // Server từ chối stream (503 - hết slot) → EventSource không reconnect, chuyển sang polling
+                        source.close();
+                        streamStatus.textContent = '🔄 Stream đầy - dùng polling';
+                        startPolling();
+                        return;
+                    }}
+                    streamStatus.textContent = '⚠️ Mất kết nối stream - đang reconnect...';
+                }};
             }}
             
-            // Update every 5 seconds
-            updateStats();
-            updateLogs();
-            updateStrategy();
-            updateResurrection();
-            setInterval(updateStats, 5000);
-            setInterval(updateLogs, 3000);  // Logs update faster
-            setInterval(updateStrategy, 10000);  // Strategy update every 10s
-            setInterval(updateResurrection, 15000);  // Resurrection update every 15s
+            if (window.EventSource) {{
+                startStream();
+            }} else {{
+                startPolling();
+            }}
         </script>
     </body>
     </html>
     """
-    return html
+    return html
+
+@app.route('/api/logs', methods=['GET'])
+def get_logs():
+    """API để lấy real-time logs. ?after=<seq> → chỉ entries mới (level filter, long-poll với wait)"""
+    try:
+        # REMOVED: Bỏ log không cần thiết
+        
+        after = request.args.get('after')
+        if after is None:
+            # Return recent logs
+            recent_logs = list(log_buffer)[-100:]  # Last 100 logs
+            
+            return jsonify({
+                'success': True,
+                'logs': recent_logs,
+                'total_logs': len(log_buffer),
+                'next_after': recent_logs[-1]['seq'] if recent_logs else 0,
+                'startup': startup_status,
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        after = int(after)
+        limit = int(request.args.get('limit', 100))
+        wait = float(request.args.get('wait', 0))
+        if after < 0:
+            raise ValueError("after must be >= 0")
+        if not 1 <= limit <= LOG_TAIL_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {LOG_TAIL_MAX_LIMIT}")
+        wait = max(0.0, min(wait, LOG_TAIL_MAX_WAIT))
+        levels = {level.strip().upper() for level in request.args.get('level', '').split(',') if level.strip()}
+        
+        entries, next_after, truncated = wait_for_logs(after, levels or None, limit, wait)
+        
+        result = {
+            'success': True,
+            'logs': entries,
+            'next_after': next_after,
+            'truncated': truncated,
+            'timestamp': datetime.now().isoformat()
+        }
+        if parse_bool_param(request.args, 'include_startup'):
+            result['startup'] = startup_status
+        return jsonify(result)
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/stream', methods=['GET'])
+def get_dashboard_stream():
+    """Server-Sent Events cho dashboard: logs + stats/strategy/resurrection, chỉ push khi đổi"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    # Relay từ follower (qua loopback control port) đã giữ slot bên follower, không chiếm gthread của owner
+    via_control_port = request.environ.get("SERVER_PORT") == str(process_role["control_port"])
+    if not via_control_port and not acquire_dashboard_stream_slot():
+        return dashboard_stream_busy_response()
+    
+    start_dashboard_stream()
+    response = Response(dashboard_stream_events(last_event_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Reverse proxy không buffer stream
+    })
+    if not via_control_port:
+        response.call_on_close(release_dashboard_stream_slot)
+    return response
+
+@app.route('/api/stream/poll', methods=['GET'])
+def poll_dashboard_stream():
+    """Dashboard fallback khi không stream được: events broadcaster đã build sau ?after=<seq> (1 request thay 4 loops)"""
+    try:
+        after = request.args.get('after')
+        after = int(after) if after else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'after must be an integer'
+        }), 400
+    
+    start_dashboard_stream()
+    cache_key, build = poll_dashboard_events(after)
+    # Viewers cùng cursor dùng chung 1 lần encode; max_age giới hạn logs ban đầu của reset response
+    return cached_response(cache_key, build, max_age=DASHBOARD_STREAM_TICK)
+
+@app.route('/api/proxy/alive', methods=['GET'])
+def get_alive_proxies_ultra_smart():
+    """ULTRA SMART API - Multi-tier proxy serving với guarantee >500 proxy"""
+    try:
+        count = int(request.args.get('count', 50))
+        order = request.args.get('order', 'rotate')  # rotate (spread load) hoặc fastest
+        filters = parse_proxy_filters(request.args)
+        distinct_egress = parse_bool_param(request.args, 'distinct_egress')
+        is_available = is_proxy_servable
+        if distinct_egress:
+            # N proxy = N exit IP khác nhau (không phải N front-end của cùng 1 identity)
+            is_available = make_distinct_egress_filter(is_proxy_servable)
+            egress_stats["distinct_requests"] += 1
+        
+        # Use ULTRA SMART serving algorithm - proxies và summary từ cùng 1 snapshot
+        snapshot = pool_snapshot
+        pools_summary = snapshot['summary']
+        
+        def after_serve(served):
+            """Side effects của 1 lần serve (build hoặc cache hit): served counter + emergency refill khi thiếu"""
+            record_served(served)
+            if served < count and not filters:  # Filter hẹp thiếu proxy ≠ pools cạn
+                trigger_emergency_mode("insufficient_proxy")
+        
+        def build_response():
+            if filters:
+                # Filtered serving từ secondary indexes - không linear scan pool
+                result_proxies, _ = query_proxies(snapshot, count, filters, order=order, is_available=is_available)
+                sorted_proxies = result_proxies if order == 'fastest' else sorted(result_proxies, key=proxy_speed_of)
+                after_serve(len(sorted_proxies))
+            elif order == 'fastest':
+                # Fastest N từ speed index - O(N log T), không sort pool
+                sorted_proxies = get_fastest_proxies(snapshot, count, is_available=is_available)
+                after_serve(len(sorted_proxies))
+            else:
+                result_proxies = smart_proxy_request(count, snapshot, is_available=is_available)
+                # Sort by speed (fastest first) - chỉ sort N proxy được serve
+                sorted_proxies = sorted(result_proxies, key=proxy_speed_of)
+            
+            return {
+                'success': True,
+                'system': 'ULTRA_SMART_MULTI_TIER',
+                'guarantee_status': pools_summary['GUARANTEED'],
+                'total_available_all_tiers': pools_summary['TOTAL_AVAILABLE'],
+                'returned_count': len(sorted_proxies),
+                'requested_count': count,
+                'order': order,
+                'distinct_egress': distinct_egress,
+                'filters': {
+                    name: sorted(value) if isinstance(value, set) else value
+                    for name, value in (filters or {}).items()
+                },
+                'proxies': sorted_proxies,
+                'pool_breakdown': {
+                    'PRIMARY': pools_summary['PRIMARY'],
+                    'STANDBY': pools_summary['STANDBY'], 
+                    'EMERGENCY': pools_summary['EMERGENCY'],
+                    'FRESH': pools_summary['FRESH'],
+                    'CLUSTER': pools_summary['CLUSTER']
+                },
+                'serving_tiers_used': 'auto_detected_from_logs',
+                'pool_version': snapshot['version'],
+                'last_update': pool_stats.get('last_update'),
+                'timestamp': datetime.now().isoformat(),
+                'total_served_today': pool_stats.get('total_served', 0),
+                'minimum_guaranteed': MINIMUM_GUARANTEED
+            }
+        
+        expire_leases()
+        if order == 'fastest':
+            # Deterministic theo (params, pool version, exclusive leases) → serve bytes đã encode.
+            # Follower leases hết hạn theo thời gian (không event) → expiry gần nhất nằm trong key
+            cache_key = ('alive', tuple(sorted(request.args.items(multi=True))),
+                         snapshot['version'], lease_stats['exclusive_changes'], next_shared_exclusive_expiry())
+            return cached_response(cache_key, build_response, on_hit=after_serve)
+        # Rotate: mỗi request 1 lát khác của pool (fair rotation) → không cache
+        return jsonify(build_response())
+        
+    except ValueError as e:
+        # Invalid count/filter params
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        log_to_render(f"❌ API ERROR: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'fallback': 'multi_tier_system_error'
+        }), 500
+
+@app.route('/api/proxy/changes', methods=['GET'])
+def get_proxy_changes():
+    """Delta feed - chỉ proxy added/removed kể từ `since` (pool_version lần poll trước)"""
+    try:
+        since = request.args.get('since')
+        if since is None:
+            raise ValueError("since is required (pool_version từ lần poll trước, 0 cho lần đầu)")
+        since = int(since)
+        if since < 0:
+            raise ValueError("since must be >= 0")
+
+        changes = get_pool_changes(since, epoch=request.args.get('epoch'))
+
+        return jsonify({
+            'success': True,
+            **changes,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        log_to_render(f"❌ CHANGES API ERROR: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/proxy/checkout', methods=['POST'])
+def checkout_proxy_lease():
+    """Lease API - checkout proxy với TTL (shared hoặc exclusive)"""
+    try:
+        params = request.get_json(silent=True) or request.args
+        count = int(params.get('count', 50))
+        ttl = int(params.get('ttl', LEASE_DEFAULT_TTL))
+        mode = params.get('mode', 'shared')
+        distinct_egress = parse_bool_param(params, 'distinct_egress')
+        
+        lease = checkout_proxies(count, ttl=ttl, mode=mode, distinct_egress=distinct_egress)
+        
+        return jsonify({
+            'success': True,
+            'lease_id': lease['lease_id'],
+            'mode': lease['mode'],
+            'distinct_egress': distinct_egress,
+            'ttl': lease['ttl'],
+            'expires_at': lease['expires_at'],
+            'requested_count': count,
+            'returned_count': len(lease['proxies']),
+            'proxies': lease['proxies'],
+            'served_from': lease['served_from'],
+            'pool_version': lease['pool_version'],
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        log_to_render(f"❌ LEASE CHECKOUT ERROR: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/proxy/release', methods=['POST'])
+def release_proxy_lease():
+    """Release lease trước khi hết TTL"""
+    try:
+        params = request.get_json(silent=True) or request.args
+        lease_id = params.get('lease_id')
+        if not lease_id:
+            return jsonify({
+                'success': False,
+                'error': 'lease_id is required'
+            }), 400
+        
+        released = release_lease(lease_id)
+        
+        return jsonify({
+            'success': released,
+            'lease_id': lease_id,
+            'message': 'Lease released' if released else 'Lease not found (already released or expired)',
+            'timestamp': datetime.now().isoformat()
+        }), 200 if released else 404
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/proxy/leases', methods=['GET'])
+def get_proxy_leases():
+    """Lease statistics"""
+    try:
+        return jsonify({
+            'success': True,
+            'leases': get_lease_summary(),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def build_proxy_stats():
+    """Payload của /api/proxy/stats (cũng push qua dashboard stream)"""
+    # REMOVED: Bỏ debug logs không cần thiết
+    
+    last_update = proxy_cache.get('last_update')
+    cache_age_minutes = 0
+    
+    if last_update:
+        last_update_dt = datetime.fromisoformat(last_update)
+        cache_age_minutes = int((datetime.now() - last_update_dt).total_seconds() / 60)
+    
+    # Get from cache - now properly updated
+    total_checked = proxy_cache.get('total_checked', 0)
+    alive_count = proxy_cache.get('alive_count', 0)
+    success_rate = round(alive_count / total_checked * 100, 2) if total_checked > 0 else 0
+    
+    # Count total sources
+    total_sources = len(PROXY_SOURCE_LINKS["categorized"]) + len(PROXY_SOURCE_LINKS["mixed"])
+    
+    # REMOVED: Bỏ debug logs chi tiết
+    
+    return {
+        'success': True,
+        'alive_count': alive_count,
+        'total_checked': total_checked,
+        'success_rate': success_rate,
+        'target_live_proxies': TARGET_LIVE_PROXIES,
+        'target_progress': round(alive_count / TARGET_LIVE_PROXIES * 100, 1) if TARGET_LIVE_PROXIES > 0 else 0,
+        'target_achieved': startup_status.get('target_achieved', False),
+        'last_update': last_update,
+        'cache_age_minutes': cache_age_minutes,
+        'sources_count': total_sources,
+        'sources_processed': proxy_cache.get('sources_processed', 0),
+        'categorized_sources': list(PROXY_SOURCE_LINKS["categorized"].keys()),
+        'mixed_sources': list(PROXY_SOURCE_LINKS["mixed"].keys()),
+        'service_status': 'render_free_optimized_target_1000',
+        'check_interval': '10 minutes',
+        'timeout_setting': '6 seconds',
+        'max_workers': 15,
+        'processing_mode': 'TARGET_1000_PROXY_MODE',
+        'chunk_size': 500,
+        'render_plan': 'free_512mb'
+    }
+
+@app.route('/api/proxy/stats', methods=['GET'])
+def get_proxy_stats():
+    """API thống kê proxy với thông tin chi tiết"""
+    try:
+        return jsonify(build_proxy_stats())
+        
+    except Exception as e:
+        log_to_render(f"❌ Lỗi API stats: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def build_ultra_smart_stats():
+    """Payload của /api/ultra/stats (cache theo pool version, tối đa RESPONSE_CACHE_STATS_TTL)"""
+    pools_summary = get_pool_summary()
+    
+    # Calculate comprehensive stats
+    total_available = pools_summary['TOTAL_AVAILABLE']
+    guarantee_status = pools_summary['GUARANTEED']
+    
+    # Target calculation với new system
+    target_total = sum(TARGET_POOLS.values())  # 1700 total proxy across all pools
+    target_progress = round(total_available / target_total * 100, 1) if total_available > 0 else 0
+    
+    # System health assessment
+    health_status = "EXCELLENT" if guarantee_status else "NEEDS_ATTENTION"
+    if total_available >= target_total:
+        health_status = "OPTIMAL"
+    elif total_available >= MINIMUM_GUARANTEED * 2:
+        health_status = "GOOD"
+    
+    last_update = pool_stats.get('last_update')
+    cache_age_minutes = 0
+    if last_update:
+        try:
+            last_update_dt = datetime.fromisoformat(last_update)
+            cache_age_minutes = int((datetime.now() - last_update_dt).total_seconds() / 60)
+        except:
+            cache_age_minutes = 0
+    
+    # Worker status
+    workers_active = {
+        'continuous_fetch': worker_control['continuous_fetch_active'],
+        'rolling_validation': worker_control['rolling_validation_active'],
+        'pool_balancer': worker_control['pool_balancer_active'],
+        'resurrection_manager': worker_control.get('resurrection_active', True),
+        'emergency_mode': worker_control['emergency_mode']
+    }
+    
+    # Dead proxy resurrection statistics
+    resurrection_stats = pool_stats.get("resurrection_stats", {})
+    dead_categories_count = get_dead_category_counts()
+    
+    return {
+        'success': True,
+        'system': 'ULTRA_SMART_MULTI_TIER',
+        'health_status': health_status,
+        'guarantee_status': guarantee_status,
+        'total_available': total_available,
+        'minimum_guaranteed': MINIMUM_GUARANTEED,
+        'pools': {
+            'PRIMARY': {
+                'count': pools_summary['PRIMARY'],
+                'target': TARGET_POOLS['PRIMARY'],
+                'percentage': round(pools_summary['PRIMARY'] / TARGET_POOLS['PRIMARY'] * 100, 1) if TARGET_POOLS['PRIMARY'] > 0 else 0
+            },
+            'STANDBY': {
+                'count': pools_summary['STANDBY'],
+                'target': TARGET_POOLS['STANDBY'],
+                'percentage': round(pools_summary['STANDBY'] / TARGET_POOLS['STANDBY'] * 100, 1) if TARGET_POOLS['STANDBY'] > 0 else 0
+            },
+            'EMERGENCY': {
+                'count': pools_summary['EMERGENCY'],
+                'target': TARGET_POOLS['EMERGENCY'],
+                'percentage': round(pools_summary['EMERGENCY'] / TARGET_POOLS['EMERGENCY'] * 100, 1) if TARGET_POOLS['EMERGENCY'] > 0 else 0
+            },
+            'FRESH': {
+                'count': pools_summary['FRESH'],
+                'status': 'processing_continuously'
+            }
+        },
+        'workers': workers_active,
+        'performance': {
+            'total_served_today': pool_stats.get('total_served', 0),
+            'last_update': last_update,
+            'cache_age_minutes': cache_age_minutes
+        },
+        'membership': get_membership_summary(),
+        'egress': get_egress_summary(),
+        'change_feed': get_change_feed_summary(),
+        'response_cache': get_response_cache_summary(),
+        'dashboard_stream': get_dashboard_stream_summary(),
+        'logging': get_logging_summary(),
+        'warm_start': get_warm_start_summary(),
+        'history': get_history_summary(),
+        'process': get_process_summary(),
+        'cluster': get_cluster_summary(),
+        'scheduler': get_scheduler_summary(),
+        'admission': get_admission_summary(),
+        'subnets': get_subnet_summary(),
+        'maintenance': {
+            'staleness_sla_seconds': MAINTENANCE_STALENESS_SLA,
+            'sla_met': (pool_stats['maintenance_stats']['oldest_checked_age_seconds'] or 0) <= MAINTENANCE_STALENESS_SLA,
+            **pool_stats['maintenance_stats']
+        },
+        'targets': {
+            'total_target': target_total,
+            'target_progress': target_progress,
+            'target_achieved': total_available >= target_total
+        },
+        'sources_info': {
+            'total_sources': len(PROXY_SOURCE_LINKS["categorized"]) + len(PROXY_SOURCE_LINKS["mixed"]),
+            'categorized_sources': len(PROXY_SOURCE_LINKS["categorized"]),
+            'mixed_sources': len(PROXY_SOURCE_LINKS["mixed"])
+        },
+        'resurrection_system': {
+            'stats': resurrection_stats,
+            'dead_categories': dead_categories_count,
+            'total_dead_tracked': sum(dead_categories_count.values()),
+            'resurrection_enabled': True,
+            'delays': RESURRECTION_DELAYS
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+@app.route('/api/ultra/stats', methods=['GET'])
+def get_ultra_smart_stats():
+    """ULTRA SMART Stats API - Multi-tier system statistics"""
+    try:
+        return cached_response(('ultra_stats', pool_snapshot['version']), build_ultra_smart_stats,
+                               max_age=RESPONSE_CACHE_STATS_TTL)
+        
+    except Exception as e:
+        log_to_render(f"❌ ULTRA SMART Stats API Error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'system': 'ULTRA_SMART_MULTI_TIER'
+        }), 500
+
+@app.route('/api/proxies', methods=['GET'])
+def get_proxies_simple():
+    """API đơn giản để lấy proxy sống - cho tool sử dụng"""
+    try:
+        count = int(request.args.get('count', 100))
+        format_type = request.args.get('format', 'json')  # json hoặc text
+        
+        # Lấy từ serving tiers (snapshot) thay vì legacy cache - không lock, không sort
+        snapshot = pool_snapshot
+        total_available = snapshot['summary']['TOTAL_AVAILABLE']
+        
+        def build_response():
+            if total_available == 0:
+                # REMOVED: Bỏ debug log không cần thiết
+                return {
+                    'success': False,
+                    'message': 'No live proxies available yet. Service is still validating.',
+                    'count': 0,
+                    'proxies': [],
+                    'cache_status': 'empty'
+                }
+            
+            # Fastest N từ speed index (đã sorted sẵn)
+            sorted_proxies = get_fastest_proxies(snapshot, count)
+            
+            if format_type == 'text':
+                # Format text: host:port per line
+                return '\n'.join(f"{p['host']}:{p['port']}" for p in sorted_proxies)
+            
+            # Format JSON (default)
+            return {
+                'success': True,
+                'count': len(sorted_proxies),
+                'total_available': total_available,
+                'proxies': [
+                    {
+                        'host': p['host'],
+                        'port': p['port'],
+                        'type': p['type'],
+                        'speed': p['speed'],
+                        'proxy': f"{p['host']}:{p['port']}"
+                    } for p in sorted_proxies
+                ],
+                'last_update': snapshot['published_at']
+            }
+        
+        return cached_response(('proxies', count, format_type, snapshot['version']), build_response)
+        
+    except Exception as e:
+        log_to_render(f"❌ API /proxies error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/debug', methods=['GET'])
+def debug_cache():
+    """Debug cache để kiểm tra vấn đề"""
+    # REMOVED: Bỏ log debug không cần thiết
+    
+    return jsonify({
+        'process_id': os.getpid(),
+        'proxy_cache': proxy_cache,
+        'cache_http_length': len(proxy_cache.get('http', [])),
+        'cache_alive_count': proxy_cache.get('alive_count', 0),
+        'cache_total_checked': proxy_cache.get('total_checked', 0),
+        'startup_status': startup_status,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """Health check endpoint để test service"""
+    # REMOVED: Bỏ log không cần thiết
+    
+    # Tính toán một số metrics hữu ích
+    alive_count = len(proxy_cache.get('http', []))
+    total_checked = proxy_cache.get('total_checked', 0)
+    success_rate = round(alive_count/total_checked*100, 1) if total_checked > 0 else 0
+    
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'cache_count': alive_count,
+        'service': 'proxy-validation-render',
+        'startup_status': startup_status,
+        'process': get_process_summary(),
+        'metrics': {
+            'alive_proxies': alive_count,
+            'total_checked': total_checked,
+            'success_rate_percent': success_rate,
+            'last_update': proxy_cache.get('last_update', 'Never')
+        },
+        'fixed_bugs': [
+            'Loop bug fixed - no more restart from chunk 1',
+            'Condition fixed - completes after all chunks processed'
+        ]
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint (text format 0.0.4) - không cache, chỉ đọc counters + snapshot"""
+    return Response(build_metrics_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/force/initial', methods=['POST'])
+def force_initial_mode():
+    """Force chạy fetch job ngay (thay cho legacy INITIAL mode)"""
+    try:
+        log_to_render("🔄 API TRIGGER: Force fetch job requested")
+        wake_job("fetch", "api_force")
+        
+        return jsonify({
+            'success': True,
+            'message': 'Fetch job scheduled to run now',
+            'note': 'Fetch min interval still applies',
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/ultra/demo', methods=['GET'])
+def ultra_smart_demo():
+    """DEMO endpoint để show off ULTRA SMART capabilities"""
+    try:
+        log_to_render("🎯 ULTRA SMART DEMO requested!")
+        
+        # Get current pools status
+        pools_summary = get_pool_summary()
+        
+        # Simulate smart request
+        demo_request_count = int(request.args.get('count', 100))
+        demo_proxies = smart_proxy_request(demo_request_count)
+        
+        return jsonify({
+            'demo': 'ULTRA_SMART_MULTI_TIER_SYSTEM',
+            'guarantee': f"ALWAYS ≥{MINIMUM_GUARANTEED} proxy ready",
+            'request_demo': {
+                'requested': demo_request_count,
+                'delivered': len(demo_proxies),
+                'delivery_rate': round(len(demo_proxies)/demo_request_count*100, 1) if demo_request_count > 0 else 0
+            },
+            'current_pools': pools_summary,
+            'architecture': {
+                'PRIMARY': f"Ready-to-use pool ({TARGET_POOLS['PRIMARY']} target)",
+                'STANDBY': f"Backup pool ({TARGET_POOLS['STANDBY']} target)", 
+                'EMERGENCY': f"Emergency pool ({TARGET_POOLS['EMERGENCY']} target)",
+                'FRESH': "Continuous fetching pipeline"
+            },
+            'workers': {
+                'worker1': 'Continuous fetch từ sources (24/7)',
+                'worker2': 'Rolling validation FRESH→STANDBY→PRIMARY',
+                'worker3': 'Auto pool balancing và promotion'
+            },
+            'benefits': [
+                'Zero downtime: Luôn có proxy ready',
+                'Multi-tier fallback: PRIMARY→STANDBY→EMERGENCY',
+                'Continuous operation: Không bao giờ dừng fetch',
+                'Smart balancing: Auto promote pools',
+                'Guarantee: >500 proxy lúc nào cũng sẵn sàng'
+            ],
+            'vs_old_system': {
+                'old': 'Single pool, maintenance gaps, periodic fetch',
+                'new': 'Multi-tier, zero gaps, continuous operation'
+            },
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'demo': 'ERROR',
+            'error': str(e)
+        }), 500
+
+@app.route('/api/history/reliable', methods=['GET'])
+def get_reliable_proxies():
+    """Proxy có uptime ≥ min_uptime trong `hours` giờ gần nhất (từ history store)"""
+    try:
+        min_uptime = float(request.args.get('min_uptime', 0.9))
+        hours = int(request.args.get('hours', 24))
+        min_checks = int(request.args.get('min_checks', 3))
+        limit = int(request.args.get('limit', 100))
+        if not 0 <= min_uptime <= 1 or hours <= 0 or limit <= 0:
+            raise ValueError("min_uptime must be in [0, 1], hours and limit must be > 0")
+        
+        proxies = query_reliable_proxies(min_uptime, hours, min_checks, limit)
+        return jsonify({
+            'success': True,
+            'min_uptime': min_uptime,
+            'window_hours': hours,
+            'min_checks': min_checks,
+            'count': len(proxies),
+            'proxies': proxies,
+            'timestamp': datetime.now().isoformat()
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        log_to_render(f"❌ HISTORY API ERROR: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/history/proxy/<proxy_key>', methods=['GET'])
+def get_proxy_history_api(proxy_key):
+    """Uptime/latency trend + first seen của 1 proxy (host:port)"""
+    try:
+        hours = int(request.args.get('hours', 24))
+        return jsonify({
+            'success': True,
+            **get_proxy_history(proxy_key, hours),
+            'timestamp': datetime.now().isoformat()
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        log_to_render(f"❌ HISTORY API ERROR: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def reject_cluster_request():
+    """404 khi cluster mode tắt, 403 khi sai X-Cluster-Secret. None = request từ peer hợp lệ"""
+    if not CLUSTER_ENABLED:
+        return jsonify({
+            'success': False,
+            'error': 'Not found'
+        }), 404
+    if not hmac.compare_digest(request.headers.get('X-Cluster-Secret', '').encode(), CLUSTER_SECRET.encode()):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid cluster secret'
+        }), 403
+    return None
+
+@app.route('/api/cluster/state', methods=['GET'])
+def get_cluster_state():
+    """Cluster peer sync: local tiers của node này (unchanged nếu local_version == since)"""
+    rejected = reject_cluster_request()
+    if rejected:
+        return rejected
+    snapshot = pool_snapshot
+    since = request.args.get('since')
+    if since is not None and since == str(snapshot['local_version']):
+        return jsonify({
+            'success': True,
+            'node': CLUSTER_SELF,
+            'local_version': snapshot['local_version'],
+            'unchanged': True
+        })
+    return jsonify({
+        'success': True,
+        'node': CLUSTER_SELF,
+        'local_version': snapshot['local_version'],
+        'unchanged': False,
+        'proxies': [p for tier_name in SERVING_TIERS for p in snapshot['pools'][tier_name]]
+    })
+
+@app.route('/api/cluster/candidates', methods=['POST'])
+def post_cluster_candidates():
+    """Leader push shard candidates cho node này"""
+    rejected = reject_cluster_request()
+    if rejected:
+        return rejected
+    try:
+        data = request.get_json(silent=True) or {}
+        candidates = data.get('candidates')
+        if not isinstance(candidates, list):
+            raise ValueError("candidates must be a list")
+        admitted = receive_candidates(candidates, data.get('sources'))
+        return jsonify({
+            'success': True,
+            'received': len(candidates),
+            'admitted': admitted
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        log_to_render(f"❌ CLUSTER CANDIDATES ERROR: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/cluster/status', methods=['GET'])
+def get_cluster_status():
+    """Cluster mode: ring, leader, peers, CLUSTER pool size"""
+    return jsonify({
+        'success': True,
+        'cluster': get_cluster_summary(),
+        'pool_version': pool_snapshot['version'],
+        'timestamp': datetime.now().isoformat()
+    })
+
+def build_resurrection_stats():
+    """Payload của /api/resurrection/stats (cache theo pool version, tối đa RESPONSE_CACHE_STATS_TTL)"""
+    # Detailed resurrection statistics
+    resurrection_stats = pool_stats.get("resurrection_stats", {})
+    
+    # Dead categories với detailed info
+    dead_categories_detailed = {}
+    total_dead_tracked = 0
+    category_counts = get_dead_category_counts()
+    upcoming = get_upcoming_resurrections()
+    
+    for category in DEAD_CATEGORIES:
+        count = category_counts[category]
+        total_dead_tracked += count
+        
+        # Time until next retry (heap order, sớm nhất trước)
+        next_retries = [
+            {key: item[key] for key in ('proxy', 'retry_in_seconds', 'retry_in_minutes', 'failure_count')}
+            for item in upcoming if item['category'] == category
+        ]
+        
+        dead_categories_detailed[category] = {
+            'count': count,
+            'delay_minutes': RESURRECTION_DELAYS.get(category, 0) / 60,
+            'next_retries': next_retries[:3],  # Show top 3
+            'description': {
+                'immediate_retry': 'First death - retry immediately',
+                'short_delay': 'Second death - retry in 5 minutes',
+                'medium_delay': 'Third death - retry in 30 minutes', 
+                'long_delay': 'Fourth death - retry in 2 hours',
+                'permanent_dead': 'Fifth+ death - permanently blacklisted'
+            }.get(category, 'Unknown category')
+        }
+    
+    # Calculate resurrection success rate
+    total_attempts = resurrection_stats.get('resurrection_attempts', 0)
+    total_resurrected = resurrection_stats.get('total_resurrected', 0)
+    success_rate = round(total_resurrected / total_attempts * 100, 1) if total_attempts > 0 else 0
+    
+    # Recent resurrection activity
+    last_resurrection = resurrection_stats.get('last_resurrection')
+    resurrection_age = None
+    if last_resurrection:
+        try:
+            last_time = datetime.fromisoformat(last_resurrection)
+            resurrection_age = int((datetime.now() - last_time).total_seconds() / 60)
+        except:
+            resurrection_age = None
+    
+    return {
+        'success': True,
+        'resurrection_enabled': True,
+        'summary': {
+            'total_dead_tracked': total_dead_tracked,
+            'total_resurrection_attempts': total_attempts,
+            'total_successfully_resurrected': total_resurrected,
+            'resurrection_success_rate': success_rate,
+            'last_resurrection_minutes_ago': resurrection_age
+        },
+        'dead_categories': dead_categories_detailed,
+        'resurrection_logic': {
+            'exponential_backoff': True,
+            'max_attempts': RESURRECTION_DELAYS['permanent_threshold'],
+            'delays': {
+                'immediate': '0 minutes (next cycle)',
+                'short': '5 minutes',
+                'medium': '30 minutes',
+                'long': '2 hours',
+                'permanent': f'{BLACKLIST_TTL // 86400} days (blacklisted, persisted to disk)'
+            }
+        },
+        'blacklist': get_blacklist_summary(),
+        'failure_classes': get_failure_class_summary(),
+        'budget': {
+            **resurrection_budget,
+            'min_budget': RESURRECTION_MIN_BUDGET,
+            'max_budget': RESURRECTION_MAX_BUDGET,
+            'target_yield': RESURRECTION_TARGET_YIELD
+        },
+        'benefits': [
+            'Dead proxy có cơ hội comeback',
+            'Exponential backoff để tránh spam',
+            'Smart categorization theo failure count',
+            'Automatic resurrection attempts',
+            'Permanent blacklist cho hopeless cases'
+        ],
+        'worker_info': {
+            'worker4_active': worker_control.get('resurrection_active', True),
+            'check_interval': 'At earliest resurrection deadline (scheduler job)',
+            'resurrection_pool': 'STANDBY (validated proxy go back to STANDBY)'
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+@app.route('/api/resurrection/stats', methods=['GET'])
+def get_resurrection_stats():
+    """API chi tiết về resurrection system - Dead proxy comeback stats"""
+    try:
+        return cached_response(('resurrection_stats', pool_snapshot['version']), build_resurrection_stats,
+                               max_age=RESPONSE_CACHE_STATS_TTL)
+        
+    except Exception as e:
+        log_to_render(f"❌ Resurrection stats API error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'resurrection_enabled': True
+        }), 500
+
+@app.route('/api/force/accept', methods=['POST'])
+def force_accept_current():
+    """Force accept current proxy count và stop infinite loop"""
+    try:
+        global startup_status
+        
+        current_proxies = proxy_cache.get('http', [])
+        
+        log_to_render("🔒 API TRIGGER: Force accept current proxy count")
+        log_to_render(f"✅ ACCEPT {len(current_proxies)} proxy live (manual override)")
+        
+        with cache_lock:
+            startup_status["target_achieved"] = True
+            startup_status["existing_live_proxies"] = []
+        
+        return jsonify({
+            'success': True,
+            'message': f'Accepted {len(current_proxies)} proxies and stopped infinite loop',
+            'current_proxy_count': len(current_proxies),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# SMART DEAD PROXY RESURRECTION SYSTEM
+# Dead proxy có cơ hội comeback với intelligent retry
+# Enhanced pool statistics already defined above - no duplicate needed
+
+# DEAD proxy management với resurrection scheduling
+# Min-heap keyed by monotonic deadline: pull due candidates O(k log n), không parse/log per entry.
+DEAD_CATEGORIES = ["immediate_retry", "short_delay", "medium_delay", "long_delay", "permanent_dead"]
+RESURRECTION_BATCH_MAX = 500   # Số candidates tối đa cho 1 lần resurrection job
+
+dead_proxy_management = {
+    "heap": [],            # (deadline monotonic, seq, proxy_key) - lazy deletion qua seq
+    "pending": [],         # Cùng items nhưng chỉ những item chưa được đếm vào "due" (pop dần khi tới deadline)
+    "entries": {},         # proxy_key -> {"proxy_data", "failure_count", "category", "deadline", "seq", "last_failed", "due"}
+    "counts": {category: 0 for category in DEAD_CATEGORIES},
+    "due": 0,              # Số entries đã tới deadline nhưng chưa retry - update incremental
+    "changes": 0           # Tăng mỗi lần schedule / drop entry (warm start biết schedule đã đổi dù size giữ nguyên)
+}
+dead_proxy_seq = itertools.count()
+
+# Permanent blacklist (≥5 lần dead) - persist qua restart, check lúc ingestion
+PROXY_DATA_DIR = os.environ.get("PROXY_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+BLACKLIST_PATH = os.path.join(PROXY_DATA_DIR, "permanent_blacklist.bin")
+# Base file: count (u64) + keys (u64) + expires (u32), little-endian trên mọi platform.
+# PXBL2 thêm side table (keys không encode được: hostname, IPv6) = length (u64) + JSON {proxy_key: expires}
+BLACKLIST_MAGIC = b"PXBL2\n"
+BLACKLIST_LEGACY_MAGIC = b"PXBL1\n"  # Không có side table
+# Adds giữa 2 lần compact: append JSON lines [key | proxy_key, expires] (O(số adds mới) / save, không ghi lại base)
+BLACKLIST_JOURNAL_PATH = BLACKLIST_PATH + ".journal"
+BLACKLIST_EXPIRES_TYPECODE = next(code for code in ("I", "L") if array(code).itemsize == 4)  # 'I' không chắc 4 bytes
+BLACKLIST_TTL = 7 * 24 * 3600         # Permanent dead được thử lại sau 7 ngày
+BLACKLIST_MERGE_THRESHOLD = 1000      # Pending adds → merge vào sorted arrays (tối thiểu, scale theo size)
+BLACKLIST_COMPACT_RATIO = 0.5         # Journal > 50% base entries → ghi lại base file + xóa journal
+BLACKLIST_PERSIST_INTERVAL = 60
+
+# Warm start - snapshot tier pools + dead schedule + source stats, load lại ngay lúc boot
+WARM_START_PATH = os.path.join(PROXY_DATA_DIR, "pool_snapshot.json.gz")
+WARM_START_FORMAT = 1
+WARM_START_PERSIST_INTERVAL = 120
+WARM_START_MAX_AGE = 6 * 3600        # Snapshot cũ hơn → không serve lại pools (chỉ restore dead schedule + stats)
+
+warm_start_state = {
+    "last_saved": None,
+    "last_saved_marker": None,       # (pool version, dead schedule size) của lần save trước
+    "last_save_bytes": 0,
+    "last_save_seconds": None,
+    "restored": None                 # Kết quả load lúc boot
+}
+
+# PROXY HISTORY STORE - mọi validation outcome → SQLite qua batched writer thread (hot path chỉ append deque)
+HISTORY_DB_PATH = os.path.join(PROXY_DATA_DIR, "proxy_history.sqlite3")
+HISTORY_QUEUE_MAX = 100000           # Writer chậm/chưa start → drop oldest observations
+HISTORY_BATCH_SIZE = 2000            # Flush sớm khi queue đạt batch size
+HISTORY_FLUSH_INTERVAL = 2           # Giây giữa 2 lần flush
+HISTORY_RAW_RETENTION = 3 * 86400    # Raw observations giữ 3 ngày
+HISTORY_HOURLY_RETENTION = 30 * 86400  # Hourly rollups + first_seen giữ 30 ngày
+HISTORY_RANK_WINDOW = 7 * 86400      # Window uptime dùng cho ranking/admission
+HISTORY_RANK_MIN_CHECKS = 3          # Bỏ qua proxy có quá ít observations
+HISTORY_JOB_INTERVAL = 600           # Refresh uptime cache mỗi 10 phút
+HISTORY_RETENTION_INTERVAL = 3600    # Retention + incremental vacuum mỗi giờ
+
+history_queue = deque(maxlen=HISTORY_QUEUE_MAX)  # (ts, proxy_key, alive, latency_ms, failure_class)
+history_wakeup = threading.Event()
+history_uptime = {}                  # proxy_key -> (alive_checks, checks) trong HISTORY_RANK_WINDOW
+history_state = {
+    "thread": None,
+    "enqueued": 0,
+    "dropped": 0,
+    "written": 0,
+    "batches": 0,
+    "last_flush": None,
+    "last_flush_seconds": None,
+    "write_errors": 0,
+    "last_error": None,
+    "last_retention": None,
+    "retention_deleted": 0,
+    "last_rank_refresh": None
+}
+# Owner giữ connections suốt process: schema tạo 1 lần (init_history_db), không mở connection mới mỗi query.
+# "reader" dùng chung cho history API (serialize bằng history_db_lock), "job" cho job_history (retention)
+history_connections = {"schema_ready": False, "reader": None, "job": None}
+history_db_lock = threading.Lock()
+
+# MULTI-PROCESS SERVING - gunicorn workers tranh owner lock (flock). Owner chạy scheduler + history writer
+# và publish pool state ra shared memory (/dev/shm); followers load state đó và serve read hot path.
+SHARED_STATE_DIR = os.environ.get("PROXY_SHARED_STATE_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else PROXY_DATA_DIR)
+SHARED_STATE_PATH = os.path.join(SHARED_STATE_DIR, "proxy_service_state.json")  # Base snapshot (start / rotate)
+SHARED_STATE_LOG_MAX_BYTES = 8 * 1024 * 1024  # Delta log vượt → owner ghi base mới + log mới
+OWNER_LOCK_PATH = os.path.join(SHARED_STATE_DIR, "proxy_service_owner.lock")
+SHARED_STATE_MIN_INTERVAL = 0.5    # Burst mutations / follower reports: tối đa 2 lần / giây (chỉ chờ khi vừa có signal)
+OWNER_FORWARD_TIMEOUT = 60
+# Endpoints follower tự serve từ state local; mọi API khác (stats, leases, control, logs) forward sang owner.
+# Checkout / release luôn forward → lease state chỉ nằm ở owner, followers chỉ nhận exclusive keys qua delta log
+FOLLOWER_LOCAL_ENDPOINTS = {"get_alive_proxies_ultra_smart", "get_proxies_simple", "health_check", "home", "static"}
+FOLLOWER_STREAM_ENDPOINTS = {"get_dashboard_stream"}  # Forward dạng stream (không read timeout)
+
+process_role = {
+    "role": "standalone",          # standalone (không init) | owner | follower
+    "lock_file": None,
+    "control_port": None,          # Owner: loopback port nhận requests forward từ followers
+    "owner_pid": None,
+    "owner_port": None,
+    "state_generation": None,      # Generation của base snapshot + delta log đang dùng
+    "state_version": None,
+    "became_owner_at": None,
+    "publishes": 0,                # Owner: delta lines đã ghi
+    "rotations": 0,                # Owner: base snapshots đã ghi
+    "installs": 0,                 # Follower: base snapshots đã load (start / rotate / takeover)
+    "deltas_applied": 0,
+    "delta_errors": 0,
+    "forwarded": 0,
+    "forward_errors": 0,
+    "follower_reports": 0          # Owner: số reports nhận từ followers
+}
+# Follower: served count + emergency trigger chờ gửi về owner (record_served / trigger set wakeup → report thread gửi)
+follower_report = {"served": 0, "last_served": None, "emergency": None, "sent": 0, "errors": 0, "last_sent": 0.0}
+follower_report_lock = threading.Lock()
+follower_report_wakeup = threading.Event()
+OWNER_INTERNAL_ENDPOINTS = {"receive_follower_report"}  # Chỉ owner control port, follower không forward từ ngoài vào
+shared_state_dirty = threading.Event()
+shared_exclusive_until = {}        # Follower: proxy_key -> epoch hết exclusive lease (lease state nằm ở owner)
+shared_exclusive_next = {"at": None, "stale": True}  # Expiry gần nhất chưa tới (cache, stale khi leases đổi)
+# Owner: ops của serving tiers (version, [(seq, op, tier, record)]) + exclusive lease events chờ ghi vào delta log
+shared_state_pending = {"ops": [], "leases": []}
+shared_state_pending_lock = threading.Lock()
+shared_state_write_lock = threading.Lock()  # Serialize publisher thread + exclusive checkout flush
+shared_state_log = {"generation": None, "path": None, "file": None, "bytes": 0, "version": None, "last_publish": 0.0}
+# Follower: delta log đang tail (offset = vị trí file, buffer = dòng ghi dở của owner)
+shared_state_sync = {"generation": None, "path": None, "file": None, "buffer": b"", "version": 0, "fresh": 0}
+shared_state_sync_lock = threading.Lock()
+owner_session = requests.Session()
+owner_session.trust_env = False    # Internal calls (owner forward, cluster peers) không đi qua HTTP_PROXY env
+
+# CLUSTER MODE - nhiều nodes chia candidate keyspace bằng consistent hashing.
+# PROXY_CLUSTER_NODES=http://a:8080,http://b:8080 + PROXY_CLUSTER_SELF=http://a:8080 (phải nằm trong list)
+CLUSTER_NODES = sorted({url.strip().rstrip('/') for url in os.environ.get("PROXY_CLUSTER_NODES", "").split(',') if url.strip()})
+CLUSTER_SELF = os.environ.get("PROXY_CLUSTER_SELF", "").strip().rstrip('/')
+CLUSTER_SECRET = os.environ.get("PROXY_CLUSTER_SECRET", "")  # Shared secret giữa nodes (header X-Cluster-Secret)
+CLUSTER_ENABLED = CLUSTER_SELF in CLUSTER_NODES and bool(CLUSTER_SECRET)
+CLUSTER_VNODES = 64                # Virtual nodes / node → shard sizes đều nhau
+CLUSTER_SYNC_INTERVAL = 10         # Pull local tiers của peers mỗi 10s
+CLUSTER_PEER_TIMEOUT = 30          # Peer không trả lời 30s → bỏ khỏi ring (shard chia lại cho nodes còn sống)
+CLUSTER_REQUEST_TIMEOUT = 10
+
+cluster_state = {
+    "ring": ([], []),              # (sorted hashes, node tại hash đó)
+    "alive": [],
+    "leader": None,                # Node sống có URL nhỏ nhất → fetch sources cho cả cluster
+    "peers": {
+        url: {"last_ok": time.monotonic(), "local_version": None, "records": [], "failures": 0, "last_error": None}
+        for url in CLUSTER_NODES if url != CLUSTER_SELF
+    },
+    "syncs": 0,
+    "leader_changes": 0,
+    "fetches": 0,
+    "pushed": {},                  # peer -> candidates đã gửi
+    "push_failures": 0,
+    "received": 0,                 # Candidates nhận từ leader
+    "rejected": 0                  # Candidates sai shape / không qua is_quality_proxy
+}
+
+# DASHBOARD STREAM (SSE) - 1 broadcaster thread build payloads 1 lần cho mọi viewer, push khi đổi.
+# Mỗi connection chỉ giữ cursor (seq) vào event log chung + chờ trên Condition → load không tăng theo số tabs.
+DASHBOARD_STREAM_TICK = 1           # Poll response cache TTL (logs push ngay khi sink flush)
+DASHBOARD_STREAM_CHANNELS = {       # channel -> giây giữa 2 lần rebuild payload (cadence cũ của polling loops)
+    "stats": 5,
+    "system": 3,
+    "strategy": 10,
+    "resurrection": 15
+}
+DASHBOARD_STREAM_KEEPALIVE = 15     # Comment line giữ connection qua proxies / load balancers
+DASHBOARD_STREAM_MAX_EVENTS = 200
+DASHBOARD_STREAM_INITIAL_LOGS = 100
+# Mỗi stream giữ 1 gthread suốt connection → cap / process để còn threads cho API; vượt cap → 503, dashboard
+# chuyển sang /api/stream/poll: 1 request / DASHBOARD_POLL_INTERVAL đọc cùng event log, response cache theo cursor
+DASHBOARD_STREAM_MAX_PER_PROCESS = int(os.environ.get(
+    "DASHBOARD_STREAM_MAX_PER_PROCESS", max(1, int(os.environ.get("GUNICORN_THREADS", 8)) // 4)))
+DASHBOARD_POLL_INTERVAL = 3
+dashboard_stream = {
+    "seq": 0,
+    "events": deque(maxlen=DASHBOARD_STREAM_MAX_EVENTS),  # (seq, channel, data JSON)
+    "latest": {},                   # channel -> event mới nhất (client mới connect nhận ngay)
+    "fingerprints": {},             # channel -> payload JSON không có timestamp (detect thay đổi)
+    "next_refresh": {},             # channel -> monotonic deadline rebuild tiếp theo
+    "log_seq": 0,                   # Log seq lớn nhất đã push
+    "subscribers": 0,
+    "local_streams": 0,             # Streams đang giữ thread của process này (gồm relays của follower)
+    "rejected": 0,                  # Streams bị từ chối 503 do vượt cap
+    "last_poll": None,              # Monotonic time của poll gần nhất (poll viewers giữ broadcaster chạy)
+    "polls": 0,
+    "connections": 0,
+    "pushed": 0,
+    "builds": 0,
+    "thread": None
+}
+dashboard_stream_condition = threading.Condition()
+# Broadcaster ngủ trên event này: set khi có viewer mới (stream / poll) hoặc log sink flush lúc có viewer
+dashboard_stream_wakeup = threading.Event()
+
+permanent_blacklist = {
+    "sorted": (array('Q'), array(BLACKLIST_EXPIRES_TYPECODE)),   # (keys, expires epoch) sorted theo key
+    "pending": {},                        # key -> expires, chưa merge
+    "other": {},                          # Side table: proxy_key không encode được (hostname, IPv6) -> expires
+    "unsaved": {},                        # key | proxy_key -> expires, chưa append vào journal
+    "journal_entries": 0,
+    "rejected": 0,
+    "expired_pruned": 0,
+    "unencodable": 0,                     # Adds vào side table
+    "compactions": 0,
+    "last_saved": None
+}
+blacklist_lock = threading.Lock()
+
+# Resurrection schedules (exponential backoff)
+RESURRECTION_DELAYS = {
+    "immediate_retry": 0,      # 0 minutes (next cycle)
+    "short_delay": 300,        # 5 minutes
+    "medium_delay": 1800,      # 30 minutes  
+    "long_delay": 7200,        # 2 hours
+    "permanent_threshold": 5   # Sau 5 lần fail → permanent dead
+}
+RESURRECTION_CATEGORY_BY_FAILURES = {1: "immediate_retry", 2: "short_delay", 3: "medium_delay", 4: "long_delay"}
+
+# Failure classes từ check_single_proxy_classified → backoff riêng cho từng class
+# min_failures: vào thẳng bậc này của ladder | delay_factor: nhân với RESURRECTION_DELAYS
+FAILURE_CLASS_PRECEDENCE = ["auth_required", "bad_response", "timeout", "connection_error", "refused", "invalid"]
+FAILURE_CLASS_BACKOFF = {
+    "refused": {"min_failures": 4, "delay_factor": 1.0},           # Hard refusal → long delay ngay
+    "auth_required": {"min_failures": 4, "delay_factor": 1.0},     # HTTP 407 → long delay ngay
+    "bad_response": {"min_failures": 2, "delay_factor": 1.0},      # Judge trả về rác / status lạ
+    "connection_error": {"min_failures": 1, "delay_factor": 0.5},
+    "timeout": {"min_failures": 1, "delay_factor": 0.25},          # Transient → retry nhanh
+    "invalid": {"min_failures": 5, "delay_factor": 1.0}            # Format hỏng → không bao giờ sống
+}
+DEFAULT_FAILURE_BACKOFF = {"min_failures": 1, "delay_factor": 1.0}
+
+failure_class_stats = {
+    failure_class: {"observed": 0, "categorized_dead": 0, "resurrection_attempts": 0, "resurrected": 0}
+    for failure_class in FAILURE_CLASS_PRECEDENCE
+}
+
+# Adaptive resurrection budget: throughput theo pool deficit × resurrection yield
+RESURRECTION_MIN_BUDGET = 5        # Pools đầy → chỉ thử vài proxy (giữ yield estimate sống)
+RESURRECTION_MAX_BUDGET = 1000     # Pools cạn + resurrection hiệu quả
+RESURRECTION_TARGET_YIELD = 0.10   # Yield ≥ 10% → dùng toàn bộ budget theo deficit
+RESURRECTION_YIELD_PRIOR = 0.05
+RESURRECTION_YIELD_ALPHA = 0.3     # EWMA weight cho batch mới nhất
+RESURRECTION_CYCLE_SECONDS = 60    # Còn due candidates + pools thiếu → chạy lại sau 60s
+RESURRECTION_MAX_WORKERS = 16
+
+resurrection_budget = {
+    "budget": RESURRECTION_MIN_BUDGET,
+    "workers": 2,
+    "deficit_ratio": 0.0,
+    "yield_factor": None,
+    "yield_ewma": RESURRECTION_YIELD_PRIOR,
+    "computed_at": None
+}
+
+def _dead_entry_valid(heap_item):
+    """Heap item còn hiệu lực (proxy chưa bị re-schedule / lấy ra)"""
+    deadline, seq, proxy_key = heap_item
+    entry = dead_proxy_management["entries"].get(proxy_key)
+    return entry is not None and entry["seq"] == seq
+
+def _drop_dead_entry(proxy_key):
+    """Remove proxy khỏi resurrection schedule (caller giữ pool_locks["DEAD"])"""
+    entry = dead_proxy_management["entries"].pop(proxy_key, None)
+    if entry is not None:
+        dead_proxy_management["changes"] += 1
+        dead_proxy_management["counts"][entry["category"]] -= 1
+        if entry.get("due"):
+            dead_proxy_management["due"] -= 1
+    return entry
+
+def _advance_due_count(now):
+    """Đếm entries vừa tới deadline vào "due" - O(k log n) với k entries mới due (caller giữ pool_locks["DEAD"])"""
+    pending = dead_proxy_management["pending"]
+    while pending and pending[0][0] <= now:
+        heap_item = heapq.heappop(pending)
+        if _dead_entry_valid(heap_item):
+            dead_proxy_management["entries"][heap_item[2]]["due"] = True
+            dead_proxy_management["due"] += 1
+
+def _dead_heap_smallest(limit):
+    """`limit` valid items có deadline sớm nhất: duyệt best-first từ đỉnh heap, không scan toàn bộ heap"""
+    heap = dead_proxy_management["heap"]
+    smallest = []
+    frontier = [(heap[0], 0)] if heap else []
+    while frontier and len(smallest) < limit:
+        heap_item, index = heapq.heappop(frontier)
+        if _dead_entry_valid(heap_item):
+            smallest.append(heap_item)
+        for child in (2 * index + 1, 2 * index + 2):
+            if child < len(heap):
+                heapq.heappush(frontier, (heap[child], child))
+    return smallest
+
+def categorize_dead_proxy(proxy_data, failure_count=1, failure_class=None):
+    """Phân loại dead proxy theo failure count + failure class để schedule resurrection - O(log n)"""
+    proxy_key = f"{proxy_data.get('host', 'unknown')}:{proxy_data.get('port', 'unknown')}"
+    backoff = FAILURE_CLASS_BACKOFF.get(failure_class, DEFAULT_FAILURE_BACKOFF)
+    failure_count = max(failure_count, backoff["min_failures"])
+    category = RESURRECTION_CATEGORY_BY_FAILURES.get(failure_count, "permanent_dead")
+    if failure_class in failure_class_stats:
+        failure_class_stats[failure_class]["categorized_dead"] += 1
+    
+    if category == "permanent_dead":
+        # ≥5 lần dead → permanent blacklist (chặn luôn lúc ingestion)
+        with pool_locks["DEAD"]:
+            _drop_dead_entry(proxy_key)
+        blacklist_add(proxy_key)
+        return
+    
+    _schedule_dead_entry(proxy_key, proxy_data, failure_count, failure_class, category,
+                         RESURRECTION_DELAYS[category] * backoff["delay_factor"], time.time())
+
+def defer_dead_proxy(candidate, retry_delay):
+    """Re-schedule dead proxy chưa được dial (giữ failure_count / category / failure class, không tính là fail)"""
+    _schedule_dead_entry(candidate['proxy_key'], candidate['proxy_data'], candidate['failure_count'],
+                         candidate.get('failure_class'), candidate['category'], retry_delay, candidate.get('last_failed'))
+
+def _schedule_dead_entry(proxy_key, proxy_data, failure_count, failure_class, category, retry_delay, last_failed):
+    """Insert / thay entry trong resurrection schedule - O(log n)"""
+    with pool_locks["DEAD"]:
+        # Proxy đã có trong schedule → entry mới thay thế (heap item cũ thành stale)
+        _drop_dead_entry(proxy_key)
+        dead_proxy_management["counts"][category] += 1
+        dead_proxy_management["changes"] += 1
+        
+        deadline = time.monotonic() + retry_delay
+        seq = next(dead_proxy_seq)
+        dead_proxy_management["entries"][proxy_key] = {
+            'proxy_data': proxy_data,
+            'failure_count': failure_count,
+            'failure_class': failure_class,
+            'category': category,
+            'deadline': deadline,
+            'seq': seq,
+            'last_failed': last_failed
+        }
+        heap = dead_proxy_management["heap"]
+        heapq.heappush(heap, (deadline, seq, proxy_key))
+        heapq.heappush(dead_proxy_management["pending"], (deadline, seq, proxy_key))
+        is_earliest = heap[0][1] == seq
+        
+        # Stale items tích lũy quá nhiều → compact
+        if len(heap) > 2 * len(dead_proxy_management["entries"]) + 1000:
+            for heap_name in ("heap", "pending"):
+                dead_proxy_management[heap_name] = [item for item in dead_proxy_management[heap_name] if _dead_entry_valid(item)]
+                heapq.heapify(dead_proxy_management[heap_name])
+    
+    # Chỉ wake scheduler khi deadline này sớm hơn tất cả deadline đang chờ
+    if is_earliest:
+        schedule_job_wakeup("resurrect", retry_delay)
+
+def get_proxies_ready_for_resurrection(limit=RESURRECTION_BATCH_MAX):
+    """Pop tối đa `limit` dead proxy đã tới deadline - O(k log n)"""
+    ready_for_retry = []
+    now = time.monotonic()
+    
+    with pool_locks["DEAD"]:
+        heap = dead_proxy_management["heap"]
+        while heap and heap[0][0] <= now and len(ready_for_retry) < limit:
+            deadline, seq, proxy_key = heapq.heappop(heap)
+            entry = dead_proxy_management["entries"].get(proxy_key)
+            if entry is None or entry["seq"] != seq:
+                continue  # Stale item (đã re-schedule)
+            _drop_dead_entry(proxy_key)
+            ready_for_retry.append({
+                'proxy_data': entry['proxy_data'],
+                'failure_count': entry['failure_count'],
+                'proxy_key': proxy_key,
+                'category': entry['category'],
+                'failure_class': entry['failure_class'],
+                'last_failed': entry['last_failed']
+            })
+    
+    return ready_for_retry
+
+def get_next_resurrection_delay():
+    """Số giây tới lần resurrection retry sớm nhất (None nếu không còn proxy chờ)"""
+    with pool_locks["DEAD"]:
+        heap = dead_proxy_management["heap"]
+        while heap and not _dead_entry_valid(heap[0]):
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return max(0, heap[0][0] - time.monotonic())
+
+def compute_resurrection_budget():
+    """Budget (candidates/run + validation workers) = deficit ratio × yield factor"""
+    summary = pool_snapshot["summary"]
+    total_target = sum(TARGET_POOLS[tier_name] for tier_name in SERVING_TIERS)
+    total_deficit = sum(max(0, TARGET_POOLS[tier_name] - summary[tier_name]) for tier_name in SERVING_TIERS)
+    deficit_ratio = total_deficit / total_target if total_target > 0 else 0.0
+    
+    # Yield thấp vẫn giữ 20% budget khi pools thiếu (resurrection có thể là nguồn duy nhất)
+    yield_factor = min(1.0, max(0.2, resurrection_budget["yield_ewma"] / RESURRECTION_TARGET_YIELD))
+    budget = int(RESURRECTION_MIN_BUDGET + (RESURRECTION_MAX_BUDGET - RESURRECTION_MIN_BUDGET) * deficit_ratio * yield_factor)
+    workers = max(2, min(RESURRECTION_MAX_WORKERS, budget // 25))
+    
+    resurrection_budget.update({
+        "budget": budget,
+        "workers": workers,
+        "deficit_ratio": round(deficit_ratio, 3),
+        "yield_factor": round(yield_factor, 3),
+        "computed_at": datetime.now().isoformat()
+    })
+    return budget, workers
+
+def record_resurrection_yield(attempted, resurrected):
+    """Update EWMA resurrection yield sau mỗi batch"""
+    if attempted <= 0:
+        return
+    batch_yield = resurrected / attempted
+    resurrection_budget["yield_ewma"] = round(
+        (1 - RESURRECTION_YIELD_ALPHA) * resurrection_budget["yield_ewma"] + RESURRECTION_YIELD_ALPHA * batch_yield, 4
+    )
+
+def get_failure_class_summary():
+    """Per failure class: số lần gặp, số dead, resurrection attempts/success/rate + backoff"""
+    summary = {}
+    for failure_class, stats in failure_class_stats.items():
+        attempts = stats["resurrection_attempts"]
+        summary[failure_class] = {
+            **stats,
+            "resurrection_rate": round(stats["resurrected"] / attempts * 100, 1) if attempts > 0 else 0,
+            "backoff": FAILURE_CLASS_BACKOFF[failure_class]
+        }
+    return summary
+
+def get_dead_category_counts():
+    """Số dead proxy theo category - O(1) (permanent_dead = blacklist size)"""
+    counts = dict(dead_proxy_management["counts"])
+    counts["permanent_dead"] = get_blacklist_size()
+    return counts
+
+# PERMANENT BLACKLIST - compact, on-disk, có expiry
+# IPv4 host:port → 1 int 48-bit (ip << 16 | port). Lưu 2 sorted arrays song song
+# (keys 'Q' + expires 'I'), lookup bằng bisect; adds mới nằm trong pending dict tới lần merge.
+# Key không phải IPv4 (hostname, IPv6) → side table dict (hiếm, vẫn được chặn + persist).
+
+def encode_proxy_key(proxy_key):
+    """'1.2.3.4:8080' → int 48-bit (None nếu host không phải IPv4)"""
+    try:
+        host, port = proxy_key.rsplit(':', 1)
+        a, b, c, d = host.split('.')
+        a, b, c, d, port = int(a), int(b), int(c), int(d), int(port)
+    except (ValueError, AttributeError):
+        return None
+    if max(a, b, c, d) > 255 or min(a, b, c, d) < 0 or not 0 <= port <= 65535:
+        return None
+    return (((a << 24) | (b << 16) | (c << 8) | d) << 16) | port
+
+def is_blacklisted(proxy_key, now=None):
+    """Proxy có trong permanent blacklist (chưa expire) - O(log n), không lock"""
+    key = encode_proxy_key(proxy_key)
+    now = now if now is not None else time.time()
+    if key is None:
+        expires_at = permanent_blacklist["other"].get(proxy_key)
+        return expires_at is not None and expires_at > now
+    
+    expires_at = permanent_blacklist["pending"].get(key)
+    if expires_at is not None:
+        return expires_at > now
+    
+    keys, expires = permanent_blacklist["sorted"]
+    position = bisect.bisect_left(keys, key)
+    return position < len(keys) and keys[position] == key and expires[position] > now
+
+def blacklist_add(proxy_key, ttl=BLACKLIST_TTL):
+    """Thêm proxy vào permanent blacklist (expire sau ttl giây). Key không phải IPv4 → side table"""
+    key = encode_proxy_key(proxy_key)
+    expires_at = int(time.time() + ttl)
+    with blacklist_lock:
+        if key is None:
+            permanent_blacklist["other"][proxy_key] = expires_at
+            permanent_blacklist["unsaved"][proxy_key] = expires_at
+            permanent_blacklist["unencodable"] += 1
+            return True
+        permanent_blacklist["pending"][key] = expires_at
+        permanent_blacklist["unsaved"][key] = expires_at
+        # Threshold scale theo size → merge O(n) amortized còn O(1) / add
+        if len(permanent_blacklist["pending"]) >= max(BLACKLIST_MERGE_THRESHOLD, len(permanent_blacklist["sorted"][0]) // 8):
+            _merge_blacklist()
+    return True
+
+def _merge_blacklist():
+    """Merge pending vào sorted arrays + prune expired (caller giữ blacklist_lock)"""
+    now = int(time.time())
+    keys, expires = permanent_blacklist["sorted"]
+    merged = {key: expires_at for key, expires_at in zip(keys, expires) if expires_at > now}
+    pruned = len(keys) - len(merged)
+    for key, expires_at in permanent_blacklist["pending"].items():
+        if expires_at > now:
+            merged[key] = expires_at
+        else:
+            pruned += 1
+    other = {proxy_key: expires_at for proxy_key, expires_at in permanent_blacklist["other"].items() if expires_at > now}
+    pruned += len(permanent_blacklist["other"]) - len(other)
+    
+    ordered = sorted(merged)
+    # Publish arrays mới trước khi clear pending → reader không bao giờ miss key
+    permanent_blacklist["sorted"] = (array('Q', ordered), array(BLACKLIST_EXPIRES_TYPECODE, (merged[key] for key in ordered)))
+    permanent_blacklist["pending"] = {}
+    permanent_blacklist["other"] = other
+    permanent_blacklist["expired_pruned"] += pruned
+
+def save_permanent_blacklist():
+    """Persist adds mới: append vào journal (O(số adds)). Journal lớn → compact: ghi lại base (atomic) + xóa journal"""
+    with blacklist_lock:
+        if not permanent_blacklist["unsaved"]:
+            return False
+        unsaved = permanent_blacklist["unsaved"]
+        permanent_blacklist["unsaved"] = {}
+        journal_entries = permanent_blacklist["journal_entries"] + len(unsaved)
+        base_entries = len(permanent_blacklist["sorted"][0]) + len(permanent_blacklist["other"])
+        compact = journal_entries > max(BLACKLIST_MERGE_THRESHOLD, base_entries * BLACKLIST_COMPACT_RATIO) \
+            or not os.path.exists(BLACKLIST_PATH)
+        if compact:
+            _merge_blacklist()
+            keys, expires = permanent_blacklist["sorted"]
+            other = dict(permanent_blacklist["other"])
+    
+    os.makedirs(os.path.dirname(BLACKLIST_PATH), exist_ok=True)
+    if not compact:
+        with open(BLACKLIST_JOURNAL_PATH, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps([key, expires_at]) + "\n" for key, expires_at in unsaved.items()))
+        permanent_blacklist["journal_entries"] = journal_entries
+        permanent_blacklist["last_saved"] = datetime.now().isoformat()
+        return True
+    
+    if sys.byteorder == "big":
+        keys, expires = array(keys.typecode, keys), array(expires.typecode, expires)  # Copy: arrays đang được serve
+        keys.byteswap()
+        expires.byteswap()
+    other_bytes = json.dumps(other).encode("utf-8")
+    tmp_path = BLACKLIST_PATH + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(BLACKLIST_MAGIC)
+        f.write(len(keys).to_bytes(8, "little"))
+        f.write(keys.tobytes())
+        f.write(expires.tobytes())
+        f.write(len(other_bytes).to_bytes(8, "little"))
+        f.write(other_bytes)
+    os.replace(tmp_path, BLACKLIST_PATH)
+    # Base đã chứa mọi entry trong journal (crash trước unlink → replay trùng, vô hại)
+    try:
+        os.unlink(BLACKLIST_JOURNAL_PATH)
+    except FileNotFoundError:
+        pass
+    permanent_blacklist["journal_entries"] = 0
+    permanent_blacklist["compactions"] += 1
+    permanent_blacklist["last_saved"] = datetime.now().isoformat()
+    return True
+
+def _read_blacklist_journal():
+    """Entries trong journal: (key int | proxy_key str, expires). Dòng hỏng (crash giữa lúc append) → bỏ qua"""
+    entries = []
+    try:
+        with open(BLACKLIST_JOURNAL_PATH, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    key, expires_at = json.loads(line)
+                except (ValueError, TypeError):
+                    continue
+                if isinstance(key, (int, str)) and isinstance(expires_at, int):
+                    entries.append((key, expires_at))
+    except OSError:
+        pass
+    return entries
+
+def load_permanent_blacklist():
+    """Load base file + replay journal lúc startup (file hỏng/thiếu → blacklist rỗng)"""
+    keys = array('Q')
+    expires = array(BLACKLIST_EXPIRES_TYPECODE)
+    other = {}
+    if os.path.exists(BLACKLIST_PATH):
+        try:
+            with open(BLACKLIST_PATH, "rb") as f:
+                magic = f.read(len(BLACKLIST_MAGIC))
+                if magic not in (BLACKLIST_MAGIC, BLACKLIST_LEGACY_MAGIC):
+                    raise ValueError("bad magic")
+                count = int.from_bytes(f.read(8), "little")
+                if keys.itemsize != 8 or expires.itemsize != 4:
+                    raise ValueError(f"unsupported itemsize {keys.itemsize}/{expires.itemsize}")
+                keys.frombytes(f.read(count * 8))
+                expires.frombytes(f.read(count * 4))
+                if magic == BLACKLIST_MAGIC:
+                    other = json.loads(f.read(int.from_bytes(f.read(8), "little")).decode("utf-8"))
+            if len(keys) != count or len(expires) != count or not isinstance(other, dict):
+                raise ValueError("truncated file")
+            if sys.byteorder == "big":
+                keys.byteswap()
+                expires.byteswap()
+        except (OSError, ValueError) as e:
+            log_to_render(f"⚠️ BLACKLIST LOAD ERROR: {str(e)} - start với blacklist rỗng")
+            keys = array('Q')
+            expires = array(BLACKLIST_EXPIRES_TYPECODE)
+            other = {}
+    journal = _read_blacklist_journal()
+    if not keys and not other and not journal:
+        return 0
+    
+    with blacklist_lock:
+        permanent_blacklist["sorted"] = (keys, expires)
+        permanent_blacklist["other"] = other
+        for key, expires_at in journal:
+            target = permanent_blacklist["other"] if isinstance(key, str) else permanent_blacklist["pending"]
+            target[key] = max(expires_at, target.get(key, 0))
+        permanent_blacklist["journal_entries"] = len(journal)
+        _merge_blacklist()  # Prune entries expire trong lúc service tắt
+    size = get_blacklist_size()
+    log_to_render(f"⚰️ BLACKLIST LOADED: {size} permanent dead proxy từ {BLACKLIST_PATH} ({len(journal)} journal entries)")
+    return size
+
+def get_blacklist_size():
+    """Số entries trong blacklist (gồm cả pending + side table, có thể còn entries expired chưa prune)"""
+    return len(permanent_blacklist["sorted"][0]) + len(permanent_blacklist["pending"]) + len(permanent_blacklist["other"])
+
+def get_blacklist_summary():
+    """Blacklist stats cho monitoring"""
+    keys, expires = permanent_blacklist["sorted"]
+    return {
+        "size": get_blacklist_size(),
+        "pending_merge": len(permanent_blacklist["pending"]),
+        "bytes": keys.itemsize * len(keys) + expires.itemsize * len(expires),
+        "ttl_days": round(BLACKLIST_TTL / 86400, 1),
+        "rejected_at_ingestion": permanent_blacklist["rejected"],
+        "expired_pruned": permanent_blacklist["expired_pruned"],
+        "unencodable": permanent_blacklist["unencodable"],
+        "side_table": len(permanent_blacklist["other"]),
+        "journal_entries": permanent_blacklist["journal_entries"],
+        "compactions": permanent_blacklist["compactions"],
+        "path": BLACKLIST_PATH,
+        "last_saved": permanent_blacklist["last_saved"]
+    }
+
+def job_persist_blacklist():
+    """JOB persist_blacklist: flush blacklist ra disk nếu có thay đổi"""
+    if save_permanent_blacklist():
+        log_to_render(f"💾 BLACKLIST SAVED: {get_blacklist_size()} entries")
+    return None
+
+def save_warm_start_snapshot():
+    """Ghi tier pools + dead schedule + source stats ra disk (atomic: tmp file + os.replace).
+
+    Pools đọc từ immutable pool_snapshot (không lock). No-op nếu không có gì thay đổi.
+    """
+    snapshot = pool_snapshot
+    # Live entries (heap còn chứa stale items chờ lazy deletion) + schedule changes
+    marker = (snapshot["version"], len(dead_proxy_management["entries"]), dead_proxy_management["changes"])
+    if marker == warm_start_state["last_saved_marker"]:
+        return False
+    
+    start = time.perf_counter()
+    now_monotonic = time.monotonic()
+    with pool_locks["DEAD"]:
+        dead = [
+            [proxy_key, entry["proxy_data"], entry["failure_count"], entry["failure_class"],
+             entry["category"], round(max(0, entry["deadline"] - now_monotonic), 1), entry["last_failed"]]
+            for proxy_key, entry in dead_proxy_management["entries"].items()
+        ]
+    fresh = list(snapshot["pools"]["FRESH"])
+    state = {
+        "format": WARM_START_FORMAT,
+        "saved_at": time.time(),
+        "pool_version": snapshot["version"],
+        "pools": {pool_name: list(snapshot["pools"][pool_name]) for pool_name in SERVING_TIERS},
+        "fresh": [[p, fresh_candidate_meta.get(candidate_key_of(p))] for p in fresh],
+        "dead": dead,
+        "source_stats": {name: dict(stats) for name, stats in list(source_stats.items())}
+    }
+    
+    os.makedirs(os.path.dirname(WARM_START_PATH), exist_ok=True)
+    tmp_path = WARM_START_PATH + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=5) as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp_path, WARM_START_PATH)
+    
+    warm_start_state["last_saved_marker"] = marker
+    warm_start_state["last_saved"] = datetime.now().isoformat()
+    warm_start_state["last_save_bytes"] = os.path.getsize(WARM_START_PATH)
+    warm_start_state["last_save_seconds"] = round(time.perf_counter() - start, 3)
+    return True
 
-@app.route('/api/logs', methods=['GET'])
-def get_logs():
-    """API để lấy real-time logs"""
-    try:
-        # REMOVED: Bỏ log không cần thiết
-        
-        # Return recent logs
-        recent_logs = list(log_buffer)[-100:]  # Last 100 logs
-        
-        return jsonify({
-            'success': True,
-            'logs': recent_logs,
-            'total_logs': len(log_buffer),
-            'startup': startup_status,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+def load_warm_start_snapshot():
+    """Restore pools + dead schedule + source stats từ snapshot lần chạy trước.
 
-@app.route('/api/proxy/alive', methods=['GET'])
-def get_alive_proxies_ultra_smart():
-    """ULTRA SMART API - Multi-tier proxy serving với guarantee >500 proxy"""
+    Pools được serve ngay, giữ checked_at cũ → maintenance re-validate stalest trước.
+    File hỏng/thiếu → cold start như cũ. Trả về số proxy restore vào serving tiers.
+    """
+    if not os.path.exists(WARM_START_PATH):
+        return 0
     try:
-        count = int(request.args.get('count', 50))
-        
-        # Use ULTRA SMART serving algorithm
-        result_proxies = smart_proxy_request(count)
-        pools_summary = get_pool_summary()
-        
-        # Sort by speed (fastest first)
-        sorted_proxies = sorted(result_proxies, key=lambda x: x.get('speed', 999))
-        
-        return jsonify({
-            'success': True,
-            'system': 'ULTRA_SMART_MULTI_TIER',
-            'guarantee_status': pools_summary['GUARANTEED'],
-            'total_available_all_tiers': pools_summary['TOTAL_AVAILABLE'],
-            'returned_count': len(sorted_proxies),
-            'requested_count': count,
-            'proxies': sorted_proxies,
-            'pool_breakdown': {
-                'PRIMARY': pools_summary['PRIMARY'],
-                'STANDBY': pools_summary['STANDBY'], 
-                'EMERGENCY': pools_summary['EMERGENCY'],
-                'FRESH': pools_summary['FRESH']
-            },
-            'serving_tiers_used': 'auto_detected_from_logs',
-            'last_update': pool_stats.get('last_update'),
-            'timestamp': datetime.now().isoformat(),
-            'total_served_today': pool_stats.get('total_served', 0),
-            'minimum_guaranteed': MINIMUM_GUARANTEED
-        })
+        with gzip.open(WARM_START_PATH, "rt", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("format") != WARM_START_FORMAT:
+            raise ValueError(f"unsupported format {state.get('format')}")
+    except (OSError, ValueError, EOFError) as e:
+        log_to_render(f"⚠️ WARM START LOAD ERROR: {str(e)} - cold start")
+        return 0
+    
+    offline_seconds = max(0, time.time() - state.get("saved_at", 0))
+    restored = {"offline_seconds": int(offline_seconds), "serving": 0, "fresh": 0, "dead": 0,
+                "source_stats": 0, "pools_skipped": offline_seconds > WARM_START_MAX_AGE}
+    
+    for name, stats in state.get("source_stats", {}).items():
+        source_stats.setdefault(name, {}).update(stats)
+    restored["source_stats"] = len(state.get("source_stats", {}))
+    
+    # Dead schedule: deadline còn lại trừ đi thời gian service tắt
+    now_monotonic = time.monotonic()
+    with pool_locks["DEAD"]:
+        heap = dead_proxy_management["heap"]
+        for proxy_key, proxy_data, failure_count, failure_class, category, remaining, last_failed in state.get("dead", []):
+            if category not in dead_proxy_management["counts"] or proxy_key in dead_proxy_management["entries"]:
+                continue
+            deadline = now_monotonic + max(0, remaining - offline_seconds)
+            seq = next(dead_proxy_seq)
+            dead_proxy_management["entries"][proxy_key] = {
+                'proxy_data': proxy_data,
+                'failure_count': failure_count,
+                'failure_class': failure_class,
+                'category': category,
+                'deadline': deadline,
+                'seq': seq,
+                'last_failed': last_failed
+            }
+            dead_proxy_management["counts"][category] += 1
+            heap.append((deadline, seq, proxy_key))
+            dead_proxy_management["pending"].append((deadline, seq, proxy_key))
+        heapq.heapify(heap)
+        heapq.heapify(dead_proxy_management["pending"])
+        restored["dead"] = len(dead_proxy_management["entries"])
+    
+    if not restored["pools_skipped"]:
+        for pool_name in SERVING_TIERS:
+            records = [p for p in state.get("pools", {}).get(pool_name, []) if isinstance(p, dict)]
+            pool_replace(pool_name, records, publish=False)
+            restored["serving"] += len(proxy_pools[pool_name])
+        publish_pool_snapshot()
         
-    except Exception as e:
-        log_to_render(f"❌ API ERROR: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e),
-            'fallback': 'multi_tier_system_error'
-        }), 500
+        fresh = []
+        fresh_meta = {}
+        for proxy_data, meta in state.get("fresh", []):
+            proxy_data = tuple(proxy_data) if isinstance(proxy_data, list) else proxy_data
+            fresh.append(proxy_data)
+            if meta:
+                fresh_meta[candidate_key_of(proxy_data)] = tuple(meta)
+        restored["fresh"] = fresh_admit(fresh, {}) if fresh else 0
+        # Giữ source + fetched_at gốc (fresh_admit ghi meta mới với fetched_at = now)
+        for proxy_key, meta in fresh_meta.items():
+            if proxy_key in fresh_candidate_meta:
+                fresh_candidate_meta[proxy_key] = meta
+    
+    warm_start_state["restored"] = restored
+    log_to_render(f"♨️ WARM START: {restored['serving']} serving + {restored['fresh']} fresh + "
+                  f"{restored['dead']} dead proxy restored (offline {restored['offline_seconds']}s)")
+    return restored["serving"]
 
-@app.route('/api/proxy/stats', methods=['GET'])
-def get_proxy_stats():
-    """API thống kê proxy với thông tin chi tiết"""
+def get_warm_start_summary():
+    """Warm start stats cho monitoring"""
+    return {
+        "path": WARM_START_PATH,
+        "last_saved": warm_start_state["last_saved"],
+        "last_save_bytes": warm_start_state["last_save_bytes"],
+        "last_save_seconds": warm_start_state["last_save_seconds"],
+        "persist_interval": WARM_START_PERSIST_INTERVAL,
+        "restored_at_boot": warm_start_state["restored"]
+    }
+
+def job_persist_snapshot():
+    """JOB persist_snapshot: ghi warm start snapshot nếu pools/dead schedule thay đổi"""
+    if save_warm_start_snapshot():
+        log_to_render(f"💾 WARM START SNAPSHOT SAVED: {warm_start_state['last_save_bytes']} bytes "
+                      f"in {warm_start_state['last_save_seconds']}s")
+    return None
+
+def record_observation(proxy_key, alive, speed=None, failure_class=None):
+    """Enqueue 1 validation outcome cho history writer - O(1), không I/O trên check hot path"""
+    if len(history_queue) == HISTORY_QUEUE_MAX:
+        history_state["dropped"] += 1
+    history_queue.append((int(time.time()), proxy_key, 1 if alive else 0,
+                          int(speed * 1000) if speed is not None else None, failure_class))
+    history_state["enqueued"] += 1
+    if len(history_queue) >= HISTORY_BATCH_SIZE:
+        history_wakeup.set()
+
+def open_history_db():
+    """Connection tới history DB (WAL: writer thread + readers chạy song song). Schema do init_history_db tạo.
+
+    check_same_thread=False: connection được giữ và dùng lại từ nhiều threads (caller tự serialize).
+    """
+    conn = sqlite3.connect(HISTORY_DB_PATH, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA synchronous=NORMAL")  # Per-connection
+    return conn
+
+def init_history_db():
+    """Tạo schema + persistent PRAGMAs (WAL, auto_vacuum) 1 lần / process"""
+    if history_connections["schema_ready"]:
+        return
+    os.makedirs(os.path.dirname(HISTORY_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(HISTORY_DB_PATH, timeout=30)
     try:
-        # REMOVED: Bỏ debug logs không cần thiết
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # Chỉ có hiệu lực trước khi tạo table đầu tiên
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS observations (
+                proxy_key TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                alive INTEGER NOT NULL,
+                latency_ms INTEGER,
+                failure_class TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_observations_key_ts ON observations (proxy_key, ts);
+            CREATE INDEX IF NOT EXISTS idx_observations_ts ON observations (ts);
         
-        last_update = proxy_cache.get('last_update')
-        cache_age_minutes = 0
-        
-        if last_update:
-            last_update_dt = datetime.fromisoformat(last_update)
-            cache_age_minutes = int((datetime.now() - last_update_dt).total_seconds() / 60)
-        
-        # Get from cache - now properly updated
-        total_checked = proxy_cache.get('total_checked', 0)
-        alive_count = proxy_cache.get('alive_count', 0)
-        success_rate = round(alive_count / total_checked * 100, 2) if total_checked > 0 else 0
-        
-        # Count total sources
-        total_sources = len(PROXY_SOURCE_LINKS["categorized"]) + len(PROXY_SOURCE_LINKS["mixed"])
-        
-        # REMOVED: Bỏ debug logs chi tiết
-        
-        return jsonify({
-            'success': True,
-            'alive_count': alive_count,
-            'total_checked': total_checked,
-            'success_rate': success_rate,
-            'target_live_proxies': TARGET_LIVE_PROXIES,
-            'target_progress': round(alive_count / TARGET_LIVE_PROXIES * 100, 1) if TARGET_LIVE_PROXIES > 0 else 0,
-            'target_achieved': startup_status.get('target_achieved', False),
-            'last_update': last_update,
-            'cache_age_minutes': cache_age_minutes,
-            'sources_count': total_sources,
-            'sources_processed': proxy_cache.get('sources_processed', 0),
-            'categorized_sources': list(PROXY_SOURCE_LINKS["categorized"].keys()),
-            'mixed_sources': list(PROXY_SOURCE_LINKS["mixed"].keys()),
-            'service_status': 'render_free_optimized_target_1000',
-            'check_interval': '10 minutes',
-            'timeout_setting': '6 seconds',
-            'max_workers': 15,
-            'processing_mode': 'TARGET_1000_PROXY_MODE',
-            'chunk_size': 500,
-            'render_plan': 'free_512mb'
-        })
+            CREATE TABLE IF NOT EXISTS hourly (
+                proxy_key TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                checks INTEGER NOT NULL,
+                alive_checks INTEGER NOT NULL,
+                latency_ms_sum INTEGER NOT NULL,
+                PRIMARY KEY (proxy_key, hour)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_hourly_hour ON hourly (hour);
         
-    except Exception as e:
-        log_to_render(f"❌ Lỗi API stats: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+            CREATE TABLE IF NOT EXISTS proxies (
+                proxy_key TEXT PRIMARY KEY,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                last_alive INTEGER
+            ) WITHOUT ROWID;
+        """)
+    finally:
+        conn.close()
+    history_connections["schema_ready"] = True
 
-@app.route('/api/ultra/stats', methods=['GET'])
-def get_ultra_smart_stats():
-    """ULTRA SMART Stats API - Multi-tier system statistics"""
+def history_connection(role):
+    """Connection owner giữ cho `role` ("reader" | "job"), mở lazy + reuse suốt process"""
+    conn = history_connections[role]
+    if conn is None:
+        init_history_db()
+        conn = history_connections[role] = open_history_db()
+    return conn
+
+def _flush_history_batch(conn, batch):
+    """Ghi 1 batch: raw rows + hourly rollup + first/last seen trong 1 transaction"""
+    hourly = {}
+    seen = {}
+    for ts, proxy_key, alive, latency_ms, failure_class in batch:
+        bucket = hourly.setdefault((proxy_key, ts - ts % 3600), [0, 0, 0])
+        bucket[0] += 1
+        bucket[1] += alive
+        bucket[2] += latency_ms or 0
+        first_seen, last_seen, last_alive = seen.get(proxy_key, (ts, ts, None))
+        seen[proxy_key] = (min(first_seen, ts), max(last_seen, ts), max(last_alive or 0, ts) if alive else last_alive)
+    
+    with conn:
+        conn.executemany("INSERT INTO observations (ts, proxy_key, alive, latency_ms, failure_class) VALUES (?, ?, ?, ?, ?)", batch)
+        conn.executemany("""
+            INSERT INTO hourly VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (proxy_key, hour) DO UPDATE SET
+                checks = checks + excluded.checks,
+                alive_checks = alive_checks + excluded.alive_checks,
+                latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum
+        """, [(key, hour, *bucket) for (key, hour), bucket in hourly.items()])
+        conn.executemany("""
+            INSERT INTO proxies VALUES (?, ?, ?, ?)
+            ON CONFLICT (proxy_key) DO UPDATE SET
+                last_seen = MAX(last_seen, excluded.last_seen),
+                last_alive = COALESCE(MAX(last_alive, excluded.last_alive), last_alive, excluded.last_alive)
+        """, [(key, *values) for key, values in seen.items()])
+
+def history_writer_loop():
+    """Writer thread: drain queue theo batch → SQLite. Lỗi I/O không ảnh hưởng validation"""
     try:
-        pools_summary = get_pool_summary()
-        
-        # Calculate comprehensive stats
-        total_available = pools_summary['TOTAL_AVAILABLE']
-        guarantee_status = pools_summary['GUARANTEED']
-        
-        # Target calculation với new system
-        target_total = sum(TARGET_POOLS.values())  # 1700 total proxy across all pools
-        target_progress = round(total_available / target_total * 100, 1) if total_available > 0 else 0
-        
-        # System health assessment
-        health_status = "EXCELLENT" if guarantee_status else "NEEDS_ATTENTION"
-        if total_available >= target_total:
-            health_status = "OPTIMAL"
-        elif total_available >= MINIMUM_GUARANTEED * 2:
-            health_status = "GOOD"
-        
-        last_update = pool_stats.get('last_update')
-        cache_age_minutes = 0
-        if last_update:
+        conn = open_history_db()
+    except sqlite3.Error as e:
+        history_state["last_error"] = str(e)
+        log_to_render(f"❌ HISTORY DB ERROR: {str(e)} - history store disabled")
+        return
+    while True:
+        history_wakeup.wait(HISTORY_FLUSH_INTERVAL)
+        history_wakeup.clear()
+        while history_queue:
+            batch = []
+            while history_queue and len(batch) < HISTORY_BATCH_SIZE:
+                batch.append(history_queue.popleft())
+            start = time.perf_counter()
             try:
-                last_update_dt = datetime.fromisoformat(last_update)
-                cache_age_minutes = int((datetime.now() - last_update_dt).total_seconds() / 60)
-            except:
-                cache_age_minutes = 0
-        
-        # Worker status
-        workers_active = {
-            'continuous_fetch': worker_control['continuous_fetch_active'],
-            'rolling_validation': worker_control['rolling_validation_active'],
-            'pool_balancer': worker_control['pool_balancer_active'],
-            'resurrection_manager': worker_control.get('resurrection_active', True),
-            'emergency_mode': worker_control['emergency_mode']
-        }
-        
-        # Dead proxy resurrection statistics
-        resurrection_stats = pool_stats.get("resurrection_stats", {})
-        dead_categories_count = {
-            category: len(dead_proxy_management.get(category, []))
-            for category in ["immediate_retry", "short_delay", "medium_delay", "long_delay", "permanent_dead"]
-        }
-        
-        return jsonify({
-            'success': True,
-            'system': 'ULTRA_SMART_MULTI_TIER',
-            'health_status': health_status,
-            'guarantee_status': guarantee_status,
-            'total_available': total_available,
-            'minimum_guaranteed': MINIMUM_GUARANTEED,
-            'pools': {
-                'PRIMARY': {
-                    'count': pools_summary['PRIMARY'],
-                    'target': TARGET_POOLS['PRIMARY'],
-                    'percentage': round(pools_summary['PRIMARY'] / TARGET_POOLS['PRIMARY'] * 100, 1) if TARGET_POOLS['PRIMARY'] > 0 else 0
-                },
-                'STANDBY': {
-                    'count': pools_summary['STANDBY'],
-                    'target': TARGET_POOLS['STANDBY'],
-                    'percentage': round(pools_summary['STANDBY'] / TARGET_POOLS['STANDBY'] * 100, 1) if TARGET_POOLS['STANDBY'] > 0 else 0
-                },
-                'EMERGENCY': {
-                    'count': pools_summary['EMERGENCY'],
-                    'target': TARGET_POOLS['EMERGENCY'],
-                    'percentage': round(pools_summary['EMERGENCY'] / TARGET_POOLS['EMERGENCY'] * 100, 1) if TARGET_POOLS['EMERGENCY'] > 0 else 0
-                },
-                'FRESH': {
-                    'count': pools_summary['FRESH'],
-                    'status': 'processing_continuously'
-                }
-            },
-            'workers': workers_active,
-            'performance': {
-                'total_served_today': pool_stats.get('total_served', 0),
-                'last_update': last_update,
-                'cache_age_minutes': cache_age_minutes
-            },
-            'targets': {
-                'total_target': target_total,
-                'target_progress': target_progress,
-                'target_achieved': total_available >= target_total
-            },
-            'sources_info': {
-                'total_sources': len(PROXY_SOURCE_LINKS["categorized"]) + len(PROXY_SOURCE_LINKS["mixed"]),
-                'categorized_sources': len(PROXY_SOURCE_LINKS["categorized"]),
-                'mixed_sources': len(PROXY_SOURCE_LINKS["mixed"])
-            },
-            'resurrection_system': {
-                'stats': resurrection_stats,
-                'dead_categories': dead_categories_count,
-                'total_dead_tracked': sum(dead_categories_count.values()),
-                'resurrection_enabled': True,
-                'delays': RESURRECTION_DELAYS
-            },
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        log_to_render(f"❌ ULTRA SMART Stats API Error: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e),
-            'system': 'ULTRA_SMART_MULTI_TIER'
-        }), 500
+                _flush_history_batch(conn, batch)
+            except sqlite3.Error as e:
+                history_state["write_errors"] += 1
+                history_state["last_error"] = str(e)
+                log_to_render(f"❌ HISTORY WRITE ERROR: {str(e)} - dropped {len(batch)} observations")
+                break
+            history_state["written"] += len(batch)
+            history_state["batches"] += 1
+            history_state["last_flush"] = datetime.now().isoformat()
+            history_state["last_flush_seconds"] = round(time.perf_counter() - start, 4)
 
-@app.route('/api/proxies', methods=['GET'])
-def get_proxies_simple():
-    """API đơn giản để lấy proxy sống - cho tool sử dụng"""
+def start_history_writer():
+    """Tạo schema rồi start writer thread (1 lần / process)"""
     try:
-        count = int(request.args.get('count', 100))
-        format_type = request.args.get('format', 'json')  # json hoặc text
-        
-        # Lấy từ cache hoặc trả về empty nếu cache rỗng
-        alive_proxies = proxy_cache.get('http', [])
-        
-        if not alive_proxies:
-            # REMOVED: Bỏ debug log không cần thiết
-            return jsonify({
-                'success': False,
-                'message': 'No live proxies available yet. Service is still validating.',
-                'count': 0,
-                'proxies': [],
-                'cache_status': 'empty'
-            })
-        
-        # Sort by speed và lấy số lượng yêu cầu
-        sorted_proxies = sorted(alive_proxies, key=lambda x: x.get('speed', 999))[:count]
-        
-        if format_type == 'text':
-            # Format text: host:port per line
-            proxy_list = [f"{p['host']}:{p['port']}" for p in sorted_proxies]
-            return '\n'.join(proxy_list), 200, {'Content-Type': 'text/plain'}
-        
-        # Format JSON (default)
-        return jsonify({
-            'success': True,
-            'count': len(sorted_proxies),
-            'total_available': len(alive_proxies),
-            'proxies': [
-                {
-                    'host': p['host'],
-                    'port': p['port'],
-                    'type': p['type'],
-                    'speed': p['speed'],
-                    'proxy': f"{p['host']}:{p['port']}"
-                } for p in sorted_proxies
-            ],
-            'last_update': proxy_cache.get('last_update')
-        })
-        
-    except Exception as e:
-        log_to_render(f"❌ API /proxies error: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        init_history_db()
+    except (OSError, sqlite3.Error) as e:
+        history_state["last_error"] = str(e)
+        log_to_render(f"❌ HISTORY DB ERROR: {str(e)} - history store disabled")
+        return None
+    if history_state["thread"] is None:
+        history_state["thread"] = threading.Thread(target=history_writer_loop, daemon=True)
+        history_state["thread"].start()
+    return history_state["thread"]
 
-@app.route('/api/debug', methods=['GET'])
-def debug_cache():
-    """Debug cache để kiểm tra vấn đề"""
-    # REMOVED: Bỏ log debug không cần thiết
-    
-    return jsonify({
-        'process_id': os.getpid(),
-        'proxy_cache': proxy_cache,
-        'cache_http_length': len(proxy_cache.get('http', [])),
-        'cache_alive_count': proxy_cache.get('alive_count', 0),
-        'cache_total_checked': proxy_cache.get('total_checked', 0),
-        'startup_status': startup_status,
-        'timestamp': datetime.now().isoformat()
-    })
+def refresh_history_uptime(conn):
+    """Load uptime (alive_checks, checks) trong HISTORY_RANK_WINDOW → history_uptime cho ranking/admission"""
+    global history_uptime
+    since_hour = int(time.time()) - HISTORY_RANK_WINDOW
+    rows = conn.execute("""
+        SELECT proxy_key, SUM(alive_checks), SUM(checks) FROM hourly
+        WHERE hour >= ? GROUP BY proxy_key HAVING SUM(checks) >= ?
+    """, (since_hour - since_hour % 3600, HISTORY_RANK_MIN_CHECKS)).fetchall()
+    history_uptime = {proxy_key: (alive_checks, checks) for proxy_key, alive_checks, checks in rows}
+    history_state["last_rank_refresh"] = datetime.now().isoformat()
+    return len(history_uptime)
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Health check endpoint để test service"""
-    # REMOVED: Bỏ log không cần thiết
+def run_history_retention(conn):
+    """Retention: raw > 3 ngày, hourly/proxies > 30 ngày → delete, rồi trả pages trống cho OS"""
+    now = int(time.time())
+    with conn:
+        deleted = conn.execute("DELETE FROM observations WHERE ts < ?", (now - HISTORY_RAW_RETENTION,)).rowcount
+        deleted += conn.execute("DELETE FROM hourly WHERE hour < ?", (now - HISTORY_HOURLY_RETENTION,)).rowcount
+        deleted += conn.execute("DELETE FROM proxies WHERE last_seen < ?", (now - HISTORY_HOURLY_RETENTION,)).rowcount
+    conn.executescript("PRAGMA incremental_vacuum;")  # executescript step tới DONE (execute chỉ free 1 page)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    # Stats cho planner: window queries dùng skip-scan trên (proxy_key, hour) thay vì full scan
+    conn.execute("PRAGMA analysis_limit=1000")
+    conn.execute("ANALYZE")
+    history_state["retention_deleted"] += deleted
+    history_state["last_retention"] = datetime.now().isoformat()
+    return deleted
+
+def job_history():
+    """JOB history: refresh uptime cache cho scoring, retention + compaction mỗi giờ"""
+    conn = history_connection("job")  # Scheduler không chạy 2 lần cùng 1 job → không cần lock
+    ranked = refresh_history_uptime(conn)
+    last_retention = history_state["last_retention"]
+    if last_retention is None or (datetime.now() - datetime.fromisoformat(last_retention)).total_seconds() >= HISTORY_RETENTION_INTERVAL:
+        deleted = run_history_retention(conn)
+        log_to_render(f"🧹 HISTORY RETENTION: deleted {deleted} rows")
+    log_to_render(f"📚 HISTORY: {ranked} proxy có uptime history (window {HISTORY_RANK_WINDOW // 86400} ngày)")
+    return None
+
+def query_reliable_proxies(min_uptime=0.9, window_hours=24, min_checks=3, limit=100):
+    """Proxy có uptime ≥ min_uptime trong window (hourly rollups, không scan raw observations)"""
+    since = int(time.time()) - window_hours * 3600
+    with history_db_lock:
+        rows = history_connection("reader").execute("""
+            SELECT proxy_key, SUM(alive_checks) * 1.0 / SUM(checks) AS uptime, SUM(checks),
+                   SUM(latency_ms_sum) * 1.0 / MAX(SUM(alive_checks), 1)
+            FROM hourly WHERE hour >= ?
+            GROUP BY proxy_key
+            HAVING SUM(checks) >= ? AND uptime >= ?
+            ORDER BY uptime DESC, SUM(checks) DESC
+            LIMIT ?
+        """, (since - since % 3600, min_checks, min_uptime, limit)).fetchall()
+    return [
+        {"proxy": proxy_key, "uptime": round(uptime, 4), "checks": checks,
+         "avg_latency_ms": round(avg_latency) if avg_latency else None, "tier": get_proxy_tier(proxy_key)}
+        for proxy_key, uptime, checks, avg_latency in rows
+    ]
+
+def get_proxy_history(proxy_key, window_hours=24):
+    """First seen + hourly uptime/latency trend + recent observations của 1 proxy"""
+    since = int(time.time()) - window_hours * 3600
+    with history_db_lock:
+        conn = history_connection("reader")
+        seen = conn.execute("SELECT first_seen, last_seen, last_alive FROM proxies WHERE proxy_key = ?",
+                            (proxy_key,)).fetchone()
+        hourly = conn.execute("""
+            SELECT hour, checks, alive_checks, latency_ms_sum FROM hourly
+            WHERE proxy_key = ? AND hour >= ? ORDER BY hour
+        """, (proxy_key, since - since % 3600)).fetchall()
+        recent = conn.execute("""
+            SELECT ts, alive, latency_ms, failure_class FROM observations
+            WHERE proxy_key = ? ORDER BY ts DESC LIMIT 20
+        """, (proxy_key,)).fetchall()
     
-    # Tính toán một số metrics hữu ích
-    alive_count = len(proxy_cache.get('http', []))
-    total_checked = proxy_cache.get('total_checked', 0)
-    success_rate = round(alive_count/total_checked*100, 1) if total_checked > 0 else 0
+    def iso(ts):
+        return datetime.fromtimestamp(ts).isoformat() if ts else None
     
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'cache_count': alive_count,
-        'service': 'proxy-validation-render',
-        'startup_status': startup_status,
-        'metrics': {
-            'alive_proxies': alive_count,
-            'total_checked': total_checked,
-            'success_rate_percent': success_rate,
-            'last_update': proxy_cache.get('last_update', 'Never')
-        },
-        'fixed_bugs': [
-            'Loop bug fixed - no more restart from chunk 1',
-            'Condition fixed - completes after all chunks processed'
+    return {
+        "proxy": proxy_key,
+        "tier": get_proxy_tier(proxy_key),
+        "first_seen": iso(seen[0]) if seen else None,
+        "last_seen": iso(seen[1]) if seen else None,
+        "last_alive": iso(seen[2]) if seen else None,
+        "hourly": [
+            {"hour": iso(hour), "checks": checks, "uptime": round(alive_checks / checks, 4),
+             "avg_latency_ms": round(latency_sum / alive_checks) if alive_checks else None}
+            for hour, checks, alive_checks, latency_sum in hourly
+        ],
+        "recent": [
+            {"at": iso(ts), "alive": bool(alive), "latency_ms": latency_ms, "failure_class": failure_class}
+            for ts, alive, latency_ms, failure_class in recent
         ]
-    })
+    }
+
+def get_history_summary():
+    """History store stats cho monitoring"""
+    try:
+        db_bytes = os.path.getsize(HISTORY_DB_PATH)
+    except OSError:
+        db_bytes = 0
+    return {
+        "path": HISTORY_DB_PATH,
+        "db_bytes": db_bytes,
+        "queue_depth": len(history_queue),
+        "ranked_proxies": len(history_uptime),
+        "writer_alive": history_state["thread"] is not None and history_state["thread"].is_alive(),
+        **{name: value for name, value in history_state.items() if name != "thread"},
+        "schema_ready": history_connections["schema_ready"]
+    }
+
+def try_acquire_owner_lock(blocking=False):
+    """flock trên OWNER_LOCK_PATH. Lock giữ tới khi process chết → follower (blocking=True) takeover ngay"""
+    if fcntl is None or process_role["lock_file"] is not None:
+        return True
+    os.makedirs(SHARED_STATE_DIR, exist_ok=True)
+    lock_file = open(OWNER_LOCK_PATH, "a+")
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    process_role["lock_file"] = lock_file
+    return True
+
+def mark_shared_state_dirty():
+    """Pool/lease thay đổi → owner publisher ghi shared state (debounced)"""
+    if process_role["role"] == "owner":
+        shared_state_dirty.set()
+
+def queue_shared_state_ops(version, changes):
+    """Owner: ops của 1 snapshot publish chờ ghi vào delta log (caller giữ snapshot_publish_lock)"""
+    with shared_state_pending_lock:
+        shared_state_pending["ops"].append((version, changes))
+
+def queue_shared_lease_changes(keys, until):
+    """Owner: exclusive lease cấp (epoch hết hạn) / release (None) → followers ẩn / serve lại proxy"""
+    if process_role["role"] != "owner":
+        return
+    with shared_state_pending_lock:
+        shared_state_pending["leases"].extend([key, until] for key in keys)
+
+def _shared_state_log_path(generation):
+    return os.path.join(SHARED_STATE_DIR, f"proxy_service_state.{generation}.log")
+
+def _encode_shared_ops(ops):
+    """[(version, changes)] → [[op, tier, record | key]] theo thứ tự xảy ra (remove chỉ cần key)"""
+    return [
+        [op, tier_name, proxy if op == "add" else proxy_key_of(proxy)]
+        for _, changes in ops for _, op, tier_name, proxy in changes
+    ]
+
+def publish_shared_state():
+    """Owner: append 1 delta line (pool ops + exclusive leases) vào log. Chưa có log / log đầy → rotate (base mới)"""
+    with shared_state_write_lock:
+        with shared_state_pending_lock:
+            ops, leases = shared_state_pending["ops"], shared_state_pending["leases"]
+            shared_state_pending["ops"] = []
+            shared_state_pending["leases"] = []
+        snapshot = pool_snapshot
+        if shared_state_log["file"] is None or shared_state_log["bytes"] >= SHARED_STATE_LOG_MAX_BYTES:
+            # Base chứa state tới snapshot["version"]; ops publish sau đó (version lớn hơn) vẫn ghi vào log mới
+            rotate_shared_state(snapshot)
+            ops = [entry for entry in ops if entry[0] > snapshot["version"]]
+            leases = []  # Base đã có toàn bộ exclusive leases hiện tại
+        version = max([snapshot["version"]] + [entry[0] for entry in ops])
+        if not ops and not leases and version == shared_state_log["version"]:
+            return
+        line = json.dumps({
+            "version": version,
+            "fresh": snapshot["summary"]["FRESH"],
+            "ops": _encode_shared_ops(ops),
+            "leases": leases
+        }, separators=(",", ":")) + "\n"
+        try:
+            shared_state_log["file"].write(line)
+            shared_state_log["file"].flush()
+        except OSError:
+            shared_state_log["file"].close()
+            shared_state_log["file"] = None  # Ops đã mất khỏi log → lần publish sau ghi base mới
+            raise
+        shared_state_log["bytes"] += len(line)
+        shared_state_log["version"] = version
+        process_role["publishes"] += 1
+
+def rotate_shared_state(snapshot):
+    """Owner: generation mới = base snapshot (atomic: tmp file + os.replace) + delta log rỗng.
+
+    Log cũ (của owner này hoặc owner trước khi takeover) nhận marker "rotate" → followers load base mới.
+    """
+    previous_base_log = None
+    if shared_state_log["path"] is None and shared_state_sync["path"] is None:
+        # Owner đầu tiên sau restart: log của lần chạy trước (nếu còn trong /dev/shm) cần dọn
+        try:
+            with open(SHARED_STATE_PATH, encoding="utf-8") as f:
+                previous_base_log = os.path.join(SHARED_STATE_DIR, json.load(f)["log"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    generation = uuid.uuid4().hex[:12]
+    log_path = _shared_state_log_path(generation)
+    log_file = open(log_path, "a", encoding="utf-8")
+    now_monotonic = time.monotonic()
+    now = time.time()
+    with lease_lock:
+        exclusive_until = {
+            key: lease["expires_at"] - now_monotonic + now
+            for lease in active_leases.values() if lease["mode"] == "exclusive"
+            for key in lease["keys"]
+        }
+    state = {
+        "generation": generation,
+        "log": os.path.basename(log_path),
+        "version": snapshot["version"],
+        "published_at": snapshot["published_at"],
+        "owner_pid": os.getpid(),
+        "owner_port": process_role["control_port"],
+        "pools": {tier_name: list(snapshot["pools"][tier_name]) for tier_name in READ_TIERS},
+        "fresh": snapshot["summary"]["FRESH"],
+        "exclusive_until": exclusive_until
+    }
+    tmp_path = f"{SHARED_STATE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp_path, SHARED_STATE_PATH)
+    
+    previous_path = shared_state_log["path"] or shared_state_sync["path"] or previous_base_log
+    if shared_state_log["file"] is not None:
+        shared_state_log["file"].close()
+    if previous_path and previous_path != log_path:
+        try:
+            with open(previous_path, "a", encoding="utf-8") as f:
+                # "\n" trước marker: owner cũ có thể chết giữa chừng 1 dòng
+                f.write("\n" + json.dumps({"rotate": generation}) + "\n")
+            os.unlink(previous_path)
+        except OSError:
+            pass
+    shared_state_log.update({"generation": generation, "path": log_path, "file": log_file, "bytes": 0,
+                             "version": snapshot["version"]})
+    process_role["state_generation"] = generation
+    process_role["rotations"] += 1
+
+def shared_state_publisher_loop():
+    """Owner thread: publish shared state khi dirty, tối đa 1 lần / SHARED_STATE_MIN_INTERVAL"""
+    while True:
+        shared_state_dirty.wait()
+        # Idle → publish ngay; burst mutations (transfer, reconcile) trong interval gộp vào 1 dòng delta
+        delay = shared_state_log["last_publish"] + SHARED_STATE_MIN_INTERVAL - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        shared_state_dirty.clear()
+        shared_state_log["last_publish"] = time.monotonic()
+        try:
+            publish_shared_state()
+        except (OSError, TypeError, ValueError) as e:
+            log_to_render(f"❌ SHARED STATE PUBLISH ERROR: {str(e)}")
+
+def install_shared_state(state):
+    """Follower: thay pools local bằng base snapshot của owner, rebuild membership + indexes (chỉ start / rotate)"""
+    global shared_exclusive_until
+    for pool_name in SNAPSHOT_POOLS:
+        with pool_locks[pool_name]:
+            if pool_name in pool_indexes:
+                _release_membership(proxy_pools[pool_name])
+            _queue_pool_changes(pool_name, removed=proxy_pools[pool_name])
+            proxy_pools[pool_name] = []
+    for pool_name in READ_TIERS:
+        with pool_locks[pool_name]:
+            proxy_pools[pool_name] = _claim_membership(pool_name, state["pools"].get(pool_name, []))
+            _index_rebuild(pool_name)
+            _queue_pool_changes(pool_name, added=proxy_pools[pool_name])
+    
+    shared_exclusive_until = state.get("exclusive_until", {})
+    shared_exclusive_next["stale"] = True
+    lease_stats["exclusive_changes"] += 1
+    shared_state_sync["fresh"] = state.get("fresh", 0)
+    process_role["owner_pid"] = state.get("owner_pid")
+    process_role["owner_port"] = state.get("owner_port")
+    process_role["state_generation"] = state.get("generation")
+    process_role["state_version"] = state["version"]
+    process_role["installs"] += 1
+    publish_pool_snapshot(version=state["version"])
+
+def apply_shared_state_deltas(deltas):
+    """Follower: apply ops theo thứ tự owner ghi - O(số records đổi), 1 snapshot publish cho cả batch.
+
+    Remove chỉ có hiệu lực khi key còn ở đúng tier đó (transfer = remove tier cũ + add tier mới).
+    """
+    final = {}
+    lease_changed = False
+    for delta in deltas:
+        for op, tier_name, value in delta["ops"]:
+            if op == "add":
+                final[proxy_key_of(value)] = (tier_name, value)
+                continue
+            current = final[value] if value in final else proxy_membership.get(value)
+            if current is not None and current[0] == tier_name:
+                final[value] = None
+        for key, until in delta["leases"]:
+            lease_changed = True
+            if until is None:
+                shared_exclusive_until.pop(key, None)
+            else:
+                shared_exclusive_until[key] = until
+    
+    removed = {}
+    added = {}
+    for key, target in final.items():
+        entry = proxy_membership.get(key)
+        if entry is not None and target is not None and entry[0] == target[0] and entry[1] == target[1]:
+            continue  # Re-publish record y hệt → không đổi index
+        if entry is not None:
+            removed.setdefault(entry[0], []).append(entry[1])
+        if target is not None:
+            added.setdefault(target[0], []).append(target[1])
+    # Remove hết trước rồi mới add → key chuyển tier không bị membership reject
+    for tier_name, records in removed.items():
+        with pool_locks[tier_name]:
+            _pool_remove(tier_name, records)
+    for tier_name, records in added.items():
+        with pool_locks[tier_name]:
+            admitted = _claim_membership(tier_name, records)
+            proxy_pools[tier_name].extend(admitted)
+            _index_add(tier_name, admitted)
+            _queue_pool_changes(tier_name, added=admitted)
+    
+    if lease_changed:
+        shared_exclusive_next["stale"] = True
+        lease_stats["exclusive_changes"] += 1
+    latest = deltas[-1]
+    shared_state_sync["fresh"] = latest["fresh"]
+    shared_state_sync["version"] = latest["version"]
+    process_role["state_version"] = latest["version"]
+    process_role["deltas_applied"] += len(deltas)
+    publish_pool_snapshot(version=latest["version"])
+
+def load_shared_state_base():
+    """Follower: load base snapshot + mở delta log của generation đó. False nếu owner chưa publish"""
+    try:
+        with open(SHARED_STATE_PATH, encoding="utf-8") as f:
+            state = json.load(f)
+        log_path = os.path.join(SHARED_STATE_DIR, state["log"])
+        log_file = open(log_path, "rb", buffering=0)
+    except (OSError, ValueError, KeyError):
+        return False  # Chưa publish / owner đang rotate → thử lại lần sau
+    if shared_state_sync["file"] is not None:
+        shared_state_sync["file"].close()
+    install_shared_state(state)
+    shared_state_sync.update({"generation": state["generation"], "path": log_path, "file": log_file,
+                              "buffer": b"", "version": state["version"]})
+    return True
+
+def sync_shared_state():
+    """Follower: apply delta lines mới của owner (1 read syscall khi không đổi). Trả về True nếu state đổi"""
+    with shared_state_sync_lock:
+        if shared_state_sync["file"] is None:
+            return load_shared_state_base()
+        data = shared_state_sync["file"].read()
+        if not data:
+            return False
+        complete, _, shared_state_sync["buffer"] = (shared_state_sync["buffer"] + data).rpartition(b"\n")
+        deltas = []
+        for line in complete.split(b"\n"):
+            if not line.strip():
+                continue
+            try:
+                delta = json.loads(line)
+            except ValueError:
+                process_role["delta_errors"] += 1
+                continue
+            if "rotate" in delta:
+                # Owner rotate / owner mới takeover → apply phần trước marker rồi load base mới
+                if deltas:
+                    apply_shared_state_deltas(deltas)
+                shared_state_sync["file"].close()
+                shared_state_sync["file"] = None
+                load_shared_state_base()
+                return True
+            deltas.append(delta)  # Log của 1 generation chỉ chứa ops sau base → apply tất cả
+        if deltas:
+            apply_shared_state_deltas(deltas)
+        return bool(deltas)
+
+def follower_loop():
+    """Follower thread: block trên owner lock - owner chết (kernel release flock) → takeover.
+
+    Follower không sync định kỳ: local endpoints catch up delta log trước mỗi request (forward_to_owner).
+    """
+    try_acquire_owner_lock(blocking=True)
+    log_to_render(f"👑 OWNER TAKEOVER: process {os.getpid()} (owner {process_role['owner_pid']} đã dừng)")
+    start_owner_services(takeover=True)
+    follower_report_wakeup.set()  # Report thread thấy role mới → thoát
+
+def follower_report_loop():
+    """Follower thread: ngủ tới khi record_served / emergency / request metrics signal, rồi gửi report + share metrics"""
+    while True:
+        follower_report_wakeup.wait()
+        if process_role["role"] != "follower":
+            return
+        # Gộp burst requests: tối đa 1 report / SHARED_STATE_MIN_INTERVAL
+        delay = follower_report["last_sent"] + SHARED_STATE_MIN_INTERVAL - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        follower_report_wakeup.clear()
+        follower_report["last_sent"] = time.monotonic()
+        if not send_follower_report():
+            sync_shared_state()  # Owner mới takeover → port mới nằm trong base snapshot mới
+            follower_report_wakeup.set()  # Owner chưa sẵn sàng / đang takeover → retry sau interval
+        share_process_metrics()
+
+def send_follower_report():
+    """Follower: gửi served count + emergency trigger đã gom về owner. Lỗi → giữ lại, gửi lần sau (trả về False)"""
+    with follower_report_lock:
+        report = {name: follower_report[name] for name in ("served", "last_served", "emergency")}
+        follower_report["served"] = 0
+        follower_report["emergency"] = None
+    if not report["served"] and report["emergency"] is None:
+        return True
+    try:
+        if not process_role["owner_port"]:
+            raise requests.RequestException("owner not ready")
+        response = owner_session.post(f"http://127.0.0.1:{process_role['owner_port']}/api/internal/follower_report",
+                                      json=report, timeout=5)
+        response.raise_for_status()
+        follower_report["sent"] += 1
+    except requests.RequestException:
+        with follower_report_lock:
+            follower_report["served"] += report["served"]
+            follower_report["emergency"] = follower_report["emergency"] or report["emergency"]
+        follower_report["errors"] += 1
+        return False
+    return True
+
+def start_owner_control_server():
+    """Owner: loopback HTTP server (cùng Flask app) cho requests followers forward sang"""
+    server = make_server("127.0.0.1", int(os.environ.get("PROXY_OWNER_PORT", 0)), app, threaded=True)
+    process_role["control_port"] = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port
 
-@app.route('/api/force/initial', methods=['POST'])
-def force_initial_mode():
-    """Force switch về initial fetch mode"""
+def start_owner_services(takeover=False):
+    """Background work chỉ chạy trong owner process: blacklist, history, warm start, scheduler, shared state"""
+    process_role["role"] = "owner"
+    process_role["owner_pid"] = os.getpid()
+    process_role["became_owner_at"] = datetime.now().isoformat()
+    
+    # Permanent blacklist từ lần chạy trước
+    load_permanent_blacklist()
+    
+    # History store writer (validation outcomes → SQLite, ngoài check hot path)
+    start_history_writer()
+    
+    # Takeover: serving tiers mới nhất là state follower vừa sync từ owner cũ (mới hơn warm start trên disk).
+    # Follower không giữ FRESH candidates → FRESH lấy từ warm start
+    if takeover:
+        sync_shared_state()
+    latest_pools = {tier_name: list(pool_snapshot["pools"][tier_name]) for tier_name in READ_TIERS} if takeover else None
+    
+    # Warm start: serve ngay proxy của lần chạy trước, maintenance re-validate ở background
+    if load_warm_start_snapshot():
+        pool_stats["maintenance_stats"]["catching_up"] = True
+    if latest_pools and any(latest_pools.values()):
+        for tier_name in READ_TIERS:
+            pool_replace(tier_name, [], publish=False)
+        for tier_name in READ_TIERS:
+            pool_replace(tier_name, latest_pools[tier_name], publish=False)
+        publish_pool_snapshot()
+    
     try:
-        # Note: Trong production, cần implement proper global state management
-        log_to_render("🔄 API TRIGGER: Force switch về INITIAL FETCH MODE requested")
-        
-        return jsonify({
-            'success': True,
-            'message': 'Signal sent to switch to initial fetch mode on next cycle',
-            'note': 'Change will take effect in next background cycle',
-            'timestamp': datetime.now().isoformat()
-        })
+        log_to_render(f"🔌 OWNER CONTROL: 127.0.0.1:{start_owner_control_server()} (followers forward API calls)")
+    except OSError as e:
+        log_to_render(f"❌ OWNER CONTROL SERVER ERROR: {str(e)}")
+        startup_status["error_count"] += 1
+    threading.Thread(target=shared_state_publisher_loop, daemon=True).start()
+    mark_shared_state_dirty()
+    
+    # Start unified scheduler (thay cho 4 free-running worker threads)
+    log_to_render("🔄 STARTING ULTRA SMART SCHEDULER...")
+    
+    try:
+        scheduler_thread = start_scheduler()
+        if scheduler_thread.is_alive():
+            log_to_render(f"✅ SCHEDULER: {', '.join(SCHEDULER_JOBS)} jobs scheduled!")
+            startup_status["workers_started"] = True
+        else:
+            log_to_render("❌ SCHEDULER thread not alive!")
+            startup_status["error_count"] += 1
         
     except Exception as e:
+        log_to_render(f"❌ LỖI khởi động scheduler: {str(e)}")
+        startup_status["error_count"] += 1
+
+def start_follower():
+    """Follower: không chạy background jobs, chỉ sync pool state từ owner và serve reads"""
+    process_role["role"] = "follower"
+    sync_shared_state()
+    threading.Thread(target=follower_loop, daemon=True).start()
+    threading.Thread(target=follower_report_loop, daemon=True).start()
+    log_to_render(f"👥 FOLLOWER: process {os.getpid()} serve reads từ shared state của owner {process_role['owner_pid']}")
+
+def get_process_summary():
+    """Role của process này + shared state stats"""
+    return {
+        "pid": os.getpid(),
+        "shared_state_path": SHARED_STATE_PATH,
+        **{name: value for name, value in process_role.items() if name != "lock_file"},
+        "follower_report": {name: follower_report[name] for name in ("sent", "errors")}
+    }
+
+@app.route('/api/internal/follower_report', methods=['POST'])
+def receive_follower_report():
+    """Owner: served count + emergency trigger từ follower workers (chỉ nhận qua loopback control port)"""
+    if process_role["role"] != "owner" or request.environ.get("SERVER_PORT") != str(process_role["control_port"]):
         return jsonify({
             'success': False,
-            'error': str(e)
-        }), 500
+            'error': 'Not found'
+        }), 404
+    report = request.get_json(silent=True) or {}
+    served = int(report.get('served') or 0)
+    if served > 0:
+        pool_stats["total_served"] += served
+        pool_stats["last_update"] = report.get('last_served') or datetime.now().isoformat()
+    if report.get('emergency'):
+        trigger_emergency_mode(report['emergency'])
+    process_role["follower_reports"] += 1
+    return jsonify({'success': True})
 
-@app.route('/api/ultra/demo', methods=['GET'])
-def ultra_smart_demo():
-    """DEMO endpoint để show off ULTRA SMART capabilities"""
-    try:
-        log_to_render("🎯 ULTRA SMART DEMO requested!")
-        
-        # Get current pools status
-        pools_summary = get_pool_summary()
-        
-        # Simulate smart request
-        demo_request_count = int(request.args.get('count', 100))
-        demo_proxies = smart_proxy_request(demo_request_count)
-        
+@app.before_request
+def forward_to_owner():
+    """Follower chỉ serve read hot path từ state local; API khác forward sang owner qua loopback"""
+    if process_role["role"] != "follower":
+        return None
+    if request.endpoint in FOLLOWER_LOCAL_ENDPOINTS:
+        # Catch up delta log trước khi serve → exclusive lease owner vừa cấp có hiệu lực ngay (1 read khi không đổi)
+        sync_shared_state()
+        return None
+    if request.endpoint in OWNER_INTERNAL_ENDPOINTS:
         return jsonify({
-            'demo': 'ULTRA_SMART_MULTI_TIER_SYSTEM',
-            'guarantee': f"ALWAYS ≥{MINIMUM_GUARANTEED} proxy ready",
-            'request_demo': {
-                'requested': demo_request_count,
-                'delivered': len(demo_proxies),
-                'delivery_rate': round(len(demo_proxies)/demo_request_count*100, 1) if demo_request_count > 0 else 0
-            },
-            'current_pools': pools_summary,
-            'architecture': {
-                'PRIMARY': f"Ready-to-use pool ({TARGET_POOLS['PRIMARY']} target)",
-                'STANDBY': f"Backup pool ({TARGET_POOLS['STANDBY']} target)", 
-                'EMERGENCY': f"Emergency pool ({TARGET_POOLS['EMERGENCY']} target)",
-                'FRESH': "Continuous fetching pipeline"
-            },
-            'workers': {
-                'worker1': 'Continuous fetch từ sources (24/7)',
-                'worker2': 'Rolling validation FRESH→STANDBY→PRIMARY',
-                'worker3': 'Auto pool balancing và promotion'
-            },
-            'benefits': [
-                'Zero downtime: Luôn có proxy ready',
-                'Multi-tier fallback: PRIMARY→STANDBY→EMERGENCY',
-                'Continuous operation: Không bao giờ dừng fetch',
-                'Smart balancing: Auto promote pools',
-                'Guarantee: >500 proxy lúc nào cũng sẵn sàng'
-            ],
-            'vs_old_system': {
-                'old': 'Single pool, maintenance gaps, periodic fetch',
-                'new': 'Multi-tier, zero gaps, continuous operation'
-            },
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
+            'success': False,
+            'error': 'Not found'
+        }), 404
+    owner_port = process_role["owner_port"]
+    if not owner_port:
         return jsonify({
-            'demo': 'ERROR',
-            'error': str(e)
-        }), 500
-
-@app.route('/api/resurrection/stats', methods=['GET'])
-def get_resurrection_stats():
-    """API chi tiết về resurrection system - Dead proxy comeback stats"""
+            'success': False,
+            'error': 'Owner process not ready'
+        }), 503
+    stream = request.endpoint in FOLLOWER_STREAM_ENDPOINTS
+    if stream and not acquire_dashboard_stream_slot():
+        return dashboard_stream_busy_response()
     try:
-        # Detailed resurrection statistics
-        resurrection_stats = pool_stats.get("resurrection_stats", {})
-        
-        # Dead categories với detailed info
-        dead_categories_detailed = {}
-        total_dead_tracked = 0
-        
-        for category in ["immediate_retry", "short_delay", "medium_delay", "long_delay", "permanent_dead"]:
-            category_list = dead_proxy_management.get(category, [])
-            count = len(category_list)
-            total_dead_tracked += count
-            
-            # Calculate time until next retry for scheduled categories
-            next_retries = []
-            if category != "permanent_dead" and category_list:
-                current_time = datetime.now()
-                for item in category_list[:5]:  # Show next 5
-                    try:
-                        next_retry = datetime.fromisoformat(item['next_retry'])
-                        time_remaining = (next_retry - current_time).total_seconds()
-                        if time_remaining > 0:
-                            next_retries.append({
-                                'proxy': item['proxy_key'],
-                                'retry_in_seconds': int(time_remaining),
-                                'retry_in_minutes': round(time_remaining / 60, 1),
-                                'failure_count': item['failure_count']
-                            })
-                    except:
-                        continue
-            
-            dead_categories_detailed[category] = {
-                'count': count,
-                'delay_minutes': RESURRECTION_DELAYS.get(category, 0) / 60,
-                'next_retries': next_retries[:3],  # Show top 3
-                'description': {
-                    'immediate_retry': 'First death - retry immediately',
-                    'short_delay': 'Second death - retry in 5 minutes',
-                    'medium_delay': 'Third death - retry in 30 minutes', 
-                    'long_delay': 'Fourth death - retry in 2 hours',
-                    'permanent_dead': 'Fifth+ death - permanently blacklisted'
-                }.get(category, 'Unknown category')
-            }
-        
-        # Calculate resurrection success rate
-        total_attempts = resurrection_stats.get('resurrection_attempts', 0)
-        total_resurrected = resurrection_stats.get('total_resurrected', 0)
-        success_rate = round(total_resurrected / total_attempts * 100, 1) if total_attempts > 0 else 0
-        
-        # Recent resurrection activity
-        last_resurrection = resurrection_stats.get('last_resurrection')
-        resurrection_age = None
-        if last_resurrection:
-            try:
-                last_time = datetime.fromisoformat(last_resurrection)
-                resurrection_age = int((datetime.now() - last_time).total_seconds() / 60)
-            except:
-                resurrection_age = None
-        
-        return jsonify({
-            'success': True,
-            'resurrection_enabled': True,
-            'summary': {
-                'total_dead_tracked': total_dead_tracked,
-                'total_resurrection_attempts': total_attempts,
-                'total_successfully_resurrected': total_resurrected,
-                'resurrection_success_rate': success_rate,
-                'last_resurrection_minutes_ago': resurrection_age
-            },
-            'dead_categories': dead_categories_detailed,
-            'resurrection_logic': {
-                'exponential_backoff': True,
-                'max_attempts': RESURRECTION_DELAYS['permanent_threshold'],
-                'delays': {
-                    'immediate': '0 minutes (next cycle)',
-                    'short': '5 minutes',
-                    'medium': '30 minutes',
-                    'long': '2 hours',
-                    'permanent': 'Never (blacklisted)'
-                }
-            },
-            'benefits': [
-                'Dead proxy có cơ hội comeback',
-                'Exponential backoff để tránh spam',
-                'Smart categorization theo failure count',
-                'Automatic resurrection attempts',
-                'Permanent blacklist cho hopeless cases'
-            ],
-            'worker_info': {
-                'worker4_active': worker_control.get('resurrection_active', True),
-                'check_interval': '60 seconds',
-                'resurrection_pool': 'STANDBY (validated proxy go back to STANDBY)'
-            },
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        log_to_render(f"❌ Resurrection stats API error: {str(e)}")
+        response = owner_session.request(
+            request.method, f"http://127.0.0.1:{owner_port}{request.full_path}",
+            data=request.get_data(),
+            headers={name: value for name, value in request.headers.items()
+                     if name.lower() in ("content-type", "accept", "if-none-match", "last-event-id", "x-cluster-secret")},
+            timeout=(OWNER_FORWARD_TIMEOUT, None) if stream else OWNER_FORWARD_TIMEOUT,
+            stream=stream
+        )
+    except requests.RequestException as e:
+        if stream:
+            release_dashboard_stream_slot()
+        process_role["forward_errors"] += 1
         return jsonify({
             'success': False,
-            'error': str(e),
-            'resurrection_enabled': True
-        }), 500
+            'error': f'Owner process unavailable: {str(e)}'
+        }), 503
+    process_role["forwarded"] += 1
+    headers = [(name, value) for name, value in response.headers.items()
+               if name.lower() not in ("content-encoding", "content-length", "transfer-encoding", "connection")]
+    if stream:
+        def relay():
+            try:
+                yield from response.iter_content(chunk_size=None)
+            finally:
+                response.close()  # Client ngắt → đóng connection tới owner
+        relayed = Response(relay(), status=response.status_code, headers=headers)
+        relayed.call_on_close(release_dashboard_stream_slot)
+        return relayed
+    return Response(response.content, status=response.status_code, headers=headers)
 
-@app.route('/api/force/accept', methods=['POST'])
-def force_accept_current():
-    """Force accept current proxy count và stop infinite loop"""
+def build_dashboard_payload(channel):
+    """Payload của 1 dashboard stream channel"""
+    if channel == "stats":
+        return build_proxy_stats()
+    if channel == "system":
+        return dict(startup_status)
+    if channel == "strategy":
+        return build_strategy()
+    return build_resurrection_stats()
+
+def publish_dashboard_updates():
+    """Build logs mới + channels tới hạn 1 lần, append event khi payload khác lần trước. Trả về số events"""
+    now = time.monotonic()
+    events = []
+    
+    new_logs = [entry for entry in list(log_buffer) if entry["seq"] > dashboard_stream["log_seq"]]
+    if new_logs:
+        dashboard_stream["log_seq"] = new_logs[-1]["seq"]
+        events.append(("logs", json.dumps(new_logs)))
+    
+    for channel, interval in DASHBOARD_STREAM_CHANNELS.items():
+        if now < dashboard_stream["next_refresh"].get(channel, 0):
+            continue
+        dashboard_stream["next_refresh"][channel] = now + interval
+        payload = build_dashboard_payload(channel)
+        dashboard_stream["builds"] += 1
+        # Timestamp luôn đổi → không tính vào fingerprint, chỉ push khi data thật sự đổi
+        fingerprint = json.dumps({k: v for k, v in payload.items() if k != "timestamp"}, sort_keys=True, default=str)
+        if fingerprint == dashboard_stream["fingerprints"].get(channel):
+            continue
+        dashboard_stream["fingerprints"][channel] = fingerprint
+        events.append((channel, json.dumps(payload, default=str)))
+    
+    if not events:
+        return 0
+    with dashboard_stream_condition:
+        for channel, data in events:
+            dashboard_stream["seq"] += 1
+            event = (dashboard_stream["seq"], channel, data)
+            dashboard_stream["events"].append(event)
+            if channel != "logs":
+                dashboard_stream["latest"][channel] = event
+        dashboard_stream["pushed"] += len(events)
+        dashboard_stream_condition.notify_all()
+    return len(events)
+
+def dashboard_viewers_active(now):
+    """Có stream đang mở hoặc poll viewer trong 2 chu kỳ poll gần nhất"""
+    last_poll = dashboard_stream["last_poll"]
+    return dashboard_stream["subscribers"] > 0 or (last_poll is not None and now - last_poll < DASHBOARD_POLL_INTERVAL * 2)
+
+def wake_dashboard_stream():
+    """Log sink flush → broadcaster push logs ngay (không viewer → không đánh thức)"""
+    if dashboard_viewers_active(time.monotonic()):
+        dashboard_stream_wakeup.set()
+
+def dashboard_stream_timeout(now):
+    """Giây tới channel kế tiếp tới hạn rebuild / poll viewer hết hạn. None = không viewer → chờ tới khi có"""
+    if not dashboard_viewers_active(now):
+        return None
+    deadlines = list(dashboard_stream["next_refresh"].values())
+    if not dashboard_stream["subscribers"] and dashboard_stream["last_poll"] is not None:
+        deadlines.append(dashboard_stream["last_poll"] + DASHBOARD_POLL_INTERVAL * 2)
+    return max(0, min(deadlines) - now) if deadlines else 0
+
+def dashboard_stream_loop():
+    """Broadcaster thread: ngủ tới khi có viewer, rồi build khi logs mới / channel tới hạn"""
+    while True:
+        dashboard_stream_wakeup.wait(dashboard_stream_timeout(time.monotonic()))
+        dashboard_stream_wakeup.clear()
+        if not dashboard_viewers_active(time.monotonic()):
+            continue
+        try:
+            publish_dashboard_updates()
+        except Exception as e:
+            log_to_render(f"❌ DASHBOARD STREAM ERROR: {str(e)}")
+
+def start_dashboard_stream():
+    """Start broadcaster thread lần đầu có viewer (lazy - process không có viewer không tốn gì)"""
+    with dashboard_stream_condition:
+        if dashboard_stream["thread"] is None:
+            dashboard_stream["thread"] = threading.Thread(target=dashboard_stream_loop, daemon=True)
+            dashboard_stream["thread"].start()
+            log_flush_listeners.append(wake_dashboard_stream)
+
+def format_sse(channel, data, event_id=None):
+    """1 SSE event (data là JSON 1 dòng)"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {channel}\ndata: {data}\n\n"
+
+def dashboard_stream_events(last_event_id=None):
+    """Generator cho 1 SSE connection: initial state (hoặc resume theo Last-Event-ID), rồi events mới"""
+    with dashboard_stream_condition:
+        if not dashboard_viewers_active(time.monotonic()):
+            dashboard_stream["next_refresh"].clear()  # Payloads có thể cũ từ lần cuối có viewer → rebuild ngay
+        dashboard_stream["subscribers"] += 1
+        dashboard_stream["connections"] += 1
+        cursor = dashboard_stream["seq"]
+        backlog = list(dashboard_stream["events"])
+        latest = sorted(dashboard_stream["latest"].values())
+    dashboard_stream_wakeup.set()
+    
     try:
-        global startup_status
-        
-        current_proxies = proxy_cache.get('http', [])
-        
-        log_to_render("🔒 API TRIGGER: Force accept current proxy count")
-        log_to_render(f"✅ ACCEPT {len(current_proxies)} proxy live (manual override)")
-        
-        with cache_lock:
-            startup_status["target_achieved"] = True
-            startup_status["existing_live_proxies"] = []
+        yield "retry: 3000\n\n"
+        if last_event_id is not None and backlog and backlog[0][0] <= last_event_id + 1 and last_event_id <= cursor:
+            # Reconnect: chỉ gửi events bị lỡ
+            for seq, channel, data in backlog:
+                if seq > last_event_id:
+                    yield format_sse(channel, data, seq)
+        else:
+            initial_logs = list(log_buffer)[-DASHBOARD_STREAM_INITIAL_LOGS:]
+            yield format_sse("logs", json.dumps(initial_logs))
+            for seq, channel, data in latest:
+                yield format_sse(channel, data)
+            yield format_sse("ready", json.dumps({"seq": cursor}), cursor)
         
-        return jsonify({
+        while True:
+            with dashboard_stream_condition:
+                dashboard_stream_condition.wait_for(lambda: dashboard_stream["seq"] > cursor, timeout=DASHBOARD_STREAM_KEEPALIVE)
+                pending = list(itertools.takewhile(lambda event: event[0] > cursor, reversed(dashboard_stream["events"])))
+            if not pending:
+                yield ": keepalive\n\n"
+                continue
+            for seq, channel, data in reversed(pending):
+                yield format_sse(channel, data, seq)
+            cursor = pending[0][0]
+    finally:
+        with dashboard_stream_condition:
+            dashboard_stream["subscribers"] -= 1
+
+def poll_dashboard_events(after):
+    """Events sau cursor `after` cho poll viewer. (cache_key, build): cursor quá cũ / thiếu → reset = state đầy đủ"""
+    now = time.monotonic()
+    with dashboard_stream_condition:
+        if not dashboard_viewers_active(now):
+            dashboard_stream["next_refresh"].clear()
+        dashboard_stream["last_poll"] = now
+        dashboard_stream["polls"] += 1
+        seq = dashboard_stream["seq"]
+        oldest = dashboard_stream["events"][0][0] if dashboard_stream["events"] else seq + 1
+    dashboard_stream_wakeup.set()
+    resumable = after is not None and oldest <= after + 1 and after <= seq
+    
+    def build():
+        with dashboard_stream_condition:
+            if resumable:
+                selected = list(itertools.takewhile(lambda event: event[0] > after, reversed(dashboard_stream["events"])))
+                selected = [event for event in reversed(selected) if event[0] <= seq]
+            else:
+                selected = sorted(dashboard_stream["latest"].values())
+        events = [{"channel": channel, "data": json.loads(data)} for _, channel, data in selected]
+        if not resumable:
+            events.insert(0, {"channel": "logs", "data": list(log_buffer)[-DASHBOARD_STREAM_INITIAL_LOGS:]})
+        return {
             'success': True,
-            'message': f'Accepted {len(current_proxies)} proxies and stopped infinite loop',
-            'current_proxy_count': len(current_proxies),
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+            'seq': seq,
+            'reset': not resumable,
+            'events': events
+        }
+    
+    return ('dashboard_poll', after if resumable else 'reset', seq), build
 
-# SMART DEAD PROXY RESURRECTION SYSTEM
-# Dead proxy có cơ hội comeback với intelligent retry
-# Enhanced pool statistics already defined above - no duplicate needed
+def acquire_dashboard_stream_slot():
+    """Giữ 1 slot stream trong process này. False khi đã đủ DASHBOARD_STREAM_MAX_PER_PROCESS"""
+    with dashboard_stream_condition:
+        if dashboard_stream["local_streams"] >= DASHBOARD_STREAM_MAX_PER_PROCESS:
+            dashboard_stream["rejected"] += 1
+            return False
+        dashboard_stream["local_streams"] += 1
+        return True
 
-# DEAD proxy management với resurrection scheduling
-dead_proxy_management = {
-    "immediate_retry": [],      # Retry ngay (lần đầu dead)
-    "short_delay": [],         # Retry sau 5 phút  
-    "medium_delay": [],        # Retry sau 30 phút
-    "long_delay": [],          # Retry sau 2 giờ
-    "permanent_dead": []       # Permanent blacklist (sau nhiều lần fail)
-}
+def release_dashboard_stream_slot():
+    """Trả slot khi response đóng (kể cả generator chưa chạy lần nào)"""
+    with dashboard_stream_condition:
+        dashboard_stream["local_streams"] -= 1
 
-# Resurrection schedules (exponential backoff)
-RESURRECTION_DELAYS = {
-    "immediate_retry": 0,      # 0 minutes (next cycle)
-    "short_delay": 300,        # 5 minutes
-    "medium_delay": 1800,      # 30 minutes  
-    "long_delay": 7200,        # 2 hours
-    "permanent_threshold": 5   # Sau 5 lần fail → permanent dead
-}
+def dashboard_stream_busy_response():
+    """503 khi hết slot stream - EventSource đóng hẳn và dashboard chuyển sang polling"""
+    response = jsonify({
+        'success': False,
+        'error': f'Too many dashboard streams (max {DASHBOARD_STREAM_MAX_PER_PROCESS} / process), use /api/stream/poll'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '60'
+    return response
 
-def categorize_dead_proxy(proxy_data, failure_count=1):
-    """Phân loại dead proxy theo failure count để schedule resurrection"""
-    proxy_key = f"{proxy_data.get('host', 'unknown')}:{proxy_data.get('port', 'unknown')}"
-    
-    resurrection_info = {
-        'proxy_data': proxy_data,
-        'failure_count': failure_count,
-        'last_failed': datetime.now().isoformat(),
-        'next_retry': None,
-        'proxy_key': proxy_key
+def get_dashboard_stream_summary():
+    """Dashboard stream stats cho monitoring"""
+    return {
+        "subscribers": dashboard_stream["subscribers"],
+        "max_per_process": DASHBOARD_STREAM_MAX_PER_PROCESS,
+        "seq": dashboard_stream["seq"],
+        "buffered_events": len(dashboard_stream["events"]),
+        **{name: dashboard_stream[name] for name in ("local_streams", "rejected", "polls", "connections", "pushed", "builds")}
     }
+
+def _cluster_hash(value):
+    """64-bit hash ổn định giữa các process/nodes (không dùng hash() vì bị randomize)"""
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+def build_cluster_ring(nodes):
+    """Consistent hash ring: CLUSTER_VNODES points / node"""
+    points = sorted((_cluster_hash(f"{node}#{vnode}"), node) for node in nodes for vnode in range(CLUSTER_VNODES))
+    return [point for point, _ in points], [node for _, node in points]
+
+def cluster_owner_of(proxy_key):
+    """Node chịu trách nhiệm validate proxy_key (node đầu tiên trên ring sau hash của key)"""
+    hashes, nodes = cluster_state["ring"]
+    if not hashes:
+        return CLUSTER_SELF
+    return nodes[bisect.bisect(hashes, _cluster_hash(proxy_key)) % len(hashes)]
+
+def is_cluster_leader():
+    """Node này có phải fetcher của cluster không (luôn True khi không chạy cluster mode)"""
+    return not CLUSTER_ENABLED or cluster_state["leader"] == CLUSTER_SELF
+
+def update_cluster_membership():
+    """Rebuild ring + leader khi tập nodes sống thay đổi. Trả về True nếu có thay đổi"""
+    now = time.monotonic()
+    alive = sorted([CLUSTER_SELF] + [
+        url for url, peer in cluster_state["peers"].items() if now - peer["last_ok"] < CLUSTER_PEER_TIMEOUT
+    ])
+    if alive == cluster_state["alive"]:
+        return False
     
-    with pool_locks["DEAD"]:
-        if failure_count == 1:
-            # Lần đầu dead → immediate retry
-            resurrection_info['next_retry'] = datetime.now().isoformat()
-            dead_proxy_management["immediate_retry"].append(resurrection_info)
-            log_to_render(f"💀➡️🔄 DEAD→IMMEDIATE: {proxy_key} (first failure)")
-            
-        elif failure_count == 2:
-            # Lần 2 dead → short delay
-            next_retry = datetime.now() + timedelta(seconds=RESURRECTION_DELAYS["short_delay"])
-            resurrection_info['next_retry'] = next_retry.isoformat()
-            dead_proxy_management["short_delay"].append(resurrection_info)
-            log_to_render(f"💀➡️⏳ DEAD→SHORT_DELAY: {proxy_key} (retry in 5min)")
-            
-        elif failure_count == 3:
-            # Lần 3 dead → medium delay
-            next_retry = datetime.now() + timedelta(seconds=RESURRECTION_DELAYS["medium_delay"])
-            resurrection_info['next_retry'] = next_retry.isoformat()
-            dead_proxy_management["medium_delay"].append(resurrection_info)
-            log_to_render(f"💀➡️⏰ DEAD→MEDIUM_DELAY: {proxy_key} (retry in 30min)")
-            
-        elif failure_count == 4:
-            # Lần 4 dead → long delay
-            next_retry = datetime.now() + timedelta(seconds=RESURRECTION_DELAYS["long_delay"])
-            resurrection_info['next_retry'] = next_retry.isoformat()
-            dead_proxy_management["long_delay"].append(resurrection_info)
-            log_to_render(f"💀➡️🕐 DEAD→LONG_DELAY: {proxy_key} (retry in 2h)")
-            
-        else:
-            # ≥5 lần dead → permanent dead
-            dead_proxy_management["permanent_dead"].append(resurrection_info)
-            log_to_render(f"💀➡️⚰️ DEAD→PERMANENT: {proxy_key} (after {failure_count} failures)")
+    previous_leader = cluster_state["leader"]
+    cluster_state["alive"] = alive
+    cluster_state["ring"] = build_cluster_ring(alive)
+    cluster_state["leader"] = alive[0]
+    log_to_render(f"🕸️ CLUSTER: {len(alive)} nodes alive, leader {alive[0]}")
+    if previous_leader is not None and alive[0] != previous_leader:
+        cluster_state["leader_changes"] += 1
+        if alive[0] == CLUSTER_SELF:
+            wake_job("fetch", "cluster_leader")
+    return True
 
-def get_proxies_ready_for_resurrection():
-    """Lấy các dead proxy sẵn sàng được resurrection theo schedule"""
-    ready_for_retry = []
-    current_time = datetime.now()
+def distribute_candidates(proxy_list, fetch_sources):
+    """Leader: chia candidates theo ring, push shard cho từng peer. Trả về shard của node này.
+
+    Peer không nhận được → shard đó validate local (không mất candidates).
+    """
+    shards = {}
+    for proxy_data in proxy_list:
+        shards.setdefault(cluster_owner_of(candidate_key_of(proxy_data)), []).append(proxy_data)
+    local = shards.pop(CLUSTER_SELF, [])
     
-    # Check từng delay category
-    for delay_category in ["immediate_retry", "short_delay", "medium_delay", "long_delay"]:
-        with pool_locks["DEAD"]:
-            proxy_list = dead_proxy_management[delay_category]
-            still_waiting = []
-            
-            for resurrection_info in proxy_list:
-                try:
-                    next_retry_time = datetime.fromisoformat(resurrection_info['next_retry'])
-                    
-                    if current_time >= next_retry_time:
-                        # Sẵn sàng retry
-                        ready_for_retry.append(resurrection_info)
-                        log_to_render(f"🔄 RESURRECTION READY: {resurrection_info['proxy_key']} from {delay_category}")
-                    else:
-                        # Vẫn phải chờ
-                        still_waiting.append(resurrection_info)
-                        
-                except Exception as e:
-                    log_to_render(f"❌ Error processing resurrection time: {str(e)}")
-                    still_waiting.append(resurrection_info)
-            
-            # Update list với những proxy vẫn đang chờ
-            dead_proxy_management[delay_category] = still_waiting
+    for url, candidates in shards.items():
+        sources = {candidate_key_of(p): fetch_sources.get(candidate_key_of(p)) for p in candidates}
+        try:
+            response = owner_session.post(f"{url}/api/cluster/candidates", json={
+                "from": CLUSTER_SELF, "candidates": candidates, "sources": sources
+            }, headers={"X-Cluster-Secret": CLUSTER_SECRET}, timeout=CLUSTER_REQUEST_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            cluster_state["push_failures"] += 1
+            log_to_render(f"⚠️ CLUSTER PUSH {url} FAILED: {str(e)} - validate {len(candidates)} candidates local")
+            local.extend(candidates)
+            continue
+        cluster_state["pushed"][url] = cluster_state["pushed"].get(url, 0) + len(candidates)
     
-    return ready_for_retry
+    log_to_render(f"🕸️ CLUSTER: distributed {len(proxy_list)} candidates → local shard {len(local)}")
+    return local
+
+def parse_cluster_candidate(item):
+    """JSON [type, proxy_string, protocol(s)] → FRESH tuple. None nếu sai shape hoặc không qua quality filter như fetch path"""
+    if not isinstance(item, list) or len(item) != 3:
+        return None
+    source_type, proxy_string, protocols = item
+    if not isinstance(source_type, str) or not isinstance(proxy_string, str):
+        return None
+    # categorized: protocol string, mixed: list protocols (như fetch path)
+    if not isinstance(protocols, str) and not (
+            isinstance(protocols, list) and protocols and all(isinstance(protocol, str) for protocol in protocols)):
+        return None
+    proxy_string = proxy_string.strip()
+    if not is_quality_proxy(proxy_string):
+        return None
+    host, port = proxy_string.split(':')
+    if len(host.split('.')) != 4 or not port.isdigit():
+        return None
+    return (source_type, proxy_string, protocols)
+
+def receive_candidates(candidates, sources):
+    """Non-leader: admit shard do leader push vào FRESH (JSON list → FRESH tuple)"""
+    parsed = [parse_cluster_candidate(item) for item in candidates]
+    valid = [candidate for candidate in parsed if candidate is not None]
+    cluster_state["received"] += len(candidates)
+    cluster_state["rejected"] += len(candidates) - len(valid)
+    if not isinstance(sources, dict):
+        sources = {}
+    return fresh_admit(valid, {key: source for key, source in sources.items() if isinstance(source, str)})
 
-def attempt_proxy_resurrection(resurrection_candidates):
+def job_cluster_sync():
+    """JOB cluster_sync: pull local tiers của peers → CLUSTER pool, update ring/leader theo peers còn sống"""
+    changed = False
+    for url, peer in cluster_state["peers"].items():
+        try:
+            response = owner_session.get(f"{url}/api/cluster/state", params={"since": peer["local_version"]},
+                                         headers={"X-Cluster-Secret": CLUSTER_SECRET}, timeout=CLUSTER_REQUEST_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            peer["failures"] += 1
+            peer["last_error"] = str(e)
+            continue
+        peer["last_ok"] = time.monotonic()
+        peer["failures"] = 0
+        peer["last_error"] = None
+        if not data.get("unchanged"):
+            peer["local_version"] = data["local_version"]
+            peer["records"] = data["proxies"]
+            changed = True
+    
+    if update_cluster_membership() or changed:
+        merged = [p for url in cluster_state["alive"] if url != CLUSTER_SELF for p in cluster_state["peers"][url]["records"]]
+        pool_replace("CLUSTER", merged)
+    cluster_state["syncs"] += 1
+    return None
+
+def get_cluster_summary():
+    """Cluster mode stats: ring, leader, peers, shard distribution"""
+    if not CLUSTER_ENABLED:
+        return {"enabled": False}
+    now = time.monotonic()
+    hashes, nodes = cluster_state["ring"]
+    return {
+        "enabled": True,
+        "self": CLUSTER_SELF,
+        "leader": cluster_state["leader"],
+        "is_leader": is_cluster_leader(),
+        "alive": cluster_state["alive"],
+        "configured": CLUSTER_NODES,
+        "ring_points": len(hashes),
+        "local_proxies": pool_snapshot["summary"]["TOTAL_AVAILABLE"],
+        "cluster_proxies": pool_snapshot["summary"]["CLUSTER"],
+        "peers": {
+            url: {
+                "last_ok_seconds_ago": round(now - peer["last_ok"], 1),
+                "local_version": peer["local_version"],
+                "proxies": len(peer["records"]),
+                "failures": peer["failures"],
+                "last_error": peer["last_error"]
+            } for url, peer in cluster_state["peers"].items()
+        },
+        **{name: cluster_state[name] for name in ("syncs", "leader_changes", "fetches", "pushed", "push_failures", "received", "rejected")}
+    }
+
+def get_upcoming_resurrections(limit=15):
+    """`limit` dead proxy có deadline sớm nhất (cho stats API)"""
+    now = time.monotonic()
+    with pool_locks["DEAD"]:
+        upcoming = _dead_heap_smallest(limit)
+        result = []
+        for deadline, seq, proxy_key in upcoming:
+            entry = dead_proxy_management["entries"][proxy_key]
+            result.append({
+                'proxy': proxy_key,
+                'category': entry['category'],
+                'retry_in_seconds': max(0, int(deadline - now)),
+                'retry_in_minutes': round(max(0, deadline - now) / 60, 1),
+                'failure_count': entry['failure_count']
+            })
+    return result
+
+def count_due_resurrections():
+    """Số dead proxy đã tới deadline nhưng chưa được retry - counter incremental, không scan heap"""
+    with pool_locks["DEAD"]:
+        _advance_due_count(time.monotonic())
+        return dead_proxy_management["due"]
+
+def attempt_proxy_resurrection(resurrection_candidates, max_workers=8):
     """Thử resurrect các dead proxy candidates"""
     if not resurrection_candidates:
         return []
     
+    # Proxy đã quay lại serving tier bằng đường khác (FRESH) → không cần resurrect
+    already_serving = [c for c in resurrection_candidates if c['proxy_key'] in proxy_membership]
+    if already_serving:
+        membership_stats["resurrection_skipped"] += len(already_serving)
+        resurrection_candidates = [c for c in resurrection_candidates if c['proxy_key'] not in proxy_membership]
+        if not resurrection_candidates:
+            return []
+    
     log_to_render(f"🔄 ATTEMPTING RESURRECTION: {len(resurrection_candidates)} dead proxy candidates")
     pool_stats["resurrection_stats"]["resurrection_attempts"] += len(resurrection_candidates)
     
@@ -2389,16 +6331,22 @@ def attempt_proxy_resurrection(resurrection_candidates):
         log_to_render("⚠️ No valid resurrection candidates to validate")
         return []
     
+    # Per-class attempts (class của lần dead trước) → resurrection rate theo failure class
+    for candidate in resurrection_candidates:
+        if candidate.get('failure_class') in failure_class_stats:
+            failure_class_stats[candidate['failure_class']]["resurrection_attempts"] += 1
+    
     try:
         # Validate với lower worker count để không impact main validation
-        validated_results = validate_proxy_batch_smart(validation_list, max_workers=8)
+        failure_classes = {}
+        validated_results = validate_proxy_batch_smart(validation_list, max_workers=max_workers, failure_classes=failure_classes)
+        record_resurrection_yield(len(validation_list), len(validated_results))
         
         if validated_results:
             log_to_render(f"🎉 RESURRECTION SUCCESS: {len(validated_results)} proxy came back from dead!")
             
-            # Add resurrected proxy back to STANDBY pool
-            with pool_locks["STANDBY"]:
-                proxy_pools["STANDBY"].extend(validated_results)
+            # Add resurrected proxy back to STANDBY pool (membership index reject duplicates)
+            pool_extend("STANDBY", validated_results)
             
             resurrected_proxies = validated_results
             pool_stats["resurrection_stats"]["total_resurrected"] += len(validated_results)
@@ -2411,10 +6359,13 @@ def attempt_proxy_resurrection(resurrection_candidates):
             for candidate in resurrection_candidates:
                 proxy_key = candidate['proxy_key']
                 if proxy_key not in resurrected_keys:
-                    # Still dead, increase failure count and re-categorize
+                    # Still dead, increase failure count and re-categorize (failure class mới)
                     new_failure_count = candidate['failure_count'] + 1
-                    categorize_dead_proxy(candidate['proxy_data'], new_failure_count)
+                    categorize_dead_proxy(candidate['proxy_data'], new_failure_count,
+                                          failure_classes.get(proxy_key, candidate.get('failure_class')))
                     failed_again.append(candidate)
+                elif candidate.get('failure_class') in failure_class_stats:
+                    failure_class_stats[candidate['failure_class']]["resurrected"] += 1
             
             if failed_again:
                 log_to_render(f"💀 RESURRECTION FAILED: {len(failed_again)} proxy still dead, re-scheduled")
@@ -2424,14 +6375,15 @@ def attempt_proxy_resurrection(resurrection_candidates):
             # Re-categorize all with increased failure count
             for candidate in resurrection_candidates:
                 new_failure_count = candidate['failure_count'] + 1
-                categorize_dead_proxy(candidate['proxy_data'], new_failure_count)
+                categorize_dead_proxy(candidate['proxy_data'], new_failure_count,
+                                      failure_classes.get(candidate['proxy_key'], candidate.get('failure_class')))
     
     except Exception as e:
         log_to_render(f"❌ RESURRECTION ERROR: {str(e)}")
         # Re-categorize all with increased failure count on error
         for candidate in resurrection_candidates:
             new_failure_count = candidate['failure_count'] + 1
-            categorize_dead_proxy(candidate['proxy_data'], new_failure_count)
+            categorize_dead_proxy(candidate['proxy_data'], new_failure_count, candidate.get('failure_class'))
     
     # Update resurrection rate
     total_attempts = pool_stats["resurrection_stats"]["resurrection_attempts"]
@@ -2442,53 +6394,41 @@ def attempt_proxy_resurrection(resurrection_candidates):
     
     return resurrected_proxies
 
-def worker4_resurrection_manager():
-    """WORKER 4: Dead proxy resurrection manager - NEW WORKER"""
-    log_to_render("🔄 WORKER 4: Resurrection manager started")
+def job_resurrect():
+    """JOB resurrect: retry dead proxy tới hạn resurrection trong budget hiện tại"""
+    budget, workers = compute_resurrection_budget()
     
-    resurrection_cycle = 0
+    # Get proxies ready for resurrection attempt (tối đa budget, phần còn lại chờ lần sau)
+    candidates = get_proxies_ready_for_resurrection(limit=budget)
     
-    while worker_control.get("resurrection_active", True):
-        try:
-            resurrection_cycle += 1
-            log_to_render(f"🔄 WORKER 4 CYCLE {resurrection_cycle}: Checking for resurrection candidates")
-            
-            # Get proxies ready for resurrection attempt
-            candidates = get_proxies_ready_for_resurrection()
-            
-            if candidates:
-                log_to_render(f"🎯 RESURRECTION CANDIDATES: {len(candidates)} proxy ready for retry")
-                
-                # Attempt resurrection
-                resurrected = attempt_proxy_resurrection(candidates)
-                
-                if resurrected:
-                    log_to_render(f"🎉 RESURRECTION SUCCESS: {len(resurrected)} proxy brought back to life!")
-                else:
-                    log_to_render("💀 RESURRECTION: No proxy successfully resurrected this cycle")
-            else:
-                log_to_render("😴 RESURRECTION: No candidates ready for retry")
-            
-            # Show resurrection statistics periodically
-            if resurrection_cycle % 10 == 0:  # Every 10 cycles
-                resurrection_stats = pool_stats["resurrection_stats"]
-                dead_counts = {
-                    category: len(dead_proxy_management[category]) 
-                    for category in dead_proxy_management
-                }
-                
-                log_to_render("📊 RESURRECTION STATS:")
-                log_to_render(f"   Total resurrected: {resurrection_stats['total_resurrected']}")
-                log_to_render(f"   Total attempts: {resurrection_stats['resurrection_attempts']}")
-                log_to_render(f"   Success rate: {resurrection_stats['resurrection_rate']}%")
-                log_to_render(f"   Dead categories: {dead_counts}")
-            
-            # Sleep 60 seconds between resurrection cycles
-            time.sleep(60)
-            
-        except Exception as e:
-            log_to_render(f"❌ WORKER 4 CRITICAL ERROR: {str(e)}")
-            time.sleep(120)
+    # Bulk-dead /24: không dial, hoãn SUBNET_DEFER_DELAY với cùng failure_count (chỉ check thật mới đẩy về blacklist)
+    candidates, skipped = sample_bad_subnets(candidates, lambda c: c['proxy_key'], budget)
+    for candidate in skipped:
+        defer_dead_proxy(candidate, SUBNET_DEFER_DELAY)
+    subnet_stats["skipped_resurrection"] += len(skipped)
+    
+    if candidates:
+        log_to_render(f"🎯 RESURRECTION CANDIDATES: {len(candidates)} proxy (budget {budget}, {workers} workers, "
+                      f"deficit {resurrection_budget['deficit_ratio']:.0%}, yield {resurrection_budget['yield_ewma']:.1%})")
+        
+        # Attempt resurrection
+        resurrected = attempt_proxy_resurrection(candidates, max_workers=workers)
+        
+        if resurrected:
+            log_to_render(f"🎉 RESURRECTION SUCCESS: {len(resurrected)} proxy brought back to life!")
+        else:
+            log_to_render("💀 RESURRECTION: No proxy successfully resurrected this cycle")
+    else:
+        log_to_render("😴 RESURRECTION: No candidates ready for retry")
+    
+    next_delay = get_next_resurrection_delay()
+    if next_delay is None:
+        return None
+    if next_delay == 0:
+        # Còn due candidates vượt budget: pools thiếu → chạy lại sớm, pools đầy → throttle
+        return RESURRECTION_CYCLE_SECONDS if resurrection_budget["deficit_ratio"] > 0 else SCHEDULER_IDLE_INTERVAL
+    # Chạy lại đúng lúc resurrection deadline sớm nhất tới (dead proxy mới wake sớm hơn nếu cần)
+    return min(next_delay, SCHEDULER_IDLE_INTERVAL)
 
 @app.route('/api/health/comprehensive', methods=['GET'])
 def comprehensive_health_check():
@@ -2546,6 +6486,107 @@ def comprehensive_health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+# JOB DEFINITIONS cho unified scheduler
+# priority: số nhỏ chạy trước khi thiếu slot | deadline: lag tối đa (giây) từ lúc due tới lúc start
+# interval: chạy lại sau N giây nếu không có event (None = chỉ chạy khi có event)
+SCHEDULER_JOBS = {
+    "balance": {
+        "func": job_balance,
+        "description": "Promote STANDBY → PRIMARY, fill EMERGENCY từ excess STANDBY",
+        "priority": 0,
+        "deadline": 5,
+        "max_concurrency": 1,
+        "interval": SCHEDULER_IDLE_INTERVAL,
+        "triggers": ["primary_low", "emergency_low", "insufficient_proxy", "guarantee_violation"],
+        "enabled_flag": "pool_balancer_active"
+    },
+    "validate_fresh": {
+        "func": job_validate_fresh,
+        "description": "Validate best-scored FRESH batch → STANDBY",
+        "priority": 1,
+        "deadline": 30,
+        "max_concurrency": 1,
+        "interval": SCHEDULER_IDLE_INTERVAL,
+        "triggers": ["fresh_arrival", "standby_low"],
+        "enabled_flag": "rolling_validation_active"
+    },
+    "fetch": {
+        "func": job_fetch,
+        "description": "Fetch proxy từ sources vào FRESH",
+        "priority": 2,
+        "deadline": 60,
+        "max_concurrency": 1,
+        "interval": FETCH_REFRESH_INTERVAL,
+        "min_interval": FETCH_MIN_INTERVAL,
+        "error_backoff": 600,
+        "triggers": ["fresh_empty", "insufficient_proxy", "guarantee_violation", "api_force"],
+        "enabled_flag": "continuous_fetch_active"
+    },
+    "maintain": {
+        "func": job_maintain,
+        "description": "Re-check stalest proxy trong serving tiers (staleness SLA)",
+        "priority": 3,
+        "deadline": MAINTENANCE_CYCLE_SECONDS,
+        "max_concurrency": 1,
+        "interval": MAINTENANCE_CYCLE_SECONDS,
+        "triggers": [],
+        "enabled_flag": "rolling_validation_active"
+    },
+    "resurrect": {
+        "func": job_resurrect,
+        "description": "Retry dead proxy tới hạn resurrection → STANDBY",
+        "priority": 4,
+        "deadline": 120,
+        "max_concurrency": 1,
+        "interval": SCHEDULER_IDLE_INTERVAL,
+        "triggers": ["deadline", "pool_deficit"],
+        "enabled_flag": "resurrection_active"
+    },
+    "persist_blacklist": {
+        "func": job_persist_blacklist,
+        "description": "Flush permanent blacklist ra disk khi có thay đổi",
+        "priority": 5,
+        "deadline": BLACKLIST_PERSIST_INTERVAL,
+        "max_concurrency": 1,
+        "interval": BLACKLIST_PERSIST_INTERVAL,
+        "triggers": [],
+        "enabled_flag": "resurrection_active"
+    },
+    "history": {
+        "func": job_history,
+        "description": "Refresh uptime history cho scoring, retention + compaction history DB",
+        "priority": 7,
+        "deadline": 60,
+        "max_concurrency": 1,
+        "interval": HISTORY_JOB_INTERVAL,
+        "triggers": []
+    },
+    "persist_snapshot": {
+        "func": job_persist_snapshot,
+        "description": "Ghi warm start snapshot (pools + dead schedule + source stats) ra disk",
+        "priority": 6,
+        "deadline": WARM_START_PERSIST_INTERVAL,
+        "max_concurrency": 1,
+        "interval": WARM_START_PERSIST_INTERVAL,
+        "triggers": []
+    }
+}
+
+if CLUSTER_ENABLED:
+    SCHEDULER_JOBS["cluster_sync"] = {
+        "func": job_cluster_sync,
+        "description": "Pull local tiers của peer nodes → CLUSTER pool, update ring + leader",
+        "priority": 1,
+        "deadline": CLUSTER_SYNC_INTERVAL,
+        "max_concurrency": 1,
+        "interval": CLUSTER_SYNC_INTERVAL,
+        "triggers": []
+    }
+
+# PROXY_SERVICE_AUTOSTART=0 → import app mà không start scheduler (benchmark, tooling)
+if os.environ.get("PROXY_SERVICE_AUTOSTART", "1") != "0":
+    initialize_ultra_smart_service()
+
 if __name__ == '__main__':
     # Render production mode
     try:
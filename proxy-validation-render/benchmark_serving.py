@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+⏱️ SERVING BENCHMARK
+Đo chi phí "fastest N" serving với speed index vs sort toàn bộ pool (50k proxy, high QPS)
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+
+# Không start background workers khi import app
+os.environ.setdefault("PROXY_SERVICE_AUTOSTART", "0")
+
+# Add current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as service
+
+
+def print_header(title):
+    """Print formatted header"""
+    print("\n" + "=" * 60)
+    print(f"⏱️ {title}")
+    print("=" * 60)
+
+
+def make_proxy(index):
+    """Synthetic validated proxy record (cùng format với check_single_proxy)"""
+    host = f"{10 + index // 65536}.{(index // 256) % 256}.{index % 256}.1"
+    port = 1024 + index % 50000
+    return {
+        'host': host,
+        'port': port,
+        'type': random.choice(['http', 'https', 'socks4', 'socks5']),
+        'speed': round(random.uniform(0.1, 8.0), 2),
+        'status': 'alive',
+        'ip': host,
+        'checked_at': datetime.now().isoformat(),
+        'proxy_string': f"{host}:{port}",
+        'full_proxy': f"{host}:{port}",
+        'has_auth': False
+    }
+
+
+def time_call(func, iterations):
+    """Average latency (ms) của func qua N iterations"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def load_pools(size):
+    """Chia size proxy vào PRIMARY/STANDBY/EMERGENCY (60/30/10)"""
+    records = [make_proxy(i) for i in range(size)]
+    primary_end = int(size * 0.6)
+    standby_end = int(size * 0.9)
+
+    start = time.perf_counter()
+    service.pool_replace("PRIMARY", records[:primary_end])
+    service.pool_replace("STANDBY", records[primary_end:standby_end])
+    service.pool_replace("EMERGENCY", records[standby_end:])
+    load_ms = (time.perf_counter() - start) * 1000
+
+    print(f"📦 Loaded {size} proxy into serving tiers in {load_ms:.1f}ms")
+    return records
+
+
+def bench_fastest(records, count, iterations):
+    """Sort-per-request baseline vs speed index"""
+    print_header(f"FASTEST {count} - {len(records)} PROXY")
+
+    def sort_baseline():
+        return sorted(records, key=lambda x: x.get('speed', 999))[:count]
+
+    def index_lookup():
+        return service.get_fastest_proxies(service.pool_snapshot, count)
+
+    baseline_ms = time_call(sort_baseline, iterations)
+    index_ms = time_call(index_lookup, iterations)
+
+    same = [p['speed'] for p in sort_baseline()] == [p['speed'] for p in index_lookup()]
+    print(f"🐢 sorted() per request : {baseline_ms:.3f} ms")
+    print(f"⚡ speed index          : {index_ms:.3f} ms ({baseline_ms / index_ms:.0f}x faster)")
+    print(f"✅ Same ordering        : {same}")
+
+
+def bench_updates(iterations):
+    """Chi phí update incremental (insert/recheck/remove + publish snapshot)"""
+    print_header("INDEX UPDATE COST")
+
+    def insert_remove():
+        proxy = make_proxy(random.randint(10_000_000, 20_000_000))
+        service.pool_extend("STANDBY", [proxy])
+        service.pool_take_front("STANDBY", 1)
+
+    def transfer():
+        service.pool_transfer("STANDBY", "PRIMARY", 10)
+        service.pool_transfer("PRIMARY", "STANDBY", 10)
+
+    print(f"➕➖ insert + remove (2 publishes) : {time_call(insert_remove, iterations):.3f} ms")
+    print(f"🔀 transfer 10 x2 (2 publishes)   : {time_call(transfer, iterations):.3f} ms")
+
+
+def bench_http(path, threads, duration):
+    """QPS qua Flask test client với nhiều threads đồng thời"""
+    print_header(f"HTTP {path} - {threads} threads x {duration}s")
+
+    latencies = []
+    latencies_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client_loop():
+        client = service.app.test_client()
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.get(path)
+            local.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                print(f"❌ HTTP {response.status_code}")
+                break
+        with latencies_lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=client_loop) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    latencies.sort()
+    if not latencies:
+        print("❌ No requests completed")
+        return
+
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"📈 Requests: {len(latencies)} ({len(latencies) / duration:.0f} QPS)")
+    print(f"⏱️ p50: {p50:.2f} ms | p99: {p99:.2f} ms")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Serving benchmark cho speed index')
+    parser.add_argument('--size', type=int, default=50000, help='Tổng số proxy trong serving tiers')
+    parser.add_argument('--count', type=int, default=100, help='N trong "fastest N"')
+    parser.add_argument('--iterations', type=int, default=200, help='Iterations cho micro benchmarks')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent HTTP clients')
+    parser.add_argument('--duration', type=float, default=5.0, help='Giây cho mỗi HTTP benchmark')
+    args = parser.parse_args()
+
+    random.seed(42)
+    records = load_pools(args.size)
+
+    bench_fastest(records, args.count, args.iterations)
+    bench_updates(args.iterations)
+    bench_http(f"/api/proxy/alive?count={args.count}&order=fastest", args.threads, args.duration)
+    bench_http(f"/api/proxies?count={args.count}", args.threads, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+🕸️ CLUSTER HARNESS
+Chạy N service nodes (subprocess) trên localhost ở cluster mode, không cần outside services:
+fake proxy source + fake HTTP proxies local. Kiểm tra:
+- Chỉ leader fetch sources
+- Mỗi node chỉ validate shard của mình (consistent hashing), shards không overlap
+- Mỗi node serve merged result set của cả cluster
+- Leader chết → node còn lại được bầu làm leader và fetch lại sources
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Harness gọi localhost → không đi qua HTTP_PROXY env
+CLUSTER_SECRET = "cluster-harness-secret"
+http = requests.Session()
+http.trust_env = False
+http.headers["X-Cluster-Secret"] = CLUSTER_SECRET  # /api/cluster/state chỉ trả lời peers có secret
+
+
+def print_header(title):
+    """Print formatted header"""
+    print("\n" + "=" * 60)
+    print(f"🕸️ {title}")
+    print("=" * 60)
+
+
+def free_port():
+    """Port trống trên localhost"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_proxy(port, egress_ip):
+    """Fake HTTP proxy: mọi GET (absolute URL tới judge) → 200 {"origin": egress_ip}"""
+    class ProxyHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({"origin": egress_ip}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), ProxyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_fake_source(lines, hits):
+    """Fake proxy list source: GET /proxies.txt → host:port per line (đếm số lần fetch)"""
+    body = "\n".join(lines).encode()
+
+    class SourceHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(time.time())
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SourceHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/proxies.txt"
+
+
+def run_node(port, source_url, sync_interval):
+    """Node mode: import app không autostart, trỏ sources về fake source rồi start service"""
+    os.environ["PROXY_SERVICE_AUTOSTART"] = "0"
+    sys.path.append(HERE)
+    import app as service
+
+    service.PROXY_SOURCE_LINKS = {
+        "categorized": {"Harness source": {"url": source_url, "protocol": "http"}},
+        "mixed": {}
+    }
+    service.is_quality_proxy = lambda proxy_string: ':' in proxy_string  # Fake proxies nằm trên 127.0.0.1
+    service.session.trust_env = False
+    if "cluster_sync" in service.SCHEDULER_JOBS:
+        service.SCHEDULER_JOBS["cluster_sync"]["interval"] = sync_interval
+        service.SCHEDULER_JOBS["cluster_sync"]["deadline"] = sync_interval
+    service.CLUSTER_PEER_TIMEOUT = sync_interval * 3
+
+    service.initialize_ultra_smart_service()
+    service.app.run(host="127.0.0.1", port=port, debug=False, threaded=True)
+
+
+def spawn_node(url, nodes, source_url, sync_interval, work_dir):
+    """Start 1 node subprocess với data dir + shared state dir riêng"""
+    port = int(url.rsplit(':', 1)[1])
+    node_dir = os.path.join(work_dir, str(port))
+    os.makedirs(node_dir, exist_ok=True)
+    env = dict(os.environ)
+    env.update({
+        "PROXY_CLUSTER_NODES": ",".join(nodes),
+        "PROXY_CLUSTER_SELF": url,
+        "PROXY_CLUSTER_SECRET": CLUSTER_SECRET,
+        "PROXY_DATA_DIR": os.path.join(node_dir, "data"),
+        "PROXY_SHARED_STATE_DIR": node_dir,
+        "PYTHONUNBUFFERED": "1"
+    })
+    log_file = open(os.path.join(node_dir, "node.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--node", "--port", str(port),
+         "--source", source_url, "--sync-interval", str(sync_interval)],
+        env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+    return process
+
+
+def get_json(url, path, timeout=5):
+    """GET JSON từ node (None nếu node không trả lời)"""
+    try:
+        return http.get(f"{url}{path}", timeout=timeout).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def wait_for(description, predicate, timeout):
+    """Poll predicate tới khi True hoặc timeout"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            print(f"✅ {description}")
+            return True
+        time.sleep(1)
+    print(f"❌ TIMEOUT: {description}")
+    return False
+
+
+def local_keys(url):
+    """host:port của proxy node tự validate (local tiers)"""
+    state = get_json(url, "/api/cluster/state")
+    if not state:
+        return None
+    return {f"{p['host']}:{p['port']}" for p in state["proxies"]}
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Local multi-process harness cho cluster mode')
+    parser.add_argument('--nodes', type=int, default=3, help='Số service nodes')
+    parser.add_argument('--alive', type=int, default=60, help='Số fake proxy sống')
+    parser.add_argument('--dead', type=int, default=20, help='Số candidate port đóng (dead)')
+    parser.add_argument('--sync-interval', type=int, default=2, help='Cluster sync interval (giây)')
+    parser.add_argument('--timeout', type=int, default=90, help='Timeout cho mỗi bước kiểm tra')
+    parser.add_argument('--node', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--source', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.node:
+        run_node(args.port, args.source, args.sync_interval)
+        return 0
+
+    print_header(f"CLUSTER HARNESS - {args.nodes} nodes, {args.alive} alive + {args.dead} dead candidates")
+
+    alive_ports = [free_port() for _ in range(args.alive)]
+    for index, port in enumerate(alive_ports):
+        start_fake_proxy(port, f"198.51.100.{index % 250 + 1}")
+    dead_ports = [free_port() for _ in range(args.dead)]  # Không listen → connection refused
+    alive_keys = {f"127.0.0.1:{port}" for port in alive_ports}
+
+    source_hits = []
+    source_url = start_fake_source([f"127.0.0.1:{port}" for port in alive_ports + dead_ports], source_hits)
+
+    nodes = sorted(f"http://127.0.0.1:{free_port()}" for _ in range(args.nodes))
+    leader = nodes[0]
+    work_dir = tempfile.mkdtemp(prefix="cluster-harness-")
+    print(f"📁 Node logs: {work_dir}")
+    print(f"👑 Expected leader: {leader}")
+
+    processes = {}
+    results = []
+    try:
+        # Leader start cuối để peers sẵn sàng nhận shard ngay lần fetch đầu
+        for url in reversed(nodes):
+            processes[url] = spawn_node(url, nodes, source_url, args.sync_interval, work_dir)
+            wait_for(f"{url} up", lambda: get_json(url, "/api/health") is not None, args.timeout)
+
+        # 1. Mọi alive proxy được validate đúng 1 lần trên cả cluster
+        def all_validated():
+            shards = [local_keys(url) or set() for url in nodes]
+            return set().union(*shards) >= alive_keys
+        results.append(wait_for("All alive proxies validated across cluster", all_validated, args.timeout))
+
+        shards = {url: local_keys(url) or set() for url in nodes}
+        overlap = sum(len(shards[a] & shards[b]) for i, a in enumerate(nodes) for b in nodes[i + 1:])
+        print(f"📊 Shard sizes: {[len(shards[url]) for url in nodes]} | overlap: {overlap}")
+        results.append(overlap == 0)
+
+        # 2. Shard đúng theo consistent hashing
+        os.environ["PROXY_SERVICE_AUTOSTART"] = "0"
+        sys.path.append(HERE)
+        import app as service
+        service.cluster_state["ring"] = service.build_cluster_ring(nodes)
+        misplaced = sum(1 for url in nodes for key in shards[url] if service.cluster_owner_of(key) != url)
+        print(f"🎯 Proxies validated ngoài shard của mình: {misplaced}")
+        results.append(misplaced == 0)
+
+        # 3. Chỉ leader fetch sources
+        fetches = {url: (get_json(url, "/api/cluster/status") or {}).get("cluster", {}).get("fetches") for url in nodes}
+        print(f"📥 Fetches per node: {fetches} | source hits: {len(source_hits)}")
+        results.append(fetches[leader] > 0 and all(fetches[url] == 0 for url in nodes[1:]))
+
+        # 4. Mỗi node serve merged result set
+        def merged_everywhere():
+            for url in nodes:
+                served = get_json(url, f"/api/proxy/alive?count={args.alive * 2}")
+                if not served or {f"{p['host']}:{p['port']}" for p in served["proxies"]} < alive_keys:
+                    return False
+            return True
+        results.append(wait_for("Every node serves the merged result set", merged_everywhere, args.timeout))
+
+        # 5. Failover: kill leader → node kế tiếp thành leader, fetch lại, survivors serve cùng merged set
+        if len(nodes) > 1:
+            processes[leader].terminate()
+            processes[leader].wait()
+            survivors = nodes[1:]
+            expected = set().union(*(shards[url] for url in survivors))
+
+            def failed_over():
+                served_sets = []
+                for url in survivors:
+                    status = (get_json(url, "/api/cluster/status") or {}).get("cluster", {})
+                    served = get_json(url, f"/api/proxy/alive?count={args.alive * 2}")
+                    if status.get("leader") != survivors[0] or not served:
+                        return False
+                    if url == survivors[0] and not status.get("fetches"):
+                        return False  # Leader mới phải fetch lại sources (shard của leader cũ chia cho nodes còn sống)
+                    served_sets.append({f"{p['host']}:{p['port']}" for p in served["proxies"]})
+                return all(served >= expected and served == served_sets[0] for served in served_sets)
+            results.append(wait_for(f"Leader failover → {survivors[0]}", failed_over, args.timeout))
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in processes.values():
+            process.wait()
+
+    passed = all(results)
+    print_header("PASS" if passed else "FAIL")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -39,7 +39,7 @@ services:
   github:
     repo: your-username/your-repo
     branch: main
-  run_command: gunicorn --bind 0.0.0.0:`$PORT --workers 1 --timeout 120 app:app
+  run_command: gunicorn --bind 0.0.0.0:`$PORT --workers 2 --threads 8 --timeout 120 app:app
   environment_slug: python
   instance_count: 1
   instance_size_slug: basic-xxs
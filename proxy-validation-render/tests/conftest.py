@@ -0,0 +1,54 @@
+"""Pytest fixtures: import app không autostart (không fetch / scheduler / owner lock), data dirs tạm"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+_TEST_DIR = tempfile.mkdtemp(prefix="proxy_service_tests_")
+os.environ["PROXY_SERVICE_AUTOSTART"] = "0"
+os.environ.setdefault("PROXY_DATA_DIR", os.path.join(_TEST_DIR, "data"))
+os.environ.setdefault("PROXY_SHARED_STATE_DIR", os.path.join(_TEST_DIR, "shm"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as service  # noqa: E402
+
+
+def make_proxy(index, speed=None, proxy_type="http"):
+    """Proxy record giống kết quả check_single_proxy_classified (host 10.x.y.z duy nhất theo index)"""
+    host = f"10.{index // 65536}.{(index // 256) % 256}.{index % 256}"
+    return {
+        "host": host,
+        "port": 8080,
+        "type": proxy_type,
+        "speed": speed if speed is not None else round(0.1 + (index % 50) / 10, 2),
+        "status": "alive",
+        "ip": host,
+        "checked_at": datetime.now().isoformat(),
+        "proxy_string": f"{host}:8080",
+        "full_proxy": f"{host}:8080",
+        "has_auth": False
+    }
+
+
+@pytest.fixture
+def app_module():
+    """Module app với pools, leases và dead schedule rỗng (state module-level dùng chung giữa tests)"""
+    with service.lease_lock:
+        service.active_leases.clear()
+        service.proxy_lease_state.clear()
+        service.lease_expiry_heap.clear()
+    service.shared_exclusive_until.clear()
+    service.shared_exclusive_next["stale"] = True
+    for pool_name in service.proxy_pools:
+        service.pool_replace(pool_name, [], publish=False)
+    service.publish_pool_snapshot()
+    with service.pool_locks["DEAD"]:
+        for proxy_key in list(service.dead_proxy_management["entries"]):
+            service._drop_dead_entry(proxy_key)
+        service.dead_proxy_management["heap"].clear()
+        service.dead_proxy_management["pending"].clear()
+    service.response_cache.clear()
+    yield service
@@ -0,0 +1,91 @@
+"""Permanent blacklist: base file + journal round-trip, side table cho keys không phải IPv4, expiry"""
+
+import time
+from array import array
+
+import pytest
+
+
+@pytest.fixture
+def blacklist(app_module, tmp_path, monkeypatch):
+    path = str(tmp_path / "permanent_blacklist.bin")
+    monkeypatch.setattr(app_module, "BLACKLIST_PATH", path)
+    monkeypatch.setattr(app_module, "BLACKLIST_JOURNAL_PATH", path + ".journal")
+    reset(app_module)
+    yield app_module
+    reset(app_module)
+
+
+def reset(app_module):
+    """Blacklist rỗng như lúc process mới start"""
+    with app_module.blacklist_lock:
+        app_module.permanent_blacklist.update({
+            "sorted": (array('Q'), array(app_module.BLACKLIST_EXPIRES_TYPECODE)),
+            "pending": {},
+            "other": {},
+            "unsaved": {},
+            "journal_entries": 0
+        })
+
+
+def test_encode_proxy_key_ipv4_only(blacklist):
+    assert blacklist.encode_proxy_key("1.2.3.4:8080") == (0x01020304 << 16) | 8080
+    assert blacklist.encode_proxy_key("proxy.example.com:8080") is None
+    assert blacklist.encode_proxy_key("[2001:db8::1]:3128") is None
+    assert blacklist.encode_proxy_key("1.2.3.256:80") is None
+
+
+def test_round_trip_base_journal_and_side_table(blacklist):
+    for i in range(200):
+        blacklist.blacklist_add(f"1.2.{i // 256}.{i % 256}:80")
+    blacklist.blacklist_add("proxy.example.com:8080")
+    assert blacklist.save_permanent_blacklist()          # Chưa có base file → compact
+    assert blacklist.permanent_blacklist["journal_entries"] == 0
+
+    blacklist.blacklist_add("9.9.9.9:3128")
+    blacklist.blacklist_add("[2001:db8::1]:3128")
+    assert blacklist.save_permanent_blacklist()          # Adds nhỏ → chỉ append journal
+    assert blacklist.permanent_blacklist["journal_entries"] == 2
+    assert not blacklist.save_permanent_blacklist()      # Không có gì mới
+
+    reset(blacklist)
+    assert not blacklist.is_blacklisted("1.2.0.7:80")
+    assert blacklist.load_permanent_blacklist() == 203
+    for proxy_key in ("1.2.0.7:80", "9.9.9.9:3128", "proxy.example.com:8080", "[2001:db8::1]:3128"):
+        assert blacklist.is_blacklisted(proxy_key)
+    assert not blacklist.is_blacklisted("9.9.9.8:3128")
+    assert blacklist.get_blacklist_summary()["side_table"] == 2
+
+
+def test_torn_journal_line_ignored(blacklist):
+    blacklist.blacklist_add("1.1.1.1:80")
+    blacklist.save_permanent_blacklist()
+    blacklist.blacklist_add("2.2.2.2:80")
+    blacklist.save_permanent_blacklist()
+    with open(blacklist.BLACKLIST_JOURNAL_PATH, "a", encoding="utf-8") as f:
+        f.write('[12345, 17')  # Crash giữa lúc append
+
+    reset(blacklist)
+    assert blacklist.load_permanent_blacklist() == 2
+    assert blacklist.is_blacklisted("2.2.2.2:80")
+
+
+def test_expired_entries_pruned_on_load(blacklist):
+    blacklist.blacklist_add("3.3.3.3:80", ttl=-10)
+    blacklist.blacklist_add("other.host:80", ttl=-10)
+    blacklist.blacklist_add("4.4.4.4:80")
+    blacklist.save_permanent_blacklist()
+
+    reset(blacklist)
+    assert blacklist.load_permanent_blacklist() == 1
+    assert not blacklist.is_blacklisted("3.3.3.3:80")
+    assert not blacklist.is_blacklisted("other.host:80")
+    assert blacklist.is_blacklisted("4.4.4.4:80", now=time.time())
+
+
+def test_corrupt_base_starts_empty(blacklist):
+    with open(blacklist.BLACKLIST_PATH, "wb") as f:
+        f.write(b"garbage")
+
+    assert blacklist.load_permanent_blacklist() == 0
+    assert blacklist.get_blacklist_size() == 0
@@ -0,0 +1,79 @@
+"""Change feed: `since` trả net delta của serving set, transfer giữa tiers không phải add/remove"""
+
+import pytest
+
+from conftest import make_proxy
+
+
+@pytest.fixture
+def feed(app_module):
+    app_module.pool_extend("PRIMARY", [make_proxy(i) for i in range(10)])
+    app_module.pool_extend("STANDBY", [make_proxy(i) for i in range(10, 20)])
+    return app_module
+
+
+def keys_of(app_module, proxies):
+    return {app_module.proxy_key_of(p) for p in proxies}
+
+
+def served_keys(app_module):
+    snapshot = app_module.pool_snapshot
+    return keys_of(app_module, [p for tier_name in app_module.READ_TIERS for p in snapshot["pools"][tier_name]])
+
+
+def test_nothing_changed_gives_empty_delta(feed):
+    version = feed.pool_snapshot["version"]
+    feed.publish_pool_snapshot()
+
+    changes = feed.get_pool_changes(version)
+    assert changes["resync"] is False
+    assert changes["added"] == [] and changes["removed"] == []
+
+
+def test_transfer_between_tiers_is_not_a_change(feed):
+    version = feed.pool_snapshot["version"]
+    assert feed.pool_transfer("STANDBY", "PRIMARY", 5) == 5
+    assert feed.pool_transfer("PRIMARY", "EMERGENCY", 3) == 3
+
+    changes = feed.get_pool_changes(version)
+    assert changes["version"] > version
+    assert changes["added"] == [] and changes["removed"] == []
+
+
+def test_net_effect_across_transfer_extend_and_evict(feed):
+    version = feed.pool_snapshot["version"]
+    client = served_keys(feed)
+    feed.pool_extend("STANDBY", [make_proxy(100), make_proxy(101)])
+    feed.pool_transfer("STANDBY", "PRIMARY", 12)  # Gồm cả proxy vừa add
+    primary = feed.pool_snapshot["pools"]["PRIMARY"]
+    evicted = [p for p in primary if feed.proxy_key_of(p) in keys_of(feed, [make_proxy(3), make_proxy(101)])]
+    feed.pool_evict("PRIMARY", evicted)
+
+    changes = feed.get_pool_changes(version)
+    assert keys_of(feed, changes["added"]) == keys_of(feed, [make_proxy(100)])
+    # Key add rồi remove sau `since` → event cuối là remove (client bỏ qua key chưa có)
+    assert set(changes["removed"]) == keys_of(feed, [make_proxy(3), make_proxy(101)])
+    client = (client - set(changes["removed"])) | keys_of(feed, changes["added"])
+    assert client == served_keys(feed)
+
+
+def test_since_is_exclusive_and_chains(feed):
+    first = feed.pool_snapshot["version"]
+    feed.pool_extend("PRIMARY", [make_proxy(200)])
+    second = feed.pool_snapshot["version"]
+    feed.pool_transfer("PRIMARY", "STANDBY", 11)
+    feed.pool_extend("EMERGENCY", [make_proxy(201)])
+
+    assert keys_of(feed, feed.get_pool_changes(first)["added"]) == keys_of(feed, [make_proxy(200), make_proxy(201)])
+    assert keys_of(feed, feed.get_pool_changes(second)["added"]) == keys_of(feed, [make_proxy(201)])
+
+
+def test_future_since_or_other_epoch_resyncs(feed):
+    version = feed.pool_snapshot["version"]
+    expected = keys_of(feed, [make_proxy(i) for i in range(20)])
+
+    for changes in (feed.get_pool_changes(version + 1),
+                    feed.get_pool_changes(version, epoch="other-process")):
+        assert changes["resync"] is True
+        assert keys_of(feed, changes["proxies"]) == expected
+    assert feed.get_pool_changes(version, epoch=feed.change_feed["epoch"])["resync"] is False
@@ -0,0 +1,78 @@
+"""Resurrection schedule: dead heap (deadline order, lazy deletion) + pending heap (due counter)"""
+
+import pytest
+
+from conftest import make_proxy
+
+
+def schedule(app_module, index, delay, category="short_delay"):
+    proxy = make_proxy(index)
+    proxy_key = app_module.proxy_key_of(proxy)
+    app_module._schedule_dead_entry(proxy_key, proxy, 2, "timeout", category, delay, None)
+    return proxy_key
+
+
+@pytest.fixture
+def dead(app_module):
+    return app_module
+
+
+def test_upcoming_follows_deadline_order(dead):
+    keys = [schedule(dead, i, delay) for i, delay in enumerate((300, 30, 900, 60, 5))]
+
+    upcoming = [item["proxy"] for item in dead.get_upcoming_resurrections(limit=3)]
+    assert upcoming == [keys[4], keys[1], keys[3]]
+
+
+def test_reschedule_leaves_stale_item_out_of_order(dead):
+    first = schedule(dead, 1, 10)
+    second = schedule(dead, 2, 20)
+    schedule(dead, 1, 600)  # Item cũ (10s) thành stale
+
+    assert len(dead.dead_proxy_management["heap"]) == 3
+    assert [item["proxy"] for item in dead.get_upcoming_resurrections()] == [second, first]
+    assert dead.get_next_resurrection_delay() == pytest.approx(20, abs=1)
+
+
+def test_ready_pops_only_due_entries_earliest_first(dead):
+    late = schedule(dead, 1, -1)
+    early = schedule(dead, 2, -30)
+    schedule(dead, 3, 600)
+
+    ready = dead.get_proxies_ready_for_resurrection(limit=10)
+    assert [candidate["proxy_key"] for candidate in ready] == [early, late]
+    assert len(dead.dead_proxy_management["entries"]) == 1
+    assert dead.get_proxies_ready_for_resurrection(limit=10) == []
+
+
+def test_ready_respects_limit(dead):
+    keys = [schedule(dead, i, -100 + i) for i in range(5)]
+
+    assert [c["proxy_key"] for c in dead.get_proxies_ready_for_resurrection(limit=2)] == keys[:2]
+    assert [c["proxy_key"] for c in dead.get_proxies_ready_for_resurrection(limit=10)] == keys[2:]
+
+
+def test_due_counter_tracks_pending_heap(dead):
+    due_key = schedule(dead, 1, -5)
+    schedule(dead, 2, -1)
+    schedule(dead, 3, 600)
+
+    assert dead.count_due_resurrections() == 2
+    # Re-schedule entry đã due về tương lai → không còn due, item cũ trong pending thành stale
+    schedule(dead, 1, 600)
+    assert dead.count_due_resurrections() == 1
+    dead.get_proxies_ready_for_resurrection(limit=10)
+    assert dead.count_due_resurrections() == 0
+    assert due_key in dead.dead_proxy_management["entries"]
+
+
+def test_compaction_keeps_heap_order(dead):
+    for _ in range(3):
+        for i in range(600):
+            schedule(dead, i, 1000 - i)
+
+    heap = dead.dead_proxy_management["heap"]
+    assert len(heap) <= 2 * len(dead.dead_proxy_management["entries"]) + 1000
+    assert all(heap[0] <= item for item in heap)
+    upcoming = dead.get_upcoming_resurrections(limit=5)
+    assert [item["proxy"] for item in upcoming] == [dead.proxy_key_of(make_proxy(i)) for i in range(599, 594, -1)]
@@ -0,0 +1,94 @@
+"""Follower: apply delta log của owner + forward mọi API ngoài read hot path sang owner"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import make_proxy
+
+
+@pytest.fixture
+def follower(app_module, monkeypatch):
+    monkeypatch.setitem(app_module.process_role, "role", "follower")
+    monkeypatch.setitem(app_module.process_role, "owner_port", 18999)
+    version = app_module.pool_snapshot["version"]
+    app_module.apply_shared_state_deltas([delta(version + 1, [["add", "PRIMARY", make_proxy(i)] for i in range(5)] +
+                                                [["add", "STANDBY", make_proxy(i)] for i in range(5, 8)])])
+    return app_module
+
+
+def delta(version, ops, leases=()):
+    """1 delta line như owner ghi vào shared state log"""
+    return {"version": version, "fresh": 0, "ops": ops, "leases": list(leases)}
+
+
+def tier_keys(app_module, tier_name):
+    return {app_module.proxy_key_of(p) for p in app_module.pool_snapshot["pools"][tier_name]}
+
+
+def key(index):
+    return f"{make_proxy(index)['host']}:8080"
+
+
+def test_deltas_apply_adds_in_order(follower):
+    assert tier_keys(follower, "PRIMARY") == {key(i) for i in range(5)}
+    assert tier_keys(follower, "STANDBY") == {key(i) for i in range(5, 8)}
+    assert follower.get_proxy_tier(key(6)) == "STANDBY"
+    assert follower.process_role["state_version"] == follower.pool_snapshot["version"]
+
+
+def test_transfer_is_remove_then_add(follower):
+    version = follower.pool_snapshot["version"]
+    follower.apply_shared_state_deltas([
+        delta(version + 1, [["remove", "STANDBY", key(5)], ["add", "PRIMARY", make_proxy(5)]]),
+        # Remove trễ ở tier cũ không được xoá proxy đã chuyển tier
+        delta(version + 2, [["remove", "STANDBY", key(5)], ["remove", "PRIMARY", key(0)]])
+    ])
+
+    assert follower.pool_snapshot["version"] == version + 2
+    assert tier_keys(follower, "PRIMARY") == {key(i) for i in range(1, 6)}
+    assert tier_keys(follower, "STANDBY") == {key(6), key(7)}
+    assert follower.get_proxy_tier(key(0)) is None
+
+
+def test_exclusive_lease_keys_hidden_until_released(follower):
+    version = follower.pool_snapshot["version"]
+    follower.apply_shared_state_deltas([delta(version + 1, [], leases=[[key(1), time.time() + 60]])])
+
+    served = follower.get_fastest_proxies(follower.pool_snapshot, 10, is_available=follower.is_proxy_servable)
+    assert key(1) not in {follower.proxy_key_of(p) for p in served}
+    follower.apply_shared_state_deltas([delta(version + 2, [], leases=[[key(1), None]])])
+    assert follower.is_proxy_servable(make_proxy(1))
+
+
+def test_local_endpoint_served_from_follower_state(follower, monkeypatch):
+    monkeypatch.setattr(follower, "owner_session", None)  # Forward sẽ lỗi ngay
+
+    response = follower.app.test_client().get("/api/proxy/alive?count=5&order=fastest")
+    assert response.status_code == 200
+    assert {f"{p['host']}:{p['port']}" for p in response.get_json()["proxies"]} <= {key(i) for i in range(8)}
+
+
+def test_other_endpoints_forwarded_to_owner(follower, monkeypatch):
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append((method, url, kwargs["data"]))
+        return SimpleNamespace(status_code=201, content=b'{"owner": true}',
+                               headers={"Content-Type": "application/json", "Content-Length": "15"})
+
+    monkeypatch.setattr(follower, "owner_session", SimpleNamespace(request=request))
+    forwarded = follower.process_role["forwarded"]
+
+    response = follower.app.test_client().post("/api/proxy/checkout", json={"count": 2})
+    assert response.status_code == 201
+    assert response.get_json() == {"owner": True}
+    assert calls == [("POST", "http://127.0.0.1:18999/api/proxy/checkout?", b'{"count": 2}')]
+    assert follower.process_role["forwarded"] == forwarded + 1
+    assert not follower.active_leases  # Lease chỉ cấp ở owner
+
+
+def test_owner_internal_endpoint_not_exposed(follower):
+    response = follower.app.test_client().post("/api/internal/follower_report", json={})
+    assert response.status_code == 404
@@ -0,0 +1,83 @@
+"""Proxy leases: exclusive không serve cho client khác, TTL expire trả proxy về rotation"""
+
+import time
+
+import pytest
+
+from conftest import make_proxy
+
+
+@pytest.fixture
+def primary(app_module):
+    app_module.pool_replace("PRIMARY", [make_proxy(i) for i in range(10)])
+    return app_module
+
+
+def served_keys(app_module, count=10):
+    snapshot = app_module.pool_snapshot
+    return {app_module.proxy_key_of(p)
+            for p in app_module.get_fastest_proxies(snapshot, count, is_available=app_module.is_proxy_servable)}
+
+
+def test_exclusive_lease_hidden_from_other_requests(primary):
+    lease = primary.checkout_proxies(3, ttl=60, mode="exclusive")
+    leased = {primary.proxy_key_of(p) for p in lease["proxies"]}
+
+    assert len(leased) == 3
+    assert not leased & served_keys(primary)
+    # Exclusive checkout thứ 2 không lấy lại proxy đang lease
+    second = primary.checkout_proxies(10, ttl=60, mode="exclusive")
+    assert not leased & {primary.proxy_key_of(p) for p in second["proxies"]}
+    assert len(second["proxies"]) == 7
+
+
+def test_shared_lease_does_not_block_serving(primary):
+    lease = primary.checkout_proxies(3, ttl=60, mode="shared")
+    leased = {primary.proxy_key_of(p) for p in lease["proxies"]}
+
+    assert leased <= served_keys(primary)
+    # Shared lease chặn exclusive checkout trên cùng proxy
+    exclusive = primary.checkout_proxies(10, ttl=60, mode="exclusive")
+    assert not leased & {primary.proxy_key_of(p) for p in exclusive["proxies"]}
+
+
+def test_release_returns_proxies_to_rotation(primary):
+    lease = primary.checkout_proxies(4, ttl=60, mode="exclusive")
+    changes = primary.lease_stats["exclusive_changes"]
+
+    assert primary.release_lease(lease["lease_id"])
+    assert not primary.release_lease(lease["lease_id"])
+    assert len(served_keys(primary)) == 10
+    assert primary.lease_stats["exclusive_changes"] > changes
+    assert not primary.proxy_lease_state
+
+
+def test_expired_lease_released_lazily(primary):
+    lease = primary.checkout_proxies(5, ttl=60, mode="exclusive")
+    leased = {primary.proxy_key_of(p) for p in lease["proxies"]}
+
+    assert primary.expire_leases() == 0
+    assert primary.expire_leases(now=time.monotonic() + 61) == 1
+    assert lease["lease_id"] not in primary.active_leases
+    assert leased <= served_keys(primary)
+
+
+def test_ttl_clamped_and_mode_validated(primary):
+    assert primary.checkout_proxies(1, ttl=10 ** 6)["ttl"] == primary.LEASE_MAX_TTL
+    assert primary.checkout_proxies(1, ttl=0)["ttl"] == 1
+    with pytest.raises(ValueError):
+        primary.checkout_proxies(1, mode="bogus")
+
+
+def test_follower_exclusive_until_expires_by_clock(primary):
+    """Follower chỉ biết epoch hết hạn của exclusive lease (owner cấp) - hết hạn không cần event"""
+    key = primary.proxy_key_of(primary.pool_snapshot["pools"]["PRIMARY"][0])
+    primary.shared_exclusive_until[key] = time.time() + 60
+    primary.shared_exclusive_next["stale"] = True
+
+    assert key not in served_keys(primary)
+    assert primary.next_shared_exclusive_expiry() == primary.shared_exclusive_until[key]
+    primary.shared_exclusive_until[key] = time.time() - 1
+    primary.shared_exclusive_next["stale"] = True
+    assert key in served_keys(primary)
+    assert primary.next_shared_exclusive_expiry() is None